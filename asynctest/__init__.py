@@ -24,7 +24,10 @@ from .mock import *
 
 # And load or own tools
 from ._fail_on import *
+from .executor import *
 from .helpers import *
+from .process import *
+from .resolver import *
 from .selector import *
 
 __all__ = unittest.__all__
@@ -43,6 +43,7 @@ set-up and tear down.
 """
 
 import asyncio
+import atexit
 import functools
 import types
 import unittest
@@ -51,16 +52,65 @@ import warnings
 
 from unittest.case import *  # NOQA
 
+import asynctest.executor
 import asynctest.selector
 import asynctest._fail_on
 
 
+# Names of the child watchers of asyncio which can be selected with
+# TestCase.child_watcher, not all of them are available on every version of
+# Python.
+_CHILD_WATCHERS = {
+    "safe": "SafeChildWatcher",
+    "fast": "FastChildWatcher",
+    "threaded": "ThreadedChildWatcher",
+    "multiloop": "MultiLoopChildWatcher",
+    "pidfd": "PidfdChildWatcher",
+}
+
+# Child watchers kept across tests when TestCase.reuse_child_watcher is true,
+# by class.
+_reused_watchers = {}
+
+
+def _close_reused_watchers():
+    while _reused_watchers:
+        _, watcher = _reused_watchers.popitem()
+        watcher.close()
+
+
+atexit.register(_close_reused_watchers)
+
+
+def _get_child_watcher_class(choice):
+    if isinstance(choice, (str, type)):
+        choice = (choice, )
+
+    for name in choice:
+        if isinstance(name, type):
+            return name
+
+        try:
+            watcher_class = getattr(asyncio, _CHILD_WATCHERS[name], None)
+        except KeyError:
+            raise ValueError("Unknown child watcher {!r}".format(name))
+
+        if watcher_class is not None:
+            return watcher_class
+
+    raise NotImplementedError(
+        "None of the child watchers {!r} is available".format(choice))
+
+
 class _Policy(asyncio.AbstractEventLoopPolicy):
-    def __init__(self, original_policy, loop, forbid_get_event_loop):
+    def __init__(self, original_policy, loop, forbid_get_event_loop,
+                 child_watcher="safe", reuse_child_watcher=False):
         self.original_policy = original_policy
         self.forbid_get_event_loop = forbid_get_event_loop
         self.loop = loop
         self.watcher = None
+        self.child_watcher = child_watcher
+        self.reuse_child_watcher = reuse_child_watcher
 
     # we override the loop from the original policy because we don't want to
     # instantiate a "default loop" that may be never closed (usually, we only
@@ -91,8 +141,17 @@ class _Policy(asyncio.AbstractEventLoopPolicy):
         self._check_unix()
         if self.loop:
             if self.watcher is None:
-                self.watcher = asyncio.SafeChildWatcher()
-                self.watcher.attach_loop(self.loop)
+                watcher_class = _get_child_watcher_class(self.child_watcher)
+                if self.reuse_child_watcher:
+                    watcher = _reused_watchers.get(watcher_class)
+                    if watcher is None:
+                        watcher = _reused_watchers[watcher_class] = \
+                            watcher_class()
+                else:
+                    watcher = watcher_class()
+
+                watcher.attach_loop(self.loop)
+                self.watcher = watcher
 
             return self.watcher
         else:
@@ -109,7 +168,13 @@ class _Policy(asyncio.AbstractEventLoopPolicy):
 
     def reset_watcher(self):
         if self.watcher:
-            self.watcher.close()
+            if _reused_watchers.get(type(self.watcher)) is self.watcher:
+                # keep the watcher and its state for the next tests, but
+                # detach it from the loop which is closed
+                self.watcher.attach_loop(None)
+            else:
+                self.watcher.close()
+
             # force the original policy to reissue a child watcher next time
             # get_child_watcher() is called, which effectively attach the loop
             # to the new watcher. That's the best we can do so far
@@ -136,6 +201,21 @@ class TestCase(unittest.TestCase):
     also up to the test author to close the loop and dispose the related
     resources.
 
+    If :attr:`~asynctest.TestCase.use_shared_executor` is set to ``True``, the
+    default executor of the loop is an executor shared by all the tests
+    instead of a new :class:`concurrent.futures.ThreadPoolExecutor` for each
+    test. Statistics about the work submitted to this executor during the test
+    are available in :attr:`~asynctest.TestCase.executor_stats`.
+
+    If :attr:`~asynctest.TestCase.use_inline_executor` is set to ``True``, the
+    default executor of the loop runs the calls synchronously in the loop
+    thread (see :class:`~asynctest.InlineExecutor`).
+
+    When the test starts a subprocess, the loop uses the child watcher selected
+    with :attr:`~asynctest.TestCase.child_watcher`. By default, a new
+    watcher is created for each test, unless
+    :attr:`~asynctest.TestCase.reuse_child_watcher` is set to ``True``.
+
     If :attr:`~asynctest.TestCase.forbid_get_event_loop` is set to ``True``,
     a call to :func:`asyncio.get_event_loop()` will raise an
     :exc:`AssertionError`. Since Python 3.6, calling
@@ -170,6 +250,14 @@ class TestCase(unittest.TestCase):
 
         ``ignore_loop`` has been deprecated in favor of the extensible
         :func:`~asynctest.fail_on` decorator.
+
+    .. versionadded:: 0.14
+
+        attributes :attr:`~asynctest.TestCase.use_shared_executor`,
+        :attr:`~asynctest.TestCase.executor_stats`,
+        :attr:`~asynctest.TestCase.use_inline_executor`,
+        :attr:`~asynctest.TestCase.child_watcher` and
+        :attr:`~asynctest.TestCase.reuse_child_watcher`.
     """
     #: If true, the loop used by the test case is the current default event
     #: loop returned by :func:`asyncio.get_event_loop()`. The loop will not be
@@ -181,9 +269,44 @@ class TestCase(unittest.TestCase):
     #: use a loop object explicitly passed around.
     forbid_get_event_loop = False
 
+    #: If true, the default executor of the loop is the
+    #: :class:`~asynctest.SharedExecutor` returned by
+    #: :func:`~asynctest.get_shared_executor()`. It is not shut down when the
+    #: loop is closed.
+    use_shared_executor = False
+
+    #: :class:`~asynctest.ExecutorStats` collecting statistics about the work
+    #: submitted to the shared executor during the test, ``None`` if
+    #: :attr:`~asynctest.TestCase.use_shared_executor` is false.
+    executor_stats = None
+
+    #: If true, the default executor of the loop is an
+    #: :class:`~asynctest.InlineExecutor`: functions passed to
+    #: :meth:`~asyncio.AbstractEventLoop.run_in_executor()` run synchronously
+    #: and the returned future is already resolved. It takes precedence over
+    #: :attr:`~asynctest.TestCase.use_shared_executor`.
+    use_inline_executor = False
+
+    #: Child watcher used by the loop of the test, if a subprocess is started.
+    #: It can be one of ``"safe"`` (:class:`asyncio.SafeChildWatcher`),
+    #: ``"fast"`` (:class:`asyncio.FastChildWatcher`), ``"threaded"``,
+    #: ``"multiloop"`` or ``"pidfd"`` (only available with recent versions of
+    #: Python), a child watcher class, or a sequence of them: the first one
+    #: available is used.
+    child_watcher = "safe"
+
+    #: If true, the child watcher is created once and attached to the loop of
+    #: each test using the same :attr:`~asynctest.TestCase.child_watcher`,
+    #: instead of being created and closed for each test.
+    reuse_child_watcher = False
+
     #: Event loop created and set as default event loop during the test.
     loop = None
 
+    # Default executor of the loop when use_default_loop is true, restored
+    # after the test
+    _original_executor = None
+
     def _init_loop(self):
         if self.use_default_loop:
             self.loop = asyncio.get_event_loop()
@@ -192,20 +315,44 @@ class TestCase(unittest.TestCase):
             loop = self.loop = asyncio.new_event_loop()
 
         policy = _Policy(asyncio.get_event_loop_policy(),
-                         loop, self.forbid_get_event_loop)
+                         loop, self.forbid_get_event_loop,
+                         self.child_watcher, self.reuse_child_watcher)
 
         asyncio.set_event_loop_policy(policy)
 
         self.loop = self._patch_loop(self.loop)
 
+        if self.use_default_loop and (self.use_inline_executor or
+                                      self.use_shared_executor):
+            # the loop is not owned by the test, its executor is restored by
+            # _unset_loop()
+            self._original_executor = getattr(self.loop, "_default_executor",
+                                              None)
+
+        if self.use_inline_executor:
+            if self.use_default_loop:
+                asynctest.executor._patch_run_in_executor(self.loop)
+
+            self.loop.set_default_executor(asynctest.executor.InlineExecutor())
+        elif self.use_shared_executor:
+            executor = asynctest.executor.get_shared_executor()
+            self.loop.set_default_executor(executor)
+            self.executor_stats = executor.reset_stats()
+
     def _unset_loop(self):
         policy = asyncio.get_event_loop_policy()
 
         if not self.use_default_loop:
+            asynctest.executor._detach_shared_executor(self.loop)
             if sys.version_info >= (3, 6):
                 self.loop.run_until_complete(self.loop.shutdown_asyncgens())
             self.loop.close()
             policy.reset_watcher()
+        else:
+            asynctest.executor._unpatch_run_in_executor(self.loop)
+            if self.use_inline_executor or self.use_shared_executor:
+                self.loop._default_executor = self._original_executor
+                self._original_executor = None
 
         asyncio.set_event_loop_policy(policy.original_policy)
         self.loop = None
@@ -230,6 +377,11 @@ class TestCase(unittest.TestCase):
         for method in ('run_forever', 'run_until_complete', ):
             setattr(loop, method, wraps(getattr(loop, method)))
 
+        if not self.use_default_loop:
+            # the default loop is patched only while a test uses an
+            # InlineExecutor, see _init_loop()
+            asynctest.executor._patch_run_in_executor(loop)
+
         if isinstance(loop, asyncio.selector_events.BaseSelectorEventLoop):
             loop._selector = asynctest.selector.TestSelector(loop._selector)
 
@@ -0,0 +1,272 @@
+# coding: utf-8
+"""
+Module ``executor``
+-------------------
+
+Executors which can be used as the default executor of the loop of
+a :class:`~asynctest.TestCase`.
+
+By default, each loop created for a test lazily creates its own
+:class:`concurrent.futures.ThreadPoolExecutor` the first time
+:meth:`~asyncio.AbstractEventLoop.run_in_executor()` is called with
+``None`` as executor. When the loop is closed, this executor is shut down
+without waiting for its threads, which may linger until the end of the run.
+
+When :attr:`~asynctest.TestCase.use_shared_executor` is ``True``, the loop uses
+a single :class:`~asynctest.SharedExecutor` shared by all the tests instead.
+The shared executor is shut down when the interpreter exits.
+
+When :attr:`~asynctest.TestCase.use_inline_executor` is ``True``, the loop uses
+an :class:`~asynctest.InlineExecutor`, which doesn't use threads at all.
+"""
+
+import atexit
+import concurrent.futures
+import functools
+import threading
+import time
+import types
+
+from . import _fail_on
+
+
+class ExecutorStats:
+    """
+    Statistics about the work submitted to a :class:`~asynctest.SharedExecutor`
+    while the object is the current statistics object of the executor.
+
+    Durations are measured with :func:`time.monotonic()`.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self):
+        #: Number of calls submitted to the executor.
+        self.submitted = 0
+        #: Number of calls which returned or raised an exception.
+        self.completed = 0
+        #: Number of calls currently running in a thread of the executor.
+        self.running = 0
+        #: Highest value of :attr:`running`.
+        self.max_concurrency = 0
+        #: Sum of the time spent by calls waiting for a free thread.
+        self.total_queue_wait = 0.
+        #: Longest time spent by a call waiting for a free thread.
+        self.max_queue_wait = 0.
+        self._pending = {}
+
+    @property
+    def mean_queue_wait(self):
+        """
+        Average time spent by a call waiting for a free thread.
+        """
+        started = self.completed + self.running
+        return self.total_queue_wait / started if started else 0.
+
+    @property
+    def pending(self):
+        """
+        Tuple of the functions submitted to the executor which are still queued
+        or running.
+        """
+        return tuple(self._pending.values())
+
+    def __repr__(self):
+        return ("<ExecutorStats submitted={} completed={} max_concurrency={} "
+                "max_queue_wait={:.3f}>".format(
+                    self.submitted, self.completed, self.max_concurrency,
+                    self.max_queue_wait))
+
+
+class SharedExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    A :class:`concurrent.futures.ThreadPoolExecutor` collecting statistics
+    about the calls it runs.
+
+    The statistics are collected in :attr:`stats`, which is replaced by a new
+    :class:`~asynctest.ExecutorStats` object each time :meth:`reset_stats()` is
+    called (:class:`~asynctest.TestCase` does it before each test). A call is
+    always accounted in the statistics object which was current when it has
+    been submitted.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        #: Current :class:`~asynctest.ExecutorStats` object.
+        self.stats = ExecutorStats()
+
+    def reset_stats(self):
+        """
+        Start to collect statistics in a new
+        :class:`~asynctest.ExecutorStats` object, and return it.
+        """
+        self.stats = ExecutorStats()
+        return self.stats
+
+    def submit(self, fn, *args, **kwargs):
+        stats = self.stats
+        future = super().submit(self._run, stats, time.monotonic(), fn, *args,
+                                **kwargs)
+
+        with self._stats_lock:
+            stats.submitted += 1
+            stats._pending[future] = fn
+
+        future.add_done_callback(
+            lambda future: self._forget(stats, future))
+
+        return future
+
+    submit.__doc__ = concurrent.futures.Executor.submit.__doc__
+
+    def _run(self, stats, submitted_at, fn, *args, **kwargs):
+        queue_wait = time.monotonic() - submitted_at
+
+        with self._stats_lock:
+            stats.total_queue_wait += queue_wait
+            stats.max_queue_wait = max(stats.max_queue_wait, queue_wait)
+            stats.running += 1
+            stats.max_concurrency = max(stats.max_concurrency, stats.running)
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._stats_lock:
+                stats.running -= 1
+                stats.completed += 1
+
+    def _forget(self, stats, future):
+        with self._stats_lock:
+            stats._pending.pop(future, None)
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """
+    An executor running the submitted calls synchronously, in the thread
+    calling :meth:`submit()`.
+
+    When it is used by the loop of a :class:`~asynctest.TestCase`,
+    :meth:`~asyncio.AbstractEventLoop.run_in_executor()` returns an
+    :class:`asyncio.Future` which is already resolved: there is no thread
+    involved and the loop doesn't have to be woken up by another thread. This
+    makes tests relying on short blocking calls run faster and in
+    a deterministic order.
+
+    :param deferred: if ``True``, when used by the loop of
+                     a :class:`~asynctest.TestCase`, calls are not executed
+                     immediately but scheduled on the loop with
+                     :meth:`~asyncio.AbstractEventLoop.call_soon()`, as if they
+                     were executed by another thread returning immediately.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, deferred=False):
+        self.deferred = deferred
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        future = concurrent.futures.Future()
+        _run_in_future(future, fn, args, kwargs)
+        return future
+
+    submit.__doc__ = concurrent.futures.Executor.submit.__doc__
+
+    def shutdown(self, wait=True):
+        self._shutdown = True
+
+    def _run_in_loop(self, loop, fn, *args):
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        future = loop.create_future()
+        if self.deferred:
+            loop.call_soon(_run_in_future, future, fn, args, {})
+        else:
+            _run_in_future(future, fn, args, {})
+
+        return future
+
+
+def _run_in_future(future, fn, args, kwargs):
+    if future.cancelled():
+        return
+
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+def _patch_run_in_executor(loop):
+    # run_in_executor() wraps the concurrent.futures.Future returned by the
+    # executor, and the result is always transferred to the loop with
+    # call_soon_threadsafe(). This is useless with an InlineExecutor.
+    run_in_executor = loop.run_in_executor
+
+    @functools.wraps(run_in_executor)
+    def wrapper(self, executor, func, *args):
+        if executor is None:
+            executor = getattr(loop, "_default_executor", None)
+
+        if isinstance(executor, InlineExecutor):
+            if loop.is_closed():
+                raise RuntimeError("Event loop is closed")
+
+            return executor._run_in_loop(loop, func, *args)
+
+        return run_in_executor(executor, func, *args)
+
+    loop.run_in_executor = types.MethodType(wrapper, loop)
+
+
+def _unpatch_run_in_executor(loop):
+    loop.__dict__.pop("run_in_executor", None)
+
+
+_shared_executor = None
+
+
+def get_shared_executor():
+    """
+    Return the :class:`~asynctest.SharedExecutor` shared by the tests,
+    creating it if needed.
+
+    The executor is shut down when the interpreter exits.
+
+    .. versionadded:: 0.14
+    """
+    global _shared_executor
+
+    if _shared_executor is None:
+        _shared_executor = SharedExecutor()
+        atexit.register(_shared_executor.shutdown)
+
+    return _shared_executor
+
+
+def _detach_shared_executor(loop):
+    # Prevents loop.close() from shutting down the shared executor
+    if _shared_executor is not None and \
+            getattr(loop, "_default_executor", None) is _shared_executor:
+        loop._default_executor = None
+
+
+def fail_on_active_executor_work(case):
+    executor = getattr(case.loop, "_default_executor", None)
+    if not isinstance(executor, SharedExecutor):
+        return
+
+    pending = executor.stats.pending
+    if pending:
+        case.fail("Executor contained unfinished work {!r}".format(pending))
+
+
+_fail_on.DEFAULTS["active_executor_work"] = False
+_fail_on._fail_on.active_executor_work = staticmethod(
+    fail_on_active_executor_work)
@@ -12,13 +12,27 @@ A mock can behave as a coroutine, as specified in the documentation of
 
 import asyncio
 import asyncio.coroutines
-import contextlib
+import collections
 import enum
 import functools
+import heapq
 import inspect
+import io
+import itertools
+import os
+import pickle
+import random
 import sys
+import threading
 import types
 import unittest.mock
+import weakref
+
+if sys.version_info >= (3, 7):
+    # asyncio runs each task in its own context since python 3.7
+    import contextvars
+else:
+    contextvars = None
 
 
 # From python 3.6, a sentinel object is used to mark coroutines (rather than
@@ -32,20 +46,87 @@ except AttributeError:
 
 class _AsyncIterator:
     """
-    Wraps an iterator in an asynchronous iterator.
+    Wraps an iterator or an asynchronous iterator in an asynchronous iterator,
+    which waits ``delay`` on the loop before returning each item.
     """
-    def __init__(self, iterator):
+    def __init__(self, iterator, delay=None):
         self.iterator = iterator
+        self.delay = delay
 
     def __aiter__(self):
         return self
 
     async def __anext__(self):
-        try:
-            return next(self.iterator)
-        except StopIteration:
-            pass
-        raise StopAsyncIteration
+        if hasattr(self.iterator, '__anext__'):
+            item = await self.iterator.__anext__()
+        else:
+            try:
+                item = next(self.iterator)
+            except StopIteration:
+                raise StopAsyncIteration from None
+
+        delay = self.delay
+        if delay is not None:
+            if isinstance(delay, Latency):
+                delay = delay.sample()
+            await asyncio.sleep(delay)
+
+        return item
+
+
+try:
+    _isasyncgenfunction = inspect.isasyncgenfunction
+except AttributeError:
+    # async generators are not available before python 3.6
+    def _isasyncgenfunction(obj):
+        return False
+
+
+def _iter_stream(source):
+    # Return an iterator or an asynchronous iterator over the items of source.
+    # A generator function (or async generator function) is called, so
+    # a new stream is produced each time the source is iterated.
+    if inspect.isgeneratorfunction(source) or _isasyncgenfunction(source):
+        source = source()
+
+    if (hasattr(type(source), '__aiter__') and
+            not unittest.mock._is_instance_mock(source)):
+        return source.__aiter__()
+
+    return iter(source)
+
+
+class _AsyncStream:
+    # Asynchronous iterable returned by async_stream().
+    def __init__(self, source, delay):
+        self.source = source
+        self.delay = delay
+
+    def __aiter__(self):
+        return _AsyncIterator(_iter_stream(self.source), self.delay)
+
+
+def async_stream(source, delay=None):
+    """
+    Return an asynchronous iterable over the items of ``source``, which can
+    be used as ``return_value`` of ``__aiter__`` of
+    a :class:`~asynctest.MagicMock` or passed to the code under test.
+
+    Items are produced one at a time, so a stream can be large without being
+    held in memory.
+
+    :param source: an iterable, an asynchronous iterable, or a generator
+                   function (or an async generator function) called each time
+                   the stream is iterated.
+    :param delay: time waited on the loop before each item is returned, as
+                  a number of seconds or a :class:`~asynctest.Latency`.
+
+    .. versionadded:: 0.14
+    """
+    if delay is not None and not isinstance(delay, Latency):
+        _check_delays(delay)
+
+    return _AsyncStream(source, delay)
 
 
 # magic methods which must be coroutine functions
@@ -65,7 +146,9 @@ def _get_async_iter(mock):
     Factory of ``__aiter__`` magic methods for a MagicMock.
 
     It creates a function which returns an asynchronous iterator based on the
-    return value of ``mock.__aiter__``.
+    return value of ``mock.__aiter__``, which can be an iterable, an
+    asynchronous iterable or a generator function (or an async generator
+    function), see :func:`~asynctest.async_stream()`.
 
     Since __aiter__ used could be a coroutine in Python 3.5 and 3.6, we also
     support this case.
@@ -77,7 +160,7 @@ def _get_async_iter(mock):
         if return_value is DEFAULT:
             iterator = iter([])
         else:
-            iterator = iter(return_value)
+            iterator = _iter_stream(return_value)
 
         return _AsyncIterator(iterator)
 
@@ -97,10 +180,6 @@ _async_magics = set(_async_magics)
 # probably better than overriding __set/get/del attr__ everywhere.
 unittest.mock._all_magics |= _async_magics
 
-def _raise(exception):
-    raise exception
-
-
 def _make_native_coroutine(coroutine):
     """
     Wrap a coroutine (or any function returning an awaitable) in a native
@@ -124,6 +203,12 @@ def _is_started(patching):
         return unittest.mock._is_started(patching)
 
 
+# Results of FakeInheritanceMeta.__instancecheck__() when the actual type
+# check fails, by mock class of the tested object (or its type if it is not
+# a mock) and then by tested class.
+_fake_inheritance_cache = weakref.WeakKeyDictionary()
+
+
 class FakeInheritanceMeta(type):
     """
     A metaclass which recreates the original inheritance model from
@@ -133,22 +218,28 @@ class FakeInheritanceMeta(type):
     - NonCallable > Mock
     - Mock > MagicMock
     """
-    def __init__(self, name, bases, attrs):
-        attrs['__new__'] = types.MethodType(self.__new, self)
-        super().__init__(name, bases, attrs)
-
-    @staticmethod
-    def __new(cls, *args, **kwargs):
-        new = type(cls.__name__, (cls, ), {'__doc__': cls.__doc__})
-        return object.__new__(new, *args, **kwargs)
-
     def __instancecheck__(cls, obj):
         # That's tricky, each type(mock) is actually a subclass of the actual
-        # Mock type (see __new__)
+        # Mock type (see _new_mock())
         if super().__instancecheck__(obj):
             return True
 
+        # The class of each mock derives from its mock class (see
+        # _new_mock()), which gives the result
         _type = type(obj)
+        _type = _type.__dict__.get('_mock_class', _type)
+        try:
+            results = _fake_inheritance_cache[_type]
+        except KeyError:
+            results = _fake_inheritance_cache[_type] = {}
+
+        try:
+            return results[cls]
+        except KeyError:
+            result = results[cls] = cls._fake_subclasscheck(_type)
+            return result
+
+    def _fake_subclasscheck(cls, _type):
         if issubclass(cls, NonCallableMock):
             if issubclass(_type, (NonCallableMagicMock, Mock, )):
                 return True
@@ -160,6 +251,345 @@ class FakeInheritanceMeta(type):
         return False
 
 
+# Magic methods which are supported by a shared base of the class of a mock
+# (see _new_mock()): they are resolved on the instance by a _SharedMagicProxy.
+_shareable_magics = frozenset(unittest.mock._magics | _async_magics)
+
+
+class _SharedMagicProxy:
+    """
+    Descriptor of a magic method in the class of a mock, resolving the magic
+    method configured on the instance, or creating it on first access.
+
+    It replaces :class:`unittest.mock.MagicProxy`, which is bound to a single
+    instance.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, _type=None):
+        if obj is None:
+            return self
+
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            pass
+
+        entry = self.name
+        m = obj._get_child_mock(name=entry, _new_name=entry, _new_parent=obj)
+        setattr(obj, entry, m)
+        unittest.mock._set_return_value(obj, m, entry)
+        return m
+
+
+def _new_mock_class(cls, magics):
+    namespace = {
+        '__doc__': cls.__doc__,
+        '_mock_class': cls,
+        '_mock_magics': magics,
+    }
+
+    for entry in magics:
+        namespace[entry] = _SharedMagicProxy(entry)
+
+    return type(cls)(cls.__name__, (cls, ), namespace)
+
+
+def _get_shared_class(cls, magics):
+    try:
+        classes = cls.__dict__['_mock_shared_classes']
+    except KeyError:
+        classes = {}
+        type.__setattr__(cls, '_mock_shared_classes', classes)
+
+    try:
+        return classes[magics]
+    except KeyError:
+        shared = classes[magics] = _new_mock_class(cls, magics)
+        return shared
+
+
+def _new_mock(cls, *args, **kwargs):
+    # As with unittest.mock, each mock has a class of its own, which can be
+    # modified by the test (type(mock).attr = PropertyMock()). The magic
+    # methods are not set on this class, which is cheap to create, but on its
+    # base, shared by the mocks supporting the same magic methods.
+    cls = cls.__dict__.get('_mock_class', cls)
+    magics, spec_metadata = _new_mock_magics(cls, args, kwargs)
+    shared = _get_shared_class(cls, magics)
+    namespace = {'__doc__': cls.__doc__, '_mock_class': cls}
+    # the __new__() methods of the metaclasses only configure the base classes
+    klass = type.__new__(type(cls), cls.__name__, (shared, ), namespace)
+    mock = object.__new__(klass)
+    if spec_metadata is not None:
+        # used by _mock_add_spec() when __init__() sets the spec
+        mock.__dict__['_mock_new_spec_metadata'] = spec_metadata
+
+    return mock
+
+
+def _new_mock_magics(cls, args, kwargs):
+    # Magic methods supported by a new mock of class cls, known in advance
+    # when possible: changing them later (see _mock_set_class_magics()) is
+    # more expensive than creating the class. The metadata of the spec read
+    # to find them is returned too, with the spec, so _mock_add_spec() does
+    # not look it up again.
+    if not issubclass(cls, AsyncMagicMixin):
+        return frozenset(), None
+
+    spec = kwargs.get('spec_set')
+    if spec is None:
+        spec = args[0] if args else kwargs.get('spec')
+
+    if spec is None:
+        return _shareable_magics, None
+    elif unittest.mock._is_list(spec):
+        return _shareable_magics.intersection(spec), None
+    elif isinstance(spec, (type, types.FunctionType)):
+        metadata = _get_spec_metadata(spec)
+        return metadata.magics, (spec, metadata)
+
+    # the metadata of other specs is not cached
+    return _shareable_magics, None
+
+
+def _mock_set_class_magics(mock, magics):
+    """
+    Set the magic methods supported by the class of ``mock``.
+    """
+    _type = type(mock)
+    if magics != _type._mock_magics:
+        _type.__bases__ = (_get_shared_class(_type._mock_class, magics), )
+
+
+def _mock_setattr(self, name, value):
+    if name in _shareable_magics:
+        _mock_methods = getattr(self, '_mock_methods', None)
+        if _mock_methods is None or name in _mock_methods:
+            _mock_set_class_magics(self, type(self)._mock_magics | {name})
+
+            if not unittest.mock._is_instance_mock(value):
+                original = value
+
+                def value(*args, **kwargs):
+                    return original(self, *args, **kwargs)
+            else:
+                unittest.mock._check_and_set_parent(self, value, None, name)
+                self._mock_children[name] = value
+
+            return object.__setattr__(self, name, value)
+
+    return unittest.mock.NonCallableMock.__setattr__(self, name, value)
+
+
+def _mock_delattr(self, name):
+    _type = type(self)
+    if name in _type._mock_magics:
+        _mock_set_class_magics(self, _type._mock_magics - {name})
+        if name not in _type.__dict__ and name not in self.__dict__:
+            return
+
+    return unittest.mock.NonCallableMock.__delattr__(self, name)
+
+
+class _SpecAttributes(list):
+    """
+    The names of the attributes of a spec, as returned by :func:`dir()`, with
+    a membership test in constant time.
+
+    It is shared by all the mocks of a given spec, and must not be modified.
+    """
+    def __init__(self, names):
+        super().__init__(names)
+        self._names = frozenset(self)
+
+    def __contains__(self, name):
+        return name in self._names
+
+
+class _SpecMetadata:
+    """
+    Information about a spec which is used when a mock is created.
+
+    The metadata of types and functions is cached (see _get_spec_metadata()),
+    so it must not keep references to the spec or to its attributes.
+    """
+    def __init__(self, spec):
+        self.attributes = _SpecAttributes(dir(spec))
+        self.coroutines = frozenset(
+            attr for attr in self.attributes
+            if asyncio.iscoroutinefunction(getattr(spec, attr)))
+        # magic methods supported by a MagicMock
+        self.magics = _shareable_magics.intersection(self.attributes._names)
+        # true when the cached metadata can't be used anymore
+        self.stale = False
+        self._signatures = {}
+
+    def signature(self, spec, as_instance, eat_self):
+        """
+        Return a tuple ``(checksig, signature)`` where ``checksig`` is
+        a function checking that its arguments match the signature of
+        ``spec``, or ``None`` if ``spec`` has no signature.
+        """
+        key = (bool(as_instance), bool(eat_self))
+        try:
+            return self._signatures[key]
+        except KeyError:
+            pass
+
+        result = unittest.mock._get_signature_object(spec, as_instance,
+                                                     eat_self)
+        if result is not None:
+            func, sig = result
+
+            def checksig(*args, **kwargs):
+                sig.bind(*args, **kwargs)
+
+            unittest.mock._copy_func_details(func, checksig)
+            result = (checksig, sig)
+
+        self._signatures[key] = result
+        return result
+
+
+# Metadata of the types and functions used as specs, by spec and by version
+# of the spec (see _spec_version())
+_spec_metadata_cache = weakref.WeakKeyDictionary()
+
+# Versions of a spec kept in the cache, for instance the metadata of a class
+# and of the class with a patched attribute
+_SPEC_METADATA_VERSIONS = 4
+
+
+def _spec_namespaces(spec):
+    # The namespaces holding the attributes of a type or a function
+    if isinstance(spec, type):
+        return [vars(klass) for klass in spec.__mro__ if klass is not object]
+
+    return [vars(spec)]
+
+
+def _spec_version(spec):
+    # A value which changes when an attribute of spec (or of a base class of
+    # spec) is added or deleted, or patched by asynctest, computed without
+    # looking at every attribute. A value replaced in place (same size of the
+    # namespace) is detected by _watch_spec_values() when the previous value
+    # is destroyed.
+    if not isinstance(spec, type):
+        return (len(vars(spec)), id(spec.__code__), id(spec.__defaults__),
+                id(spec.__kwdefaults__))
+
+    version = []
+    for klass in spec.__mro__:
+        if klass is object:
+            continue
+
+        namespace = vars(klass)
+        version.append(len(namespace))
+        overrides = _spec_overrides.get(klass) if _spec_overrides else None
+        if overrides:
+            version.append(tuple(sorted(
+                (name, id(namespace.get(name))) for name in overrides)))
+
+    return tuple(version)
+
+
+# Attributes of classes currently patched by asynctest, by class, with the
+# number of patches of each attribute: the identities of their values are
+# part of the version of the classes (see _spec_version()).
+_spec_overrides = weakref.WeakKeyDictionary()
+
+
+def _override_spec_attribute(target, attribute):
+    # Called when an attribute of target is patched
+    if isinstance(target, type):
+        overrides = _spec_overrides.get(target)
+        if overrides is None:
+            overrides = _spec_overrides[target] = {}
+
+        overrides[attribute] = overrides.get(attribute, 0) + 1
+
+
+def _restore_spec_attribute(target, attribute):
+    # Called when a patch of an attribute of target is stopped: once all the
+    # patches are stopped, the version of target is the one it had before
+    overrides = _spec_overrides.get(target) if isinstance(
+        target, type) else None
+    if not overrides or attribute not in overrides:
+        return
+
+    overrides[attribute] -= 1
+    if not overrides[attribute]:
+        del overrides[attribute]
+        if not overrides:
+            del _spec_overrides[target]
+
+
+def _watch_spec_values(spec, metadata):
+    # Mark the metadata as stale when a value of an attribute of spec is
+    # destroyed, as its identifier may be reused by the new value of the
+    # attribute.
+    def discard(ref):
+        metadata.stale = True
+
+    watchers = []
+    for namespace in _spec_namespaces(spec):
+        for value in namespace.values():
+            try:
+                watchers.append(weakref.ref(value, discard))
+            except TypeError:
+                pass
+
+    metadata._watchers = watchers
+
+
+def _get_spec_metadata(spec):
+    if not isinstance(spec, (type, types.FunctionType)):
+        # The attributes of other objects (modules, instances, ...) are likely
+        # to be modified, so their metadata is not cached.
+        return _SpecMetadata(spec)
+
+    try:
+        versions = _spec_metadata_cache[spec]
+    except KeyError:
+        versions = _spec_metadata_cache[spec] = {}
+    except TypeError:
+        # spec is not hashable
+        return _SpecMetadata(spec)
+
+    version = _spec_version(spec)
+    metadata = versions.get(version)
+    if metadata is not None and not metadata.stale:
+        return metadata
+
+    metadata = _SpecMetadata(spec)
+    _watch_spec_values(spec, metadata)
+    versions.pop(version, None)
+    versions[version] = metadata
+    if len(versions) > _SPEC_METADATA_VERSIONS:
+        del versions[next(iter(versions))]
+
+    return metadata
+
+
+def _check_signature(spec, mock, skipfirst, instance=False,
+                     metadata=None):
+    # Like unittest.mock._check_signature(), but configures the instance
+    # rather than its class, which may be shared.
+    if metadata is None:
+        metadata = _get_spec_metadata(spec)
+
+    signature = metadata.signature(spec, instance, skipfirst)
+    if signature is None:
+        return
+
+    checksig, sig = signature
+    mock.__dict__['_mock_check_sig'] = checksig
+    if sys.version_info >= (3, 7):
+        mock.__dict__['__signature__'] = sig
+
+
 def _get_is_coroutine(self):
     return self.__dict__['_mock_is_coroutine']
 
@@ -172,23 +602,731 @@ def _set_is_coroutine(self, value):
 
 
 # _mock_add_spec() is the actual private implementation in unittest.mock, we
-# override it to support coroutines in the metaclass.
-def _mock_add_spec(self, spec, *args, **kwargs):
-    unittest.mock.NonCallableMock._mock_add_spec(self, spec, *args, **kwargs)
+# override it to support coroutines in the metaclass, and to reuse the
+# metadata of the spec.
+def _mock_add_spec(self, spec, spec_set, _spec_as_instance=False,
+                   _eat_self=False):
+    if spec is None or unittest.mock._is_list(spec):
+        unittest.mock.NonCallableMock._mock_add_spec(
+            self, spec, spec_set, _spec_as_instance, _eat_self)
+        self.__dict__['_spec_coroutines'] = frozenset()
+        return
+
+    if isinstance(spec, type):
+        _spec_class = spec
+    else:
+        _spec_class = unittest.mock._get_class(spec)
+
+    __dict__ = self.__dict__
+    spec_metadata = __dict__.pop('_mock_new_spec_metadata', None)
+    if spec_metadata is not None and spec_metadata[0] is spec:
+        metadata = spec_metadata[1]
+    else:
+        metadata = _get_spec_metadata(spec)
+
+    signature = metadata.signature(spec, _spec_as_instance, _eat_self)
+
+    __dict__['_spec_class'] = _spec_class
+    __dict__['_spec_set'] = spec_set
+    __dict__['_spec_signature'] = signature and signature[1]
+    __dict__['_mock_methods'] = metadata.attributes
+    __dict__['_spec_coroutines'] = metadata.coroutines
+
+
+# Documented in doc/asynctest.mock.rst
+Recording = enum.Enum('Recording', 'FULL BOUNDED COUNTERS INDEXED')
+
+
+class _CallHistogram:
+    """
+    Number of calls recorded by a mock, by arguments: ``histogram[call(...)]``
+    is the number of calls with these arguments.
+    """
+    def __init__(self):
+        # hashable arguments -> [call, count]
+        self._counts = {}
+        # [call, count] of calls with unhashable arguments
+        self._unhashable = []
+
+    def add(self, call):
+        key = _call_key(call)
+        if key is not None:
+            try:
+                self._counts[key][1] += 1
+            except KeyError:
+                self._counts[key] = [call, 1]
+            return
+
+        for entry in self._unhashable:
+            if entry[0] == call:
+                entry[1] += 1
+                return
+
+        self._unhashable.append([call, 1])
+
+    def __getitem__(self, call):
+        key = _call_key(call)
+        if key is not None:
+            entry = self._counts.get(key)
+            return 0 if entry is None else entry[1]
+
+        for recorded, count in self._unhashable:
+            if recorded == call:
+                return count
+
+        return 0
+
+    def __len__(self):
+        return len(self._counts) + len(self._unhashable)
+
+    def items(self):
+        """
+        Return the list of tuples ``(call, count)``.
+        """
+        return [tuple(entry) for entry in self._counts.values()] + [
+            tuple(entry) for entry in self._unhashable]
+
+    def most_common(self, n=None):
+        """
+        Return the list of the ``n`` most common tuples ``(call, count)``, see
+        :meth:`collections.Counter.most_common()`.
+        """
+        items = sorted(self.items(), key=lambda item: item[1], reverse=True)
+        return items if n is None else items[:n]
+
+    def __repr__(self):
+        return "<CallHistogram {!r}>".format(self.items())
+
+
+def _call_key(call):
+    # Hashable key of the arguments of a call, or None if the arguments are
+    # not hashable.
+    args, kwargs = call[-2:]
+    try:
+        key = (args, frozenset(kwargs.items()))
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+class _RecordingCallList(unittest.mock._CallList):
+    # A list of calls which keeps all the calls appended (none if maxlen is
+    # 0), and counts them in histogram.
+    def __init__(self, maxlen, histogram):
+        super().__init__()
+        self.maxlen = maxlen
+        self.histogram = histogram
+
+    def append(self, call):
+        if self.histogram is not None:
+            self.histogram.add(call)
+
+        if self.maxlen is None:
+            list.append(self, call)
+
+    def clear(self):
+        list.clear(self)
+        if self.histogram is not None:
+            self.histogram = _CallHistogram()
+
+
+class _BoundedCallList(collections.deque):
+    # A list of calls which keeps the last maxlen calls appended, and counts
+    # them in histogram. The oldest call is discarded in constant time. It
+    # behaves as the list of its calls for comparisons, slices and the
+    # containment of sublists.
+    def __init__(self, maxlen, histogram):
+        super().__init__((), maxlen)
+        self.histogram = histogram
+
+    def append(self, call):
+        if self.histogram is not None:
+            self.histogram.add(call)
+
+        super().append(call)
+
+    def clear(self):
+        super().clear()
+        if self.histogram is not None:
+            self.histogram = _CallHistogram()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+
+        return super().__getitem__(index)
+
+    def __contains__(self, value):
+        return unittest.mock._CallList(self).__contains__(value)
+
+    def __eq__(self, other):
+        if isinstance(other, collections.deque):
+            other = list(other)
+
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    __repr__ = unittest.mock._CallList.__repr__
+
+
+class _IndexedCallList(_RecordingCallList):
+    # A list of calls which keeps all the calls appended, and an index of
+    # their positions by arguments. The index is updated when the list is
+    # searched, so appending a call stays cheap.
+    #
+    # The index only selects candidates: a call is found when it is equal to
+    # a candidate, so a call which can not be found with the index (for
+    # instance because it contains ANY) must be searched in the whole list.
+    def __init__(self, histogram):
+        super().__init__(None, histogram)
+        self._index = {}
+        self._unhashable = []
+        self._indexed = 0
+
+    def clear(self):
+        super().clear()
+        self._index, self._unhashable, self._indexed = {}, [], 0
+
+    def _candidates(self, call):
+        # positions of the calls which may be equal to call, in order
+        if self._indexed > len(self):
+            # the list has been modified
+            self._index, self._unhashable, self._indexed = {}, [], 0
+
+        for position in range(self._indexed, len(self)):
+            key = _call_key(self[position])
+            if key is None:
+                self._unhashable.append(position)
+            else:
+                self._index.setdefault(key, []).append(position)
+        self._indexed = len(self)
+
+        key = _call_key(call)
+        if key is None:
+            return range(len(self))
+
+        positions = self._index.get(key, [])
+        if self._unhashable:
+            return list(heapq.merge(positions, self._unhashable))
+
+        return positions
+
+    def contains_call(self, call):
+        # like "call in self"
+        return any(call == self[position]
+                   for position in self._candidates(call))
+
+    def contains_calls(self, calls, any_order=False):
+        # like the test of assert_has_calls(): calls are a sublist of self,
+        # or are all in self if any_order is True
+        calls = list(calls)
+        if not calls:
+            return True
+
+        if any_order:
+            used = set()
+            for call in calls:
+                for position in self._candidates(call):
+                    if position not in used and self[position] == call:
+                        used.add(position)
+                        break
+                else:
+                    return False
+
+            return True
+
+        length = len(calls)
+        for start in self._candidates(calls[0]):
+            if start + length > len(self):
+                break
+
+            if all(self[start + i] == calls[i] for i in range(length)):
+                return True
+
+        return False
+
+
+def _is_indexed(mock, calls):
+    # True if the calls of mock can be searched with the index of calls
+    return (type(calls) is _IndexedCallList and
+            mock.__dict__.get('_spec_signature') is None)
+
+
+def _mock_assert_any_call(self, *args, **kwargs):
+    """
+    See :func:`unittest.mock.Mock.assert_any_call()`
+    """
+    calls = self.call_args_list
+    if _is_indexed(self, calls) and calls.contains_call(
+            unittest.mock._Call((args, kwargs), two=True)):
+        return
+
+    return unittest.mock.NonCallableMock.assert_any_call(self, *args, **kwargs)
+
+
+def _mock_assert_has_calls(self, calls, any_order=False):
+    """
+    See :func:`unittest.mock.Mock.assert_has_calls()`
+    """
+    mock_calls = self.mock_calls
+    if _is_indexed(self, mock_calls) and mock_calls.contains_calls(
+            calls, any_order):
+        return
+
+    return unittest.mock.NonCallableMock.assert_has_calls(self, calls,
+                                                          any_order)
+
+
+# Lists of calls of a mock, by name in the __dict__ of the mock, and whether
+# a histogram of the calls can be kept.
+_recorded_lists = (
+    ('_mock_call_args_list', True),
+    ('_mock_mock_calls', False),
+    ('method_calls', False),
+    ('_mock_await_args_list', True),
+    ('_mock_await_timings', False),
+)
+
+
+def _mock_install_recording(mock):
+    # Replace the lists of calls of mock according to its recording mode. The
+    # last calls recorded are kept if the new mode allows it.
+    attributes = mock.__dict__
+    recording = attributes.get('_mock_recording')
+    if recording is None:
+        mode, maxlen, histogram = Recording.FULL, None, False
+    else:
+        mode, maxlen, histogram = recording
+
+    if mode is Recording.COUNTERS:
+        maxlen = 0
+
+    for name, counted in _recorded_lists:
+        calls = attributes.get(name)
+        if calls is None:
+            continue
+
+        if recording is None:
+            new = unittest.mock._CallList(calls)
+        elif mode is Recording.INDEXED:
+            new = _IndexedCallList(
+                _CallHistogram() if histogram and counted else None)
+            list.extend(new, calls)
+        elif mode is Recording.BOUNDED:
+            new = _BoundedCallList(
+                maxlen, _CallHistogram() if histogram and counted else None)
+            collections.deque.extend(new, calls)
+        else:
+            new = _RecordingCallList(
+                maxlen, _CallHistogram() if histogram and counted else None)
+            if maxlen is None:
+                list.extend(new, calls)
+
+        attributes[name] = new
+
+
+def _mock_set_recording(self, mode, maxlen=None, histogram=False):
+    """
+    Select how the calls (and awaits) of the mock are recorded.
+
+    With :attr:`Recording.FULL <asynctest.Recording>`, the default, all calls
+    are kept in :attr:`call_args_list`, :attr:`mock_calls`,
+    :attr:`method_calls` and :attr:`await_args_list`.
+
+    With :attr:`Recording.BOUNDED <asynctest.Recording>`, these lists only
+    keep the last ``maxlen`` calls.
+
+    With :attr:`Recording.COUNTERS <asynctest.Recording>`, these lists stay
+    empty: only :attr:`call_count`, :attr:`await_count`, :attr:`call_args`
+    and :attr:`await_args` are updated.
+
+    With :attr:`Recording.INDEXED <asynctest.Recording>`, all calls are kept
+    and indexed by arguments, so :meth:`assert_any_call`,
+    :meth:`assert_has_calls`, :meth:`assert_any_await` and
+    :meth:`assert_has_awaits` don't scan the whole lists when the calls are
+    found. The index is not used when the mock has a spec with a signature.
+
+    The mode is also set on the children of the mock, including the ones
+    created later, and is kept by :meth:`reset_mock`. A mock stub called
+    a large number of times in a long-running test can then be checked
+    without keeping all its calls in memory. Assertions which look for a call
+    in the lists (like :meth:`assert_any_call`) only see the recorded calls.
+
+    :param mode: a value of :class:`asynctest.Recording`.
+    :param maxlen: number of calls kept with ``Recording.BOUNDED``.
+    :param histogram: if ``True``, the number of calls by arguments is
+                      counted in ``call_args_list.histogram`` and
+                      ``await_args_list.histogram``. ``histogram[call(...)]``
+                      returns the number of calls with these arguments (which
+                      must be equal, not only match with
+                      :data:`~asynctest.ANY`), and ``histogram.most_common()``
+                      the tuples ``(call, count)`` sorted by count.
+
+    .. versionadded:: 0.14
+    """
+    if not isinstance(mode, Recording):
+        raise ValueError("mode must be a value of asynctest.Recording")
+
+    if mode is Recording.BOUNDED:
+        if maxlen is None or maxlen < 1:
+            raise ValueError("Recording.BOUNDED requires a positive maxlen")
+    elif maxlen is not None:
+        raise ValueError("maxlen is only used with Recording.BOUNDED")
+
+    if mode is Recording.FULL and not histogram:
+        self.__dict__.pop('_mock_recording', None)
+    else:
+        self.__dict__['_mock_recording'] = (mode, maxlen, bool(histogram))
+
+    _mock_install_recording(self)
+
+    children = list(self._mock_children.values())
+    return_value = self.__dict__.get('_mock_return_value')
+    if return_value is not self:
+        children.append(return_value)
+
+    for child in children:
+        if isinstance(type(child), MockMetaMixin):
+            _mock_set_recording(child, mode, maxlen, histogram)
+
+
+def _mock_inherit_recording(parent, child):
+    # Set the recording mode of parent on its new child
+    recording = parent.__dict__.get('_mock_recording')
+    if recording is not None and isinstance(type(child), MockMetaMixin):
+        _mock_set_recording(child, *recording)
 
-    _spec_coroutines = []
-    for attr in dir(spec):
-        if asyncio.iscoroutinefunction(getattr(spec, attr)):
-            _spec_coroutines.append(attr)
 
-    self.__dict__['_spec_coroutines'] = _spec_coroutines
+def _mock_reset_mock(self, *args, **kwargs):
+    """
+    See :func:`unittest.mock.Mock.reset_mock()`
+    """
+    unittest.mock.NonCallableMock.reset_mock(self, *args, **kwargs)
+    if '_mock_recording' in self.__dict__:
+        _mock_install_recording(self)
+
+
+class _MockSnapshot:
+    """
+    Configuration of a tree of mocks, returned by
+    :meth:`~asynctest.Mock.mock_snapshot()`.
+    """
+    def __init__(self, mock):
+        # tuples (mock, class, class magics, attributes, children, delegate,
+        # delegate attributes) of the mocks of the tree. Class magics are the
+        # base of the class of the mock, which gives the supported magic
+        # methods, and the magic methods set on the class itself.
+        self._nodes = []
+        seen = set()
+        pending = [mock]
+        while pending:
+            node = pending.pop()
+            if type(node) is types.FunctionType:
+                # function returned by create_autospec()
+                node = getattr(node, 'mock', None)
+
+            if id(node) in seen or not isinstance(type(node), MockMetaMixin):
+                continue
+
+            seen.add(id(node))
+            klass = type(node)
+            class_magics = (klass.__bases__[0], {
+                name: value for name, value in vars(klass).items()
+                if name in _class_attributes})
+
+            attributes = node.__dict__
+            delegate = attributes.get('_mock_delegate')
+            self._nodes.append((
+                node, klass, class_magics,
+                _snapshot_namespace(attributes, '_mock_side_effect'),
+                dict(node._mock_children), delegate,
+                None if delegate is None else
+                _snapshot_namespace(vars(delegate), 'side_effect')))
+
+            pending.extend(node._mock_children.values())
+            return_value = attributes.get('_mock_return_value')
+            if return_value is not node:
+                pending.append(return_value)
+
+    def restore(self):
+        """
+        Restore the configuration of the mocks (return values, side effects,
+        attributes and children) as it was when the snapshot was taken, and
+        clear their calls and awaits.
+
+        Mocks created after the snapshot are removed from the tree. The lists
+        of calls recorded by the mocks are cleared rather than replaced, so
+        restoring a snapshot is cheaper than calling
+        :meth:`~unittest.mock.Mock.reset_mock()`.
+        """
+        for (node, klass, class_magics, attributes, children, delegate,
+             delegated) in self._nodes:
+            _restore_class_magics(klass, class_magics)
+
+            current = node.__dict__
+            current.clear()
+            current.update(attributes)
+            _restore_side_effect(current, '_mock_side_effect')
+            # the dict of children is shared with the delegate of an
+            # autospecced function
+            current['_mock_children'].clear()
+            current['_mock_children'].update(children)
+
+            if delegate is not None:
+                vars(delegate).clear()
+                vars(delegate).update(delegated)
+                _restore_side_effect(vars(delegate), 'side_effect')
+
+            _mock_clear_records(node)
+
+
+_class_attributes = unittest.mock._all_magics | {'_mock_call'}
+
+_tee = type(itertools.tee(())[0])
+
+
+def _snapshot_namespace(namespace, side_effect):
+    # Return a copy of namespace. When the side effect named side_effect is
+    # an iterator, it is replaced in namespace by one of two independent
+    # iterators over the remaining values (which are buffered only as they
+    # are consumed), and the copy gets the other one, which the snapshot
+    # never advances.
+    saved = dict(namespace)
+    effect = namespace.get(side_effect)
+    if (effect is not None and not unittest.mock._is_exception(effect) and
+            not callable(effect) and iter(effect) is effect):
+        namespace[side_effect], saved[side_effect] = itertools.tee(effect)
+
+    return saved
+
+
+def _restore_side_effect(namespace, side_effect):
+    # Give namespace a fresh copy of the iterator saved by
+    # _snapshot_namespace(), so the snapshot can be restored several times.
+    effect = namespace.get(side_effect)
+    if type(effect) is _tee:
+        namespace[side_effect] = effect.__copy__()
+
+
+def _restore_class_magics(klass, class_magics):
+    # Restore the magic methods of the class of a single mock, saved in
+    # class_magics.
+    base, entries = class_magics
+    if klass.__bases__[0] is not base:
+        klass.__bases__ = (base, )
+
+    for name in [name for name in vars(klass)
+                 if name in _class_attributes and name not in entries]:
+        type.__delattr__(klass, name)
+
+    for name, value in entries.items():
+        if vars(klass).get(name) is not value:
+            type.__setattr__(klass, name, value)
+
+
+def _mock_clear_records(mock):
+    # Forget the calls (and awaits) of mock, without allocating new objects
+    # where possible.
+    attributes = mock.__dict__
+    if attributes['_mock_delegate'] is None:
+        # faster than the delegating properties
+        attributes['_mock_called'] = False
+        attributes['_mock_call_count'] = 0
+        attributes['_mock_call_args'] = None
+        for name, _ in _recorded_lists:
+            calls = attributes.get(name)
+            if calls is not None:
+                # a list without calls may still have counted some
+                calls.clear()
+    else:
+        mock.called = False
+        mock.call_count = 0
+        mock.call_args = None
+        for name in ('call_args_list', 'mock_calls', 'method_calls'):
+            getattr(mock, name).clear()
+
+    if isinstance(attributes.get('_mock_awaited'), _AwaitEvent):
+        mock.await_count = 0
+        mock.await_args = None
+        mock.await_args_list.clear()
+        mock.await_timings.clear()
+        awaited = mock.awaited
+        if awaited._count_waiters or awaited._predicate_waiters:
+            mock.awaited = _AwaitEvent(mock)
+        if mock.concurrency.peak:
+            mock.concurrency = ConcurrencyStats()
+
+
+def _mock_snapshot(self):
+    """
+    Take a snapshot of the configuration of the mock and its children, which
+    can be restored with ``snapshot.restore()``.
+
+    A tree of mocks can be configured once (for instance in
+    :meth:`~unittest.TestCase.setUpClass`), then restored between tests
+    rather than configured again or reset with :meth:`reset_mock`::
+
+        client = asynctest.Mock(Client)
+        client.get.return_value = "value"
+        snapshot = client.mock_snapshot()
+
+        # ... in each test
+        snapshot.restore()
+
+    The snapshot keeps references to the values configured on the mocks, it
+    doesn't copy them.
+
+    .. versionadded:: 0.14
+    """
+    return _MockSnapshot(self)
 
 
 def _get_child_mock(self, *args, **kwargs):
+    child = _create_child_mock(self, *args, **kwargs)
+    _mock_inherit_settings(self, child)
+    return child
+
+
+def _mock_inherit_settings(parent, child):
+    # Set the recording mode and the lock of parent on its new child
+    attributes = parent.__dict__
+    if '_mock_recording' in attributes:
+        _mock_inherit_recording(parent, child)
+
+    lock = attributes.get('_mock_lock')
+    if lock is not None and isinstance(type(child), MockMetaMixin):
+        _mock_set_lock(child, lock)
+
+
+class _NoLock:
+    # Used in place of the lock of a mock which is not thread-safe.
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_lock = _NoLock()
+
+
+def _get_lock(mock):
+    return mock.__dict__.get('_mock_lock') or _no_lock
+
+
+def _mock_set_thread_safe(self, enabled=True):
+    """
+    Make the mock and its children safe to use from several threads, for
+    instance when the code tested calls them in the threads of an executor.
+
+    Calls, awaits and the creation of children are recorded while holding
+    a lock shared by the mock and its children (including the ones created
+    later), so no call is lost and :attr:`call_count` stays exact. When
+    ``side_effect`` is a function, it is called once the lock is released, so
+    side effects run in parallel.
+
+    The waiters of :attr:`~asynctest.CoroutineMock.awaited` are woken up on
+    the loop they wait on, even when the mock is awaited in another thread
+    (with another loop).
+
+    :param enabled: ``False`` to remove the lock.
+
+    .. versionadded:: 0.14
+    """
+    lock = threading.RLock() if enabled else None
+    pending = [self]
+    seen = set()
+    while pending:
+        mock = pending.pop()
+        if type(mock) is types.FunctionType:
+            # function returned by create_autospec()
+            mock = getattr(mock, 'mock', None)
+
+        if id(mock) in seen or not isinstance(type(mock), MockMetaMixin):
+            continue
+
+        seen.add(id(mock))
+        _mock_set_lock(mock, lock)
+        pending.extend(mock._mock_children.values())
+        return_value = mock.__dict__.get('_mock_return_value')
+        if return_value is not mock:
+            pending.append(return_value)
+
+
+def _mock_set_lock(mock, lock):
+    # Set the lock of a thread-safe mock, or remove it if lock is None.
+    if lock is None:
+        if mock.__dict__.pop('_mock_lock', None) is None:
+            return
+    else:
+        mock.__dict__['_mock_lock'] = lock
+
+    if isinstance(mock.__dict__.get('_mock_awaited'), _AwaitEvent):
+        # CoroutineMock._mock_call() checks the lock itself
+        return
+
+    # The class of other mocks calls _thread_safe_mock_call(), so the calls of
+    # mocks which are not thread-safe don't check the lock.
+    klass = type(mock)
+    if lock is None:
+        type.__delattr__(klass, '_mock_call')
+    else:
+        type.__setattr__(klass, '_mock_call', _thread_safe_mock_call)
+
+
+def _record_call(*args, **kwargs):
+    # Side effect of a thread-safe mock while its call is recorded.
+    return None
+
+
+def _thread_safe_mock_call(_mock_self, *args, **kwargs):
+    self = _mock_self
+    attributes = self.__dict__
+    lock = attributes['_mock_lock']
+    with lock:
+        effect = attributes['_mock_side_effect']
+        if (attributes['_mock_delegate'] is not None or effect is None or
+                unittest.mock._is_exception(effect) or not callable(effect)):
+            return unittest.mock.CallableMixin._mock_call(self, *args,
+                                                          **kwargs)
+
+        # record the call without calling the side effect
+        attributes['_mock_side_effect'] = _record_call
+        try:
+            unittest.mock.CallableMixin._mock_call(self, *args, **kwargs)
+        finally:
+            attributes['_mock_side_effect'] = effect
+
+    result = effect(*args, **kwargs)
+    if result is not DEFAULT:
+        return result
+
+    with lock:
+        if (self._mock_return_value is not DEFAULT or
+                self._mock_wraps is None):
+            return self.return_value
+
+    return self._mock_wraps(*args, **kwargs)
+
+
+def _create_child_mock(self, *args, **kwargs):
     _new_name = kwargs.get("_new_name")
     if _new_name in self.__dict__['_spec_coroutines']:
         return CoroutineMock(*args, **kwargs)
 
+    if _new_name == '()':
+        lazy_instance = self.__dict__.get('_mock_lazy_instance')
+        if lazy_instance is not None:
+            return create_autospec(lazy_instance.spec, lazy_instance.spec_set,
+                                   instance=True, _name='()', _parent=self,
+                                   lazy=True)
+
     _type = type(self)
 
     if issubclass(_type, MagicMock) and _new_name in async_magic_coroutines:
@@ -201,11 +1339,24 @@ def _get_child_mock(self, *args, **kwargs):
         elif issubclass(_type, NonCallableMock):
             klass = Mock
     else:
-        klass = _type.__mro__[1]
+        klass = _type._mock_class
 
     return klass(*args, **kwargs)
 
 
+def _mock_getattr(self, name):
+    # Children of a mock created by create_autospec(lazy=True) are created on
+    # first access.
+    with _get_lock(self):
+        children = self.__dict__.get('_mock_children')
+        if children is not None:
+            child = children.get(name)
+            if isinstance(child, _LazyChild):
+                child.materialize(children)
+
+        return unittest.mock.NonCallableMock.__getattr__(self, name)
+
+
 class MockMetaMixin(FakeInheritanceMeta):
     def __new__(meta, name, base, namespace):
         if not any((isinstance(baseclass, meta) for baseclass in base)):
@@ -215,10 +1366,20 @@ class MockMetaMixin(FakeInheritanceMeta):
             code_mock.co_flags = 0
 
             namespace.update({
+                '__new__': _new_mock,
                 '_mock_add_spec': _mock_add_spec,
                 '_get_child_mock': _get_child_mock,
+                '__getattr__': _mock_getattr,
+                'mock_set_recording': _mock_set_recording,
+                'mock_snapshot': _mock_snapshot,
+                'mock_set_thread_safe': _mock_set_thread_safe,
                 '__code__': code_mock,
             })
+            namespace.setdefault('__setattr__', _mock_setattr)
+            namespace.setdefault('__delattr__', _mock_delattr)
+            namespace.setdefault('reset_mock', _mock_reset_mock)
+            namespace.setdefault('assert_any_call', _mock_assert_any_call)
+            namespace.setdefault('assert_has_calls', _mock_assert_has_calls)
 
         return super().__new__(meta, name, base, namespace)
 
@@ -234,7 +1395,7 @@ class IsCoroutineArgMeta(MockMetaMixin):
                 '_is_coroutine': property(_get_is_coroutine),
             })
 
-            wrapped_setattr = namespace.get("__setattr__", base[0].__setattr__)
+            wrapped_setattr = namespace.get("__setattr__", _mock_setattr)
             def __setattr__(self, attrname, value):
                 if attrname == 'is_coroutine':
                     self._asynctest_set_is_coroutine(value)
@@ -251,67 +1412,43 @@ class AsyncMagicMixin:
     Add support for async magic methods to :class:`MagicMock` and
     :class:`NonCallableMagicMock`.
 
-    Actually, it's a shameless copy-paste of :class:`unittest.mock.MagicMixin`:
-        when added to our classes, it will just do exactly what its
-        :mod:`unittest` counterpart does, but for magic methods. It adds some
-        behavior but should be compatible with future additions of
-        :class:`MagicMock`.
+    It replaces :meth:`unittest.mock.MagicMixin._mock_set_magics`: the magic
+    methods (async or not) are configured by selecting the base of the class of
+    the mock, shared by the mocks supporting the same magic methods, rather
+    than by setting them on the class of the mock.
     """
     # Magic methods are invoked as type(obj).__magic__(obj), as seen in
     # PEP-343 (with) and PEP-492 (async with)
-    def __init__(self, *args, **kwargs):
-        self._mock_set_async_magics()  # make magic work for kwargs in init
-        unittest.mock._safe_super(AsyncMagicMixin, self).__init__(*args, **kwargs)
-        self._mock_set_async_magics()  # fix magic broken by upper level init
-
-    def _mock_set_async_magics(self):
-        these_magics = _async_magics
-
-        if getattr(self, "_mock_methods", None) is not None:
-            these_magics = _async_magics.intersection(self._mock_methods)
-            remove_magics = _async_magics - these_magics
+    def _mock_set_magics(self):
+        if '_mock_methods' not in self.__dict__:
+            # called before __init__(), the magic methods have been selected
+            # by _new_mock()
+            return
 
-            for entry in remove_magics:
-                if entry in type(self).__dict__:
-                    # remove unneeded magic methods
-                    delattr(self, entry)
+        these_magics = _shareable_magics
 
-        # don't overwrite existing attributes if called a second time
-        these_magics = these_magics - set(type(self).__dict__)
+        _mock_methods = getattr(self, "_mock_methods", None)
+        if _mock_methods is not None:
+            # intersecting two sets only iterates over the smallest one
+            these_magics = these_magics.intersection(
+                getattr(_mock_methods, '_names', _mock_methods))
 
-        _type = type(self)
-        for entry in these_magics:
-            setattr(_type, entry, unittest.mock.MagicProxy(entry, self))
+        # don't overwrite existing attributes if called a second time, but
+        # restore magic methods which have been deleted
+        remove_magics = type(self)._mock_magics - these_magics
+        _mock_set_class_magics(self, these_magics)
 
-    def mock_add_spec(self, *args, **kwargs):
-        unittest.mock.MagicMock.mock_add_spec(self, *args, **kwargs)
-        self._mock_set_async_magics()
-
-    def __setattr__(self, name, value):
-        _mock_methods = getattr(self, '_mock_methods', None)
-        if _mock_methods is None or name in _mock_methods:
-            if name in _async_magics:
-                if not unittest.mock._is_instance_mock(value):
-                    setattr(type(self), name,
-                            unittest.mock._get_method(name, value))
-                    original = value
-
-                    def value(*args, **kwargs):
-                        return original(self, *args, **kwargs)
-                else:
-                    unittest.mock._check_and_set_parent(self, value, None, name)
-                    setattr(type(self), name, value)
-                    self._mock_children[name] = value
-
-                return object.__setattr__(self, name, value)
-
-        unittest.mock._safe_super(AsyncMagicMixin, self).__setattr__(name, value)
+        for entry in remove_magics:
+            if entry in self.__dict__:
+                # remove unneeded magic methods
+                delattr(self, entry)
 
 
 # Notes about unittest.mock:
 #  - MagicMock > Mock > NonCallableMock (where ">" means inherits from)
 #  - when a mock instance is created, a new class (type) is created
-#    dynamically,
+#    dynamically. In asynctest, the magic methods are set on a base of this
+#    class shared by the mocks of the same type (see _new_mock()),
 #  - we *must* use magic or object's internals when we want to add our own
 #    properties, and often override __getattr__/__setattr__ which are used
 #    in unittest.mock.NonCallableMock.
@@ -428,7 +1565,13 @@ class MagicMock(AsyncMagicMixin, unittest.mock.MagicMock,
 class _AwaitEvent:
     def __init__(self, mock):
         self._mock = mock
-        self._condition = None
+        # Waiters of a number of awaits, as a heap of tuples
+        # (await_count, id, future), and waiters of a predicate, as a list of
+        # tuples (predicate, future). Futures are created with the loop
+        # running when the waiter starts waiting.
+        self._count_waiters = []
+        self._predicate_waiters = []
+        self._waiter_ids = itertools.count()
 
     @asyncio.coroutine
     def wait(self, skip=0):
@@ -439,10 +1582,7 @@ class _AwaitEvent:
                      As a result, the mock should be awaited at least
                      ``skip + 1`` times.
         """
-        def predicate(mock):
-            return mock.await_count > skip
-
-        return (yield from self.wait_for(predicate))
+        return (yield from self._wait_count(skip + 1))
 
     @asyncio.coroutine
     def wait_next(self, skip=0):
@@ -457,12 +1597,7 @@ class _AwaitEvent:
                      As a result, the mock should be awaited at least
                      ``skip + 1`` more times.
         """
-        await_count = self._mock.await_count
-
-        def predicate(mock):
-            return mock.await_count > await_count + skip
-
-        return (yield from self.wait_for(predicate))
+        return (yield from self._wait_count(self._mock.await_count + skip + 1))
 
     @asyncio.coroutine
     def wait_for(self, predicate):
@@ -473,51 +1608,526 @@ class _AwaitEvent:
                           will be interpreted as a boolean value.
                           The final predicate value is the return value.
         """
-        condition = self._get_condition()
-
-        try:
-            yield from condition.acquire()
+        with _get_lock(self._mock):
+            result = predicate(self._mock)
+            if result:
+                return result
 
-            def _predicate():
-                return predicate(self._mock)
+            future = asyncio.get_event_loop().create_future()
+            self._predicate_waiters.append((predicate, future))
 
-            return (yield from condition.wait_for(_predicate))
+        try:
+            return (yield from future)
         finally:
-            condition.release()
+            if not future.done() or future.cancelled():
+                # the waiter gave up, don't keep it until the next await
+                with _get_lock(self._mock):
+                    self._predicate_waiters = [
+                        waiter for waiter in self._predicate_waiters
+                        if waiter[1] is not future]
 
     @asyncio.coroutine
-    def _notify(self):
-        condition = self._get_condition()
+    def _wait_count(self, await_count):
+        with _get_lock(self._mock):
+            if self._mock.await_count >= await_count:
+                return True
+
+            future = asyncio.get_event_loop().create_future()
+            waiter = (await_count, next(self._waiter_ids), future)
+            heapq.heappush(self._count_waiters, waiter)
 
         try:
-            yield from condition.acquire()
-            condition.notify_all()
+            return (yield from future)
         finally:
-            condition.release()
+            if not future.done() or future.cancelled():
+                self._discard_count_waiter(waiter)
 
-    def _get_condition(self):
-        """
-        Creation of condition is delayed, to minimize the change of using the
-        wrong loop.
+    def _discard_count_waiter(self, waiter):
+        with _get_lock(self._mock):
+            try:
+                self._count_waiters.remove(waiter)
+            except ValueError:
+                # already woken up by _notify()
+                return
+
+            heapq.heapify(self._count_waiters)
 
-        A user may create a mock with _AwaitEvent before selecting the
-        execution loop.  Requiring a user to delay creation is error-prone and
-        inflexible. Instead, condition is created when user actually starts to
-        use the mock.
+    def _notify(self):
+        """
+        Wake up the waiters satisfied by the current await count of the mock.
         """
-        # No synchronization is needed:
-        #   - asyncio is thread unsafe
-        #   - there are no awaits here, method will be executed without
-        #   switching asyncio context.
-        if self._condition is None:
-            self._condition = asyncio.Condition()
+        count_waiters = self._count_waiters
+        if count_waiters:
+            await_count = self._mock.await_count
+            while count_waiters and count_waiters[0][0] <= await_count:
+                _wake_up(heapq.heappop(count_waiters)[2], True)
+
+        if self._predicate_waiters:
+            waiters = []
+            for predicate, future in self._predicate_waiters:
+                if future.done():
+                    continue
+
+                try:
+                    result = predicate(self._mock)
+                except Exception as e:
+                    _wake_up(future, exception=e)
+                    continue
+
+                if result:
+                    _wake_up(future, result)
+                else:
+                    waiters.append((predicate, future))
 
-        return self._condition
+            self._predicate_waiters = waiters
 
     def __bool__(self):
         return self._mock.await_count != 0
 
 
+try:
+    _get_running_loop = asyncio._get_running_loop
+except AttributeError:
+    def _get_running_loop():
+        return None
+
+
+def _set_future(future, result, exception):
+    if future.done():
+        return
+
+    if exception is None:
+        future.set_result(result)
+    else:
+        future.set_exception(exception)
+
+
+def _wake_up(future, result=None, exception=None):
+    # Set the outcome of the future of a waiter, from the thread of its loop.
+    loop = future._loop
+    if _get_running_loop() is loop:
+        _set_future(future, result, exception)
+    else:
+        loop.call_soon_threadsafe(_set_future, future, result, exception)
+
+
+class Latency:
+    """
+    Model of the time spent by a :class:`~asynctest.CoroutineMock` before
+    the await of a call returns, as a distribution of delays in seconds.
+
+    Latencies are created with the class methods :meth:`fixed()`,
+    :meth:`uniform()`, :meth:`exponential()` and :meth:`empirical()`, and
+    given to the ``latency`` argument of :class:`~asynctest.CoroutineMock`::
+
+        backend = asynctest.CoroutineMock(
+            return_value=b"OK",
+            latency=asynctest.Latency.empirical([.01] * 99 + [2], seed=1))
+
+    The delay is spent with :func:`asyncio.sleep()`: with
+    a :class:`~asynctest.ClockedTestCase`, no actual time is spent waiting.
+
+    ``seed`` initializes the random generator of the latency, so the
+    sequence of delays is the same each time the test runs.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, sample, description):
+        self._sample = sample
+        self._description = description
+
+    @classmethod
+    def fixed(cls, delay):
+        """
+        Each await takes ``delay`` seconds.
+        """
+        _check_delays(delay)
+        return cls(lambda: delay, "fixed({!r})".format(delay))
+
+    @classmethod
+    def uniform(cls, low, high, seed=None):
+        """
+        Delays are uniformly distributed between ``low`` and ``high``.
+        """
+        _check_delays(low, high)
+        rng = random.Random(seed)
+        return cls(lambda: rng.uniform(low, high),
+                   "uniform({!r}, {!r})".format(low, high))
+
+    @classmethod
+    def exponential(cls, mean, seed=None):
+        """
+        Delays follow an exponential distribution of mean ``mean``.
+        """
+        _check_delays(mean)
+        rng = random.Random(seed)
+        if mean == 0:
+            return cls(lambda: 0, "exponential(0)")
+
+        return cls(lambda: rng.expovariate(1 / mean),
+                   "exponential({!r})".format(mean))
+
+    @classmethod
+    def empirical(cls, samples, seed=None):
+        """
+        Delays are picked at random in the list of measured delays
+        ``samples``.
+        """
+        samples = list(samples)
+        if not samples:
+            raise ValueError("samples must not be empty")
+
+        _check_delays(*samples)
+        rng = random.Random(seed)
+        return cls(lambda: rng.choice(samples),
+                   "empirical(<{} samples>)".format(len(samples)))
+
+    def sample(self):
+        """
+        Return the delay of the next await, a sampled delay below 0 being
+        clamped to 0.
+        """
+        return max(0, self._sample())
+
+    def __repr__(self):
+        return "<Latency {}>".format(self._description)
+
+
+def _check_delays(*delays):
+    # "not >= 0" also rejects NaN
+    if any(not delay >= 0 for delay in delays):
+        raise ValueError("a latency can not be negative")
+
+
+def _check_latency(latency):
+    if latency is not None and not isinstance(latency, Latency):
+        _check_delays(latency)
+
+
+def _latency_property():
+    # A delegating property which rejects negative latencies when set.
+    delegating = unittest.mock._delegating_property('latency')
+
+    def _set(self, value):
+        _check_latency(value)
+        delegating.fset(self, value)
+
+    return property(delegating.fget, _set)
+
+
+class ConcurrencyStats:
+    """
+    Statistics about the awaits of a :class:`~asynctest.CoroutineMock`
+    running at the same time, available as
+    :attr:`~asynctest.CoroutineMock.concurrency`.
+
+    An await is in flight from the moment the coroutine returned by the mock
+    starts running until it returns or raises. Durations are measured with
+    the clock of the loop running the awaits, so they are consistent with
+    :meth:`~asynctest.ClockedTestCase.advance()`.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self):
+        #: Number of awaits of the mock currently in flight.
+        self.in_flight = 0
+        #: Highest value of :attr:`in_flight`.
+        self.peak = 0
+        #: Time spent with each number of awaits in flight, as a dict, from
+        #: the start of the first await until the last start or end of an
+        #: await.
+        self.histogram = {}
+        self._last_time = None
+
+    def _update(self, now):
+        if self._last_time is not None:
+            elapsed = now - self._last_time
+            if elapsed:
+                level = self.in_flight
+                self.histogram[level] = self.histogram.get(level, 0) + elapsed
+
+        self._last_time = now
+
+    def _start(self, now):
+        self._update(now)
+        self.in_flight += 1
+        if self.in_flight > self.peak:
+            self.peak = self.in_flight
+
+    def _end(self, now):
+        self._update(now)
+        self.in_flight -= 1
+
+    @property
+    def mean(self):
+        """
+        Average number of awaits in flight, weighted by time, over the period
+        covered by :attr:`histogram`.
+        """
+        total = sum(self.histogram.values())
+        if not total:
+            return 0.
+
+        return sum(level * duration
+                   for level, duration in self.histogram.items()) / total
+
+    def __repr__(self):
+        return "<ConcurrencyStats in_flight={} peak={} mean={:.3f}>".format(
+            self.in_flight, self.peak, self.mean)
+
+
+class AwaitTiming:
+    """
+    Timing of an await of a :class:`~asynctest.CoroutineMock`, as recorded in
+    :attr:`~asynctest.CoroutineMock.await_timings`.
+
+    The mock and the task which awaited the coroutine are only referenced
+    weakly, and the result of the await is not kept: recording timings keeps
+    none of these objects alive.
+
+    .. versionadded:: 0.14
+    """
+    __slots__ = ('call', 'start', 'end', '_mock', '_mock_id', '_task',
+                 '_uses')
+
+    def __init__(self, mock, call, task, start, end, uses):
+        #: ``call`` of the mock which returned the awaited coroutine.
+        self.call = call
+        #: Time of the start of the await, on the clock of the loop.
+        self.start = start
+        #: Time of the end of the await, on the clock of the loop.
+        self.end = end
+        self._mock = weakref.ref(mock)
+        self._mock_id = id(mock)
+        # weak reference to the task, shared by all its timings, or None
+        self._task = task
+        # ids of the mocks whose last result in the task was an argument of
+        # call
+        self._uses = uses
+
+    @property
+    def mock(self):
+        """
+        Mock which was awaited, ``None`` once it has been collected.
+        """
+        return self._mock()
+
+    @property
+    def task(self):
+        """
+        Task which awaited the coroutine, ``None`` if it was not awaited in
+        a task or once the task has been collected.
+        """
+        return None if self._task is None else self._task()
+
+    def __repr__(self):
+        return "<AwaitTiming {!r} start={!r} end={!r}>".format(
+            self.call, self.start, self.end)
+
+
+try:
+    _get_current_task = asyncio.current_task
+except AttributeError:
+    _get_current_task = asyncio.Task.current_task
+
+
+def _collect_await_timings(mock, timings, seen):
+    # Add the timings of the awaits of mock and its children to timings.
+    if type(mock) is types.FunctionType:
+        # function returned by create_autospec()
+        mock = getattr(mock, 'mock', None)
+
+    if id(mock) in seen or not isinstance(type(mock), MockMetaMixin):
+        return
+
+    seen.add(id(mock))
+    timings.extend(mock.__dict__.get('_mock_await_timings', ()))
+
+    for child in mock._mock_children.values():
+        _collect_await_timings(child, timings, seen)
+
+    _collect_await_timings(mock.__dict__.get('_mock_return_value'), timings,
+                           seen)
+
+
+# For each task which awaited a CoroutineMock: a weak reference to the task,
+# which identifies the task in the timings even once it is collected, and
+# a reference to the result of the last await of each mock in the task, by id
+# of the mock. The reference is weak when the result allows it, else it is
+# only kept while the task is alive.
+_task_records = weakref.WeakKeyDictionary()
+
+
+def _get_task_records(task):
+    if task is None:
+        return None
+
+    records = _task_records.get(task)
+    if records is None:
+        records = _task_records[task] = (weakref.ref(task), {})
+
+    return records
+
+
+def _is_shared_value(value):
+    # True if value can be the same object as an equal value computed
+    # independently: CPython shares None, the booleans and small integers,
+    # and interns short strings, so the identity of such a value doesn't
+    # show where it comes from.
+    if (value is None or value is True or value is False or
+            value is Ellipsis or value is NotImplemented):
+        return True
+
+    kind = type(value)
+    if kind is int:
+        return -5 <= value <= 256
+    if kind is str:
+        return len(value) <= 1 or value.isidentifier()
+    if kind is bytes:
+        return len(value) <= 1
+
+    return kind in (tuple, frozenset) and not value
+
+
+def _results_used_by(records, call):
+    # Ids of the mocks whose last result in the task of records is an
+    # argument of call.
+    if not records or not records[1]:
+        return frozenset()
+
+    args, kwargs = call[-2:]
+    arguments = [arg for arg in itertools.chain(args, kwargs.values())
+                 if not _is_shared_value(arg)]
+    used = set()
+    for mock_id, reference in records[1].items():
+        result = reference()
+        if result is not None and any(arg is result for arg in arguments):
+            used.add(mock_id)
+
+    return frozenset(used)
+
+
+def _result_reference(result):
+    try:
+        return weakref.ref(result)
+    except TypeError:
+        return lambda: result
+
+
+def _depends_on(timing, previous):
+    # True if the arguments of the call of timing include the result of the
+    # await of previous.
+    return previous._mock_id in timing._uses
+
+
+def find_serial_awaits(*mocks, count=2):
+    """
+    Find the awaits of ``mocks`` which ran one after the other in a task
+    although they could have run concurrently, like the queries of the "N+1
+    queries" problem of ORMs.
+
+    Each mock is searched with its children, so the awaits of all the methods
+    of a mocked client are found when the client is passed.
+
+    A run of serial awaits is a sequence of awaits in the same task, each one
+    starting after the end of the previous one. The run stops at an await
+    which is passed the result of the previous await as argument, since it
+    depends on it. Values which CPython shares between unrelated computations,
+    like ``None``, booleans, small integers and short strings, are not
+    considered as results passed to an await. Awaits are found in
+    :attr:`~asynctest.CoroutineMock.await_timings`, and thus follow the
+    recording mode of the mocks (see :meth:`~asynctest.Mock.mock_set_recording`).
+
+    :param count: minimal number of awaits in a run.
+    :return: the list of runs found, each run being a list of
+             :class:`~asynctest.AwaitTiming` sorted by start time.
+
+    .. versionadded:: 0.14
+    """
+    timings = []
+    seen = set()
+    for mock in mocks:
+        _collect_await_timings(mock, timings, seen)
+
+    by_task = collections.OrderedDict()
+    for timing in sorted(timings, key=lambda timing: timing.start):
+        # the reference to the task is shared by its timings
+        by_task.setdefault(id(timing._task), []).append(timing)
+
+    runs = []
+    for task_timings in by_task.values():
+        run = task_timings[:1]
+        for timing in task_timings[1:]:
+            previous = run[-1]
+            if (timing.start < previous.end or
+                    _depends_on(timing, previous)):
+                if len(run) >= count:
+                    runs.append(run)
+                run = []
+
+            run.append(timing)
+
+        if len(run) >= count:
+            runs.append(run)
+
+    return runs
+
+
+@types.coroutine
+def _await_mock(mock, call, result=None, exception=None):
+    # Coroutine returned by a call to a CoroutineMock: it records the await of
+    # the call, then returns the result of the call (awaiting it if needed) or
+    # raises the exception raised by the call.
+    #
+    # This is not a native coroutine since a native coroutine can not be
+    # awaited with "yield from" in a generator which is not decorated with
+    # @asyncio.coroutine. It is not decorated with @asyncio.coroutine either,
+    # which wraps each coroutine in a CoroWrapper in debug mode.
+    loop = asyncio.get_event_loop()
+    task = _get_current_task(loop=loop)
+    records = _get_task_records(task)
+    uses = _results_used_by(records, call)
+    lock = _get_lock(mock)
+    concurrency = mock.concurrency
+    start = loop.time()
+    with lock:
+        concurrency._start(start)
+
+    try:
+        latency = mock.latency
+        if latency is not None:
+            if isinstance(latency, Latency):
+                latency = latency.sample()
+            yield from asyncio.sleep(latency)
+
+        if exception is not None:
+            raise exception
+
+        if inspect.isawaitable(result):
+            result = yield from result
+
+        return result
+    except BaseException:
+        result = None
+        raise
+    finally:
+        end = loop.time()
+        if records is not None:
+            if _is_shared_value(result):
+                records[1].pop(id(mock), None)
+            else:
+                records[1][id(mock)] = _result_reference(result)
+
+        with lock:
+            concurrency._end(end)
+            mock.await_timings.append(AwaitTiming(
+                mock, call, records and records[0], start, end, uses))
+            mock.await_count += 1
+            mock.await_args = call
+            mock.await_args_list.append(call)
+            mock.awaited._notify()
+
+
 class CoroutineMock(Mock):
     """
     Enhance :class:`~asynctest.mock.Mock` with features allowing to mock
@@ -555,6 +2165,12 @@ class CoroutineMock(Mock):
     case, the :class:`~asynctest.Mock` object behavior is the same as with an
     :class:`unittest.mock.Mock` object: the wrapped object may have methods
     defined as coroutine functions.
+
+    :param latency: time spent by each await of the mock before it returns
+                    (or raises), as a number of seconds or
+                    a :class:`~asynctest.Latency`, see :attr:`latency`.
+
+    .. versionadded:: 0.14 the ``latency`` parameter.
     """
     #: Property which is set when the mock is awaited. Its ``wait`` and
     #: ``wait_next`` coroutine methods can be used to synchronize execution.
@@ -567,8 +2183,25 @@ class CoroutineMock(Mock):
     await_count = unittest.mock._delegating_property('await_count')
     await_args = unittest.mock._delegating_property('await_args')
     await_args_list = unittest.mock._delegating_property('await_args_list')
+    #: Time spent by each await of the mock before it returns: a number of
+    #: seconds, a :class:`~asynctest.Latency` or ``None``.
+    #:
+    #: .. versionadded:: 0.14
+    latency = _latency_property()
+    #: :class:`~asynctest.ConcurrencyStats` of the awaits of the mock.
+    #:
+    #: .. versionadded:: 0.14
+    concurrency = unittest.mock._delegating_property('concurrency')
+    #: List of the :class:`~asynctest.AwaitTiming` of the awaits of the mock,
+    #: in the order they ended. It is recorded like :attr:`await_args_list`,
+    #: so it is bounded or left empty by the recording mode of the mock (see
+    #: :meth:`~asynctest.Mock.mock_set_recording`).
+    #:
+    #: .. versionadded:: 0.14
+    await_timings = unittest.mock._delegating_property('await_timings')
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, latency=None, **kwargs):
+        _check_latency(latency)
         super().__init__(*args, **kwargs)
 
         # asyncio.iscoroutinefunction() checks this property to say if an
@@ -580,35 +2213,26 @@ class CoroutineMock(Mock):
         self.__dict__['_mock_await_count'] = 0
         self.__dict__['_mock_await_args'] = None
         self.__dict__['_mock_await_args_list'] = unittest.mock._CallList()
+        self.__dict__['_mock_latency'] = latency
+        self.__dict__['_mock_concurrency'] = ConcurrencyStats()
+        self.__dict__['_mock_await_timings'] = unittest.mock._CallList()
 
     def _mock_call(_mock_self, *args, **kwargs):
         try:
-            result = super()._mock_call(*args, **kwargs)
+            if '_mock_lock' in _mock_self.__dict__:
+                result = _thread_safe_mock_call(_mock_self, *args, **kwargs)
+            else:
+                result = super()._mock_call(*args, **kwargs)
         except StopIteration as e:
             side_effect = _mock_self.side_effect
             if side_effect is not None and not callable(side_effect):
                 raise
 
-            result = asyncio.coroutine(_raise)(e)
+            return _await_mock(_mock_self, _mock_self.call_args, exception=e)
         except BaseException as e:
-            result = asyncio.coroutine(_raise)(e)
-
-        _call = _mock_self.call_args
-
-        @asyncio.coroutine
-        def proxy():
-            try:
-                if inspect.isawaitable(result):
-                    return (yield from result)
-                else:
-                    return result
-            finally:
-                _mock_self.await_count += 1
-                _mock_self.await_args = _call
-                _mock_self.await_args_list.append(_call)
-                yield from _mock_self.awaited._notify()
+            return _await_mock(_mock_self, _mock_self.call_args, exception=e)
 
-        return proxy()
+        return _await_mock(_mock_self, _mock_self.call_args, result)
 
     def assert_awaited(_mock_self):
         """
@@ -668,6 +2292,54 @@ class CoroutineMock(Mock):
             raise AssertionError(msg)
         return self.assert_awaited_with(*args, **kwargs)
 
+    def assert_awaited_concurrently(_mock_self, count):
+        """
+        Assert that at least ``count`` awaits of the mock were in flight at the
+        same time.
+
+        .. versionadded:: 0.14
+        """
+        self = _mock_self
+        peak = self.concurrency.peak
+        if peak < count:
+            raise AssertionError(
+                "Expected '%s' to be awaited %s times concurrently. Peak of "
+                "concurrent awaits: %s." % (self._mock_name or 'mock', count,
+                                            peak))
+
+    def assert_max_concurrency(_mock_self, count):
+        """
+        Assert that no more than ``count`` awaits of the mock were in flight at
+        the same time.
+
+        .. versionadded:: 0.14
+        """
+        self = _mock_self
+        peak = self.concurrency.peak
+        if peak > count:
+            raise AssertionError(
+                "Expected '%s' to be awaited at most %s times concurrently. "
+                "Peak of concurrent awaits: %s." % (self._mock_name or 'mock',
+                                                    count, peak))
+
+    def assert_not_awaited_serially(_mock_self, count=2):
+        """
+        Assert that the mock was not awaited ``count`` times or more one after
+        the other in a task, with arguments which don't depend on the result
+        of the previous await, see :func:`~asynctest.find_serial_awaits()`.
+
+        .. versionadded:: 0.14
+        """
+        self = _mock_self
+        runs = find_serial_awaits(self, count=count)
+        if runs:
+            run = max(runs, key=len)
+            raise AssertionError(
+                "Expected '%s' to not be awaited serially. %s independent "
+                "awaits ran one after the other in %r: %r" % (
+                    self._mock_name or 'mock', len(run), run[0].task,
+                    unittest.mock._CallList(t.call for t in run)))
+
     def assert_any_await(_mock_self, *args, **kwargs):
         """
         Assert the mock has ever been awaited with the specified arguments.
@@ -675,8 +2347,13 @@ class CoroutineMock(Mock):
         .. versionadded:: 0.12
         """
         self = _mock_self
+        awaits = self.await_args_list
+        if _is_indexed(self, awaits) and awaits.contains_call(
+                unittest.mock._Call((args, kwargs), two=True)):
+            return
+
         expected = self._call_matcher((args, kwargs))
-        actual = [self._call_matcher(c) for c in self.await_args_list]
+        actual = [self._call_matcher(c) for c in awaits]
         if expected not in actual:
             cause = expected if isinstance(expected, Exception) else None
             expected_string = self._format_mock_call_signature(args, kwargs)
@@ -699,6 +2376,11 @@ class CoroutineMock(Mock):
         .. versionadded:: 0.12
         """
         self = _mock_self
+        awaits = self.await_args_list
+        if _is_indexed(self, awaits) and awaits.contains_calls(calls,
+                                                               any_order):
+            return
+
         expected = [self._call_matcher(c) for c in calls]
         cause = expected if isinstance(expected, Exception) else None
         all_awaits = unittest.mock._CallList(self._call_matcher(c) for c in self.await_args_list)
@@ -744,10 +2426,122 @@ class CoroutineMock(Mock):
         self.await_count = 0
         self.await_args = None
         self.await_args_list = unittest.mock._CallList()
+        self.concurrency = ConcurrencyStats()
+        self.await_timings = unittest.mock._CallList()
+        if '_mock_recording' in self.__dict__:
+            _mock_install_recording(self)
+
+
+class _LazyChild(unittest.mock._SpecState):
+    # Placeholder of a child of a mock, replaced by the actual child mock
+    # returned by materialize() when the attribute is first accessed.
+    def materialize(self, children):
+        raise NotImplementedError
+
+
+class _LazyAutospec(_LazyChild):
+    # Placeholder of a method of a mock created by create_autospec().
+    def __init__(self, spec, spec_set, parent, name, skipfirst, klass):
+        super().__init__(spec, spec_set, parent, name)
+        self.skipfirst = skipfirst
+        self.klass = klass
+
+    def materialize(self, children):
+        if self.spec_set:
+            kwargs = {'spec_set': self.spec}
+        else:
+            kwargs = {'spec': self.spec}
+
+        new = self.klass(parent=self.parent, name=self.name,
+                         _new_name=self.name, _new_parent=self.parent,
+                         _eat_self=self.skipfirst, **kwargs)
+        children[self.name] = new
+        _check_signature(self.spec, new, skipfirst=self.skipfirst)
+        _mock_inherit_settings(self.parent, new)
+        return new
+
+
+class _LazyClone(_LazyChild):
+    # Placeholder of a child of a mock copied from an autospec template.
+    def __init__(self, template, parent, name):
+        super().__init__(template._spec_class, template._spec_set, parent,
+                         name)
+        self.template = template
+
+    def materialize(self, children):
+        new = _clone_autospec(self.template, self.parent)
+        children[self.name] = new
+        _mock_inherit_settings(self.parent, new)
+        return new
+
+
+def _clone_autospec(template, parent):
+    # Copy a mock created by create_autospec(). The copy shares the spec data
+    # of template, but has its own call records. Its children are copied when
+    # they are first accessed.
+    klass = type(template)
+    new = object.__new__(type(klass)(klass.__name__, klass.__bases__,
+                                     dict(vars(klass))))
+    attributes = new.__dict__
+    attributes.update(template.__dict__)
+
+    for key in ('_mock_parent', '_mock_new_parent'):
+        if attributes[key] is not None:
+            attributes[key] = parent
+
+    children = attributes['_mock_children'] = {}
+    for entry, child in template._mock_children.items():
+        if attributes.get(entry) is child:
+            del attributes[entry]
+
+        if unittest.mock._is_instance_mock(child):
+            child = _LazyClone(child, new, entry)
+        elif isinstance(child, unittest.mock._SpecState):
+            child = unittest.mock._SpecState(child.spec, child.spec_set, new,
+                                             child.name, child.ids,
+                                             child.instance)
+        children[entry] = child
+
+    return_value = attributes.get('_mock_return_value')
+    if unittest.mock._is_instance_mock(return_value):
+        attributes['_mock_return_value'] = _clone_autospec(return_value, new)
+
+    new.reset_mock()
+    return new
+
+
+# Mocks created by create_autospec() for the most recently used types, and
+# the metadata of the type when they have been created, copied when the same
+# type is used as a spec again.
+_autospec_templates = collections.OrderedDict()
+_AUTOSPEC_TEMPLATES_MAXSIZE = 128
+
+
+def _get_autospec_template(spec, spec_set, instance):
+    key = (spec, bool(spec_set), bool(instance))
+    try:
+        _autospec_templates.move_to_end(key)
+        metadata, template = _autospec_templates[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # spec is not hashable
+        return None
+    else:
+        if metadata is _get_spec_metadata(spec):
+            return template
+
+    metadata = _get_spec_metadata(spec)
+    template = _create_autospec(spec, spec_set, instance)
+    _autospec_templates[key] = (metadata, template)
+    if len(_autospec_templates) > _AUTOSPEC_TEMPLATES_MAXSIZE:
+        _autospec_templates.popitem(last=False)
+
+    return template
 
 
 def create_autospec(spec, spec_set=False, instance=False, _parent=None,
-                    _name=None, **kwargs):
+                    _name=None, *, lazy=False, **kwargs):
     """
     Create a mock object using another object as a spec. Attributes on the mock
     will use the corresponding attribute on the spec object as their spec.
@@ -758,13 +2552,42 @@ def create_autospec(spec, spec_set=False, instance=False, _parent=None,
     If ``spec`` is a coroutine function, and ``instance`` is not ``False``, a
     :exc:`RuntimeError` is raised.
 
+    :param lazy: if ``True``, the mocks of the methods of ``spec`` and the
+                 mock of the instance returned when ``spec`` is a class are
+                 only created when they are first accessed. This makes the
+                 creation of mocks of large classes or modules cheaper when
+                 only a few of their attributes are used by the test. The
+                 resulting mock behaves like the one created by default.
+
+    When ``spec`` is a class, the mock is built once and copied when
+    the same class is used again as a spec, unless extra keyword arguments
+    are given or the class (or one of its bases) has been modified since.
+    A copy has its own call records.
+
     .. versionadded:: 0.12
+
+    .. versionadded:: 0.14 the ``lazy`` parameter.
     """
+    if (_parent is None and not kwargs and not lazy and
+            isinstance(spec, type)):
+        template = _get_autospec_template(spec, spec_set, instance)
+        if template is not None:
+            mock = _clone_autospec(template, None)
+            mock.__dict__['_mock_name'] = _name
+            return mock
+
+    return _create_autospec(spec, spec_set, instance, _parent, _name,
+                            lazy=lazy, **kwargs)
+
+
+def _create_autospec(spec, spec_set=False, instance=False, _parent=None,
+                     _name=None, *, lazy=False, **kwargs):
     if unittest.mock._is_list(spec):
         spec = type(spec)
 
     is_type = isinstance(spec, type)
     is_coroutine_func = asyncio.iscoroutinefunction(spec)
+    metadata = _get_spec_metadata(spec)
 
     _kwargs = {'spec': spec}
     if spec_set:
@@ -815,6 +2638,9 @@ def create_autospec(spec, spec_set=False, instance=False, _parent=None,
             mock.await_count = 0
             mock.await_args = None
             mock.await_args_list = unittest.mock._CallList()
+            mock.latency = None
+            mock.concurrency = ConcurrencyStats()
+            mock.await_timings = unittest.mock._CallList()
 
             for a in ('assert_awaited',
                       'assert_awaited_once',
@@ -822,19 +2648,27 @@ def create_autospec(spec, spec_set=False, instance=False, _parent=None,
                       'assert_awaited_once_with',
                       'assert_any_await',
                       'assert_has_awaits',
-                      'assert_not_awaited'):
+                      'assert_not_awaited',
+                      'assert_awaited_concurrently',
+                      'assert_max_concurrency',
+                      'assert_not_awaited_serially'):
                 setattr(mock, a, getattr(wrapped_mock, a))
     else:
-        unittest.mock._check_signature(spec, mock, is_type, instance)
+        _check_signature(spec, mock, is_type, instance, metadata=metadata)
 
     if _parent is not None and not instance:
         _parent._mock_children[_name] = mock
 
     if is_type and not instance and 'return_value' not in kwargs:
-        mock.return_value = create_autospec(spec, spec_set, instance=True,
-                                            _name='()', _parent=mock)
+        if lazy:
+            # the mock of the instance is created by _get_child_mock()
+            mock.__dict__['_mock_lazy_instance'] = unittest.mock._SpecState(
+                spec, spec_set, mock, '()', instance=True)
+        else:
+            mock.return_value = create_autospec(spec, spec_set, instance=True,
+                                                _name='()', _parent=mock)
 
-    for entry in dir(spec):
+    for entry in metadata.attributes:
         if unittest.mock._is_magic(entry):
             continue
         try:
@@ -842,10 +2676,6 @@ def create_autospec(spec, spec_set=False, instance=False, _parent=None,
         except AttributeError:
             continue
 
-        kwargs = {'spec': original}
-        if spec_set:
-            kwargs = {'spec_set': original}
-
         if not isinstance(original, unittest.mock.FunctionTypes):
             new = unittest.mock._SpecState(original, spec_set, mock, entry,
                                            instance)
@@ -856,15 +2686,16 @@ def create_autospec(spec, spec_set=False, instance=False, _parent=None,
                 parent = mock.mock
 
             skipfirst = unittest.mock._must_skip(spec, entry, is_type)
-            kwargs['_eat_self'] = skipfirst
-            if asyncio.iscoroutinefunction(original):
+            if entry in metadata.coroutines:
                 child_klass = CoroutineMock
             else:
                 child_klass = MagicMock
-            new = child_klass(parent=parent, name=entry, _new_name=entry,
-                              _new_parent=parent, **kwargs)
-            mock._mock_children[entry] = new
-            unittest.mock._check_signature(original, new, skipfirst=skipfirst)
+            new = _LazyAutospec(original, spec_set, parent, entry, skipfirst,
+                                child_klass)
+            if lazy:
+                mock._mock_children[entry] = new
+            else:
+                new = new.materialize(mock._mock_children)
 
         if isinstance(new, unittest.mock.FunctionTypes):
             setattr(mock, entry, new)
@@ -892,6 +2723,171 @@ def mock_open(mock=None, read_data=''):
     return unittest.mock.mock_open(mock, read_data)
 
 
+class _AsyncFileContent:
+    # Content read through the handle returned by async_mock_open(). The
+    # data is never copied, except for the parts returned by the reads.
+    # Memoryviews of the data are released after use, so a mmap can be
+    # closed while the mock is alive.
+    def __init__(self, data):
+        if isinstance(data, str):
+            self.newline = '\n'
+        else:
+            if isinstance(data, memoryview):
+                data = data.cast('B')
+            self.newline = b'\n'
+
+        self.data = data
+
+        # bytes, bytearray and mmap can be searched without a copy
+        self.find = getattr(data, 'find', None)
+        self.position = 0
+
+    def _slice(self, end):
+        chunk = self.data[self.position:end]
+        self.position = end
+        if isinstance(chunk, (str, bytes)):
+            return chunk
+
+        # slice of a memoryview or a bytearray
+        return bytes(chunk)
+
+    def _end(self, size):
+        length = len(self.data)
+        if size is None or size < 0:
+            return length
+
+        return min(self.position + size, length)
+
+    def read(self, size=-1):
+        return self._slice(self._end(size))
+
+    def readline(self, size=-1):
+        end = self._end(size)
+        if self.find is not None:
+            index = self.find(self.newline, self.position, end)
+        else:
+            index = self._find_newline(end)
+
+        if index >= 0:
+            end = index + 1
+
+        return self._slice(end)
+
+    def _find_newline(self, end):
+        # search a memoryview by chunks
+        start = self.position
+        while start < end:
+            stop = min(start + 8192, end)
+            index = self.data[start:stop].tobytes().find(self.newline)
+            if index >= 0:
+                return start + index
+
+            start = stop
+
+        return -1
+
+    def readlines(self, hint=-1):
+        lines = []
+        size = 0
+        for line in iter(self.readline, self.newline[:0]):
+            lines.append(line)
+            size += len(line)
+            if 0 < hint <= size:
+                break
+
+        return lines
+
+    def readinto(self, buffer):
+        if isinstance(self.data, str):
+            # like the text files returned by open()
+            raise io.UnsupportedOperation(
+                "readinto() can not read a str read_data, pass bytes to "
+                "async_mock_open() to mock a binary file")
+
+        with memoryview(buffer) as target, target.cast('B') as view, \
+                memoryview(self.data) as source:
+            end = self._end(len(view))
+            size = end - self.position
+            view[:size] = source[self.position:end]
+
+        self.position = end
+        return size
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += len(self.data)
+
+        self.position = max(0, min(offset, len(self.data)))
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = self.readline()
+        if not line:
+            raise StopAsyncIteration
+
+        return line
+
+
+def async_mock_open(mock=None, read_data=b''):
+    """
+    A helper function to create a mock to replace a function opening a file
+    asynchronously, like :func:`open()` for :mod:`asyncio` libraries.
+
+    The handle returned by the mock can be used with ``async with`` and
+    ``async for`` (iterating over lines). Its methods ``read()``,
+    ``readline()``, ``readlines()``, ``readinto()``, ``seek()``, ``tell()``,
+    ``write()``, ``flush()`` and ``close()`` are
+    :class:`~asynctest.CoroutineMock` objects.
+
+    ``read_data`` is not copied: only the parts read are, and ``readinto()``
+    copies them directly into the buffer, so a large content (for instance
+    a :class:`mmap.mmap`) can be read quickly and without using more memory.
+    As with a text file, ``readinto()`` raises
+    :exc:`io.UnsupportedOperation` when ``read_data`` is a :class:`str`.
+    The position in the content is reset each time the mock is called.
+
+    :param mock: mock object to configure, by default
+                 a :class:`~asynctest.MagicMock` object is created.
+
+    :param read_data: :class:`bytes`, :class:`str` or an object supporting
+                      the buffer protocol (like :class:`memoryview` or
+                      :class:`mmap.mmap`) read through the handle. This is an
+                      empty bytes string by default.
+
+    .. versionadded:: 0.14
+    """
+    if mock is None:
+        mock = MagicMock(name='open', spec=open)
+
+    content = _AsyncFileContent(read_data)
+
+    handle = MagicMock(name='handle')
+    handle.__aenter__.return_value = handle
+    handle.__aiter__.return_value = content
+    for name in ('read', 'readline', 'readlines', 'readinto', 'seek',
+                 'tell'):
+        setattr(handle, name, CoroutineMock(side_effect=getattr(content,
+                                                                name)))
+    for name in ('write', 'flush', 'close'):
+        setattr(handle, name, CoroutineMock())
+
+    def reset_content(*args, **kwargs):
+        content.position = 0
+        return DEFAULT
+
+    mock.side_effect = reset_content
+    mock.return_value = handle
+    return mock
+
+
 ANY = unittest.mock.ANY
 DEFAULT = unittest.mock.sentinel.DEFAULT
 
@@ -913,9 +2909,110 @@ def _update_new_callable(patcher, new, new_callable):
 
 
 # Documented in doc/asynctest.mock.rst
-PatchScope = enum.Enum('PatchScope', 'LIMITED GLOBAL')
+PatchScope = enum.Enum('PatchScope', 'LIMITED GLOBAL TASK')
 LIMITED = PatchScope.LIMITED
 GLOBAL = PatchScope.GLOBAL
+TASK = PatchScope.TASK
+
+
+class _TaskLocalProxy:
+    # Replaces an attribute patched with the TASK scope, and resolves to the
+    # value of the patch in the current context (the one of the task), or to
+    # the original value.
+    #
+    # On a class, the proxy is a descriptor and the value is returned (and
+    # bound) directly. On other targets (modules, instances), calls and
+    # attributes are forwarded to the value, which must be callable since
+    # operators and builtins like bool() or hash() would act on the proxy.
+    __slots__ = ('_target', '_attribute', '_original', '_local', '_create',
+                 '_var')
+
+    def __init__(self, target, attribute, original, local, create):
+        init = object.__setattr__
+        init(self, '_target', target)
+        init(self, '_attribute', attribute)
+        init(self, '_original', original)
+        init(self, '_local', local)
+        init(self, '_create', create)
+        init(self, '_var', contextvars.ContextVar(attribute, default=original))
+
+    def _resolve(self):
+        value = self._var.get()
+        if value is DEFAULT:
+            raise AttributeError("{} does not have the attribute {!r}".format(
+                self._target, self._attribute))
+
+        return value
+
+    def __get__(self, instance, owner):
+        value = self._resolve()
+        get = getattr(type(value), '__get__', None)
+        if get is None:
+            return value
+
+        return get(value, instance, owner)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._resolve(), name)
+
+    def __repr__(self):
+        return repr(self._resolve())
+
+
+# Proxies installed on targets, with the number of patches using them, by
+# (id(target), attribute)
+_task_proxies = {}
+
+
+def _acquire_task_proxy(patching, target):
+    key = (id(target), patching.attribute)
+    try:
+        entry = _task_proxies[key]
+    except KeyError:
+        original, local = patching.get_original()
+        proxy = _TaskLocalProxy(target, patching.attribute, original, local,
+                                patching.create)
+        setattr(target, patching.attribute, proxy)
+        _override_spec_attribute(target, patching.attribute)
+        entry = _task_proxies[key] = [proxy, 0]
+
+    entry[1] += 1
+    return entry[0]
+
+
+def _release_task_proxy(proxy):
+    target, attribute = proxy._target, proxy._attribute
+    key = (id(target), attribute)
+    entry = _task_proxies[key]
+    entry[1] -= 1
+    if entry[1]:
+        return
+
+    del _task_proxies[key]
+    _restore_spec_attribute(target, attribute)
+    try:
+        current = target.__dict__[attribute]
+    except (AttributeError, KeyError):
+        current = getattr(target, attribute, None)
+
+    if current is proxy:
+        # else, the proxy has been replaced since, keep the new value
+        _restore_attribute(target, attribute, proxy._original, proxy._local,
+                           proxy._create)
+
+
+class _StandIn:
+    # Target of a patch with the TASK scope while unittest creates the mock
+    pass
 
 
 def _decorate_coroutine_callable(func, new_patching):
@@ -952,7 +3049,7 @@ def _decorate_coroutine_callable(func, new_patching):
         patchers_to_exit = []
         patch_dict_with_limited_scope = []
 
-        exc_info = tuple()
+        exc_info = (None, None, None)
         try:
             for patching in local_patchings:
                 arg = patching.__enter__()
@@ -1013,6 +3110,23 @@ def _decorate_coroutine_callable(func, new_patching):
     return functools.wraps(func)(patched)
 
 
+# Attributes restored by unittest.mock._patch.__exit__() even if the target
+# still has them once deleted
+_unpatchable_attributes = ('__doc__', '__module__', '__defaults__',
+                           '__annotations__', '__kwdefaults__')
+
+
+def _restore_attribute(target, attribute, original, local, create):
+    # Same as unittest.mock._patch.__exit__()
+    if local and original is not DEFAULT:
+        setattr(target, attribute, original)
+    else:
+        delattr(target, attribute)
+        if not create and (not hasattr(target, attribute) or
+                           attribute in _unpatchable_attributes):
+            setattr(target, attribute, original)
+
+
 class _PatchedGenerator(asyncio.coroutines.CoroWrapper):
     # Inheriting from asyncio.CoroWrapper gives us a comprehensive wrapper
     # implementing one or more workarounds for cpython bugs
@@ -1022,47 +3136,135 @@ class _PatchedGenerator(asyncio.coroutines.CoroWrapper):
         self.__name__ = getattr(gen, '__name__', None)
         self.__qualname__ = getattr(gen, '__qualname__', None)
         self.patchings = patchings
-        self.global_patchings = [p for p in patchings if p.scope == GLOBAL]
+        # patches with the TASK scope are stopped with the GLOBAL ones
+        self.global_patchings = [p for p in patchings if p.scope != LIMITED]
         self.limited_patchings = [p for p in patchings if p.scope == LIMITED]
 
-        # GLOBAL patches have been started in the _patch/patched() wrapper
+        # GLOBAL patches have been started in the _patch/patched() wrapper,
+        # LIMITED patches have been entered once, so the value of their
+        # target is known
+        self._swaps = self._limited_swaps()
+
+    def _limited_swaps(self):
+        # Precompute how LIMITED patchings are activated each time the
+        # generator is resumed: the attribute of the target is swapped
+        # directly, other patchings are entered as context managers.
+        swaps = []
+        for patching in self.limited_patchings:
+            if (isinstance(patching, _patch) and
+                    not patching.additional_patchers and
+                    patching.cassette is None):
+                new = patching.mock_to_reuse
+                if new is None:
+                    new = patching.new
+
+                swaps.append((patching.getter(), patching.attribute, new,
+                              patching.create))
+            else:
+                swaps.append(patching)
+
+        return swaps
+
+    def _enter_limited_patchings(self):
+        # Activate the LIMITED patchings, return what must be undone by
+        # _exit_limited_patchings()
+        undo = []
+        try:
+            for swap in self._swaps:
+                if type(swap) is not tuple:
+                    swap.__enter__()
+                    undo.append(swap)
+                    continue
+
+                target, attribute, new, create = swap
+                try:
+                    original = target.__dict__[attribute]
+                    local = True
+                except (AttributeError, KeyError):
+                    original = getattr(target, attribute, DEFAULT)
+                    local = False
+
+                if original is new:
+                    # already patched, for instance by the same patch on
+                    # a generator this one delegates to
+                    continue
+
+                if not create and original is DEFAULT:
+                    raise AttributeError(
+                        "{} does not have the attribute {!r}".format(
+                            target, attribute))
+
+                setattr(target, attribute, new)
+                _override_spec_attribute(target, attribute)
+                undo.append((target, attribute, original, local, create))
+        except BaseException:
+            self._exit_limited_patchings(undo)
+            raise
+
+        return undo
 
-    def _limited_patchings_stack(self):
-        with contextlib.ExitStack() as stack:
-            for patching in self.limited_patchings:
-                stack.enter_context(patching)
+    def _exit_limited_patchings(self, undo):
+        for entry in reversed(undo):
+            if type(entry) is not tuple:
+                entry.__exit__(None, None, None)
+                continue
 
-            return stack.pop_all()
+            target, attribute, original, local, create = entry
+            try:
+                _restore_attribute(target, attribute, original, local, create)
+            finally:
+                _restore_spec_attribute(target, attribute)
 
     def _stop_global_patchings(self):
         for patching in reversed(self.global_patchings):
             if _is_started(patching):
-                patching.stop()
+                # the copies of the patches are entered by patched_factory(),
+                # never started with start()
+                patching.__exit__(None, None, None)
 
     def __repr__(self):
         return repr(self.generator)
 
     def __next__(self):
         try:
-            with self._limited_patchings_stack():
+            if not self._swaps:
+                # no LIMITED patch, nothing to do when resuming
+                return self.gen.send(None)
+
+            undo = self._enter_limited_patchings()
+            try:
                 return self.gen.send(None)
+            finally:
+                self._exit_limited_patchings(undo)
         except BaseException:
             # the generator/coroutine terminated, stop the patchings
             self._stop_global_patchings()
             raise
 
     def send(self, value):
-        with self._limited_patchings_stack():
+        if not self._swaps:
+            return self.gen.send(value)
+
+        undo = self._enter_limited_patchings()
+        try:
             return super().send(value)
+        finally:
+            self._exit_limited_patchings(undo)
 
     def throw(self, exc, value=None, traceback=None):
-        with self._limited_patchings_stack():
+        undo = self._enter_limited_patchings()
+        try:
             return self.gen.throw(exc, value, traceback)
+        finally:
+            self._exit_limited_patchings(undo)
 
     def close(self):
         try:
-            with self._limited_patchings_stack():
+            undo = self._enter_limited_patchings()
+            try:
                 return self.gen.close()
+            finally:
+                self._exit_limited_patchings(undo)
         finally:
             self._stop_global_patchings()
 
@@ -1072,47 +3274,348 @@ class _PatchedGenerator(asyncio.coroutines.CoroWrapper):
         self._stop_global_patchings()
 
 
+class Cassette:
+    """
+    A file where the awaits of coroutine functions patched with
+    ``patch(..., cassette=cassette)`` are recorded, then replayed.
+
+    When recording, the patched coroutine function is replaced by
+    a :class:`~asynctest.CoroutineMock` which runs the original
+    implementation (for instance against a local stand-in server), and
+    records the arguments and the result (or the exception raised) of each
+    await. The cassette is saved when the patch is stopped. Awaits which are
+    cancelled are not recorded, and the awaits recorded while the cassette is
+    used by several patches (for instance a decorator applied to several
+    tests) are all kept.
+
+    A method is patched with an autospec function (see
+    :func:`~asynctest.create_autospec`), so its awaits are recorded with the
+    instance as first argument, but the instance is neither saved nor
+    matched when replaying.
+
+    When replaying, the mock returns the recorded results (or raises the
+    recorded exceptions) without running the original implementation. An
+    await is matched with a recorded one by its arguments, and each recorded
+    await is replayed once, in the order they were recorded.
+    :exc:`LookupError` is raised when no recorded await matches.
+
+    Arguments, results and exceptions are saved with :mod:`pickle`, so they
+    must be picklable.
+
+    :param path: path of the cassette file.
+    :param record: ``True`` to record the awaits (the file is overwritten),
+                   ``False`` to replay them. By default, the awaits are
+                   recorded if the file doesn't exist yet.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, path, record=None):
+        self.path = path
+        if record is None:
+            record = not os.path.exists(path)
+
+        self.record = record
+        #: Recorded awaits, by name of patched target: lists of tuples
+        #: ``(args, kwargs, result, exception)``.
+        self.interactions = {}
+        self._changed = False
+        if not record:
+            self.load()
+
+    def load(self):
+        """
+        Read the recorded awaits from the file.
+        """
+        with open(self.path, 'rb') as file:
+            self.interactions = pickle.load(file)
+
+        self._changed = False
+
+    def save(self):
+        """
+        Write the recorded awaits to the file.
+
+        The file is replaced once the awaits are written, so it is left
+        unchanged if they can't be pickled.
+        """
+        data = pickle.dumps(self.interactions)
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(data)
+
+            os.replace(temporary, self.path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            raise
+
+        self._changed = False
+
+    def _mock(self, name, original, kwargs, method=False):
+        # Return the mock patching original, named name in the cassette.
+        # A method is patched with an autospec function, which is bound to
+        # the instance: the instance is passed to original, but is neither
+        # recorded nor matched.
+        skip = 1 if method else 0
+        if self.record:
+            side_effect = self._recorder(name, original, skip)
+        else:
+            side_effect = self._player(name, skip)
+
+        if method:
+            return create_autospec(original, side_effect=side_effect,
+                                   **kwargs)
+
+        return CoroutineMock(side_effect=side_effect, **kwargs)
+
+    def _recorder(self, name, original, skip):
+        # The awaits are added to the ones recorded by the previous patches
+        interactions = self.interactions.setdefault(name, [])
+
+        async def record(*args, **kwargs):
+            try:
+                result = await original(*args, **kwargs)
+            except asyncio.CancelledError:
+                # the await was interrupted, there is no outcome to replay
+                raise
+            except Exception as e:
+                interactions.append((args[skip:], kwargs, None, e))
+                self._changed = True
+                raise
+
+            interactions.append((args[skip:], kwargs, result, None))
+            self._changed = True
+            return result
+
+        return record
+
+    def _player(self, name, skip):
+        # recorded awaits not replayed yet, by arguments
+        playback = collections.OrderedDict()
+        # recorded awaits with unhashable arguments
+        unhashable = []
+        for interaction in self.interactions.get(name, ()):
+            key = _call_key(interaction[:2])
+            if key is None:
+                unhashable.append(interaction)
+            else:
+                playback.setdefault(key, collections.deque()).append(
+                    interaction)
+
+        def replay(*args, **kwargs):
+            args = args[skip:]
+            key = _call_key((args, kwargs))
+            if key is None:
+                for i, interaction in enumerate(unhashable):
+                    if interaction[:2] == (args, kwargs):
+                        del unhashable[i]
+                        break
+                else:
+                    interaction = None
+            else:
+                recorded = playback.get(key)
+                interaction = recorded.popleft() if recorded else None
+
+            if interaction is None:
+                call = unittest.mock._Call((args, kwargs), two=True)
+                raise LookupError("No await of {} recorded in {} for {}"
+                                  .format(name, self.path, call))
+
+            _, _, result, exception = interaction
+            if exception is not None:
+                raise exception
+
+            return result
+
+        return replay
+
+    def __repr__(self):
+        return "<Cassette {!r} ({})>".format(
+            self.path, "recording" if self.record else "replaying")
+
+
+def _get_target(target):
+    # Like unittest.mock._get_target(), with a getter compiled once
+    _, attribute = unittest.mock._get_target(target)
+    return _compile_getter(target.rsplit('.', 1)[0]), attribute
+
+
+def _compile_getter(target):
+    # Return a function resolving target (a dotted name) each time it is
+    # called, as unittest.mock._importer() does. The name is split once, and
+    # the module is taken from sys.modules rather than imported again, unless
+    # an attribute is missing (the module of a component may not have been
+    # imported yet).
+    module, *components = target.split('.')
+
+    def getter():
+        try:
+            thing = sys.modules[module]
+            for component in components:
+                thing = getattr(thing, component)
+        except (KeyError, AttributeError):
+            return unittest.mock._importer(target)
+
+        return thing
+
+    return getter
+
+
+# Attributes of a started patch, or of a patch used by a single instance of
+# a coroutine, which are not copied from the template by _patch.copy()
+_patch_runtime_attributes = frozenset((
+    'target', 'temp_original', 'is_local', '_exit_stack', 'mock_to_reuse',
+    'additional_patchers', '_task_proxy', '_task_token', '_spec_override'))
+
+
 class _patch(unittest.mock._patch):
     def __init__(self, *args, scope=GLOBAL, **kwargs):
         super().__init__(*args, **kwargs)
         self.scope = scope
         self.mock_to_reuse = None
+        # lazy is an argument of create_autospec(), which must not be passed
+        # to the mock created by unittest
+        self.lazy = bool(self.autospec) and self.kwargs.pop('lazy', False)
+        self.cassette = self.kwargs.pop('cassette', None)
+        if self.cassette is not None and (self.new is not DEFAULT or
+                                          self.autospec is not None or
+                                          self.new_callable is not None):
+            raise ValueError("Cannot use 'cassette' with 'new', 'autospec' "
+                             "or 'new_callable'")
+
+        if scope == TASK and contextvars is None:
+            raise NotImplementedError("scope=TASK requires python 3.7")
+
+        self._task_proxy = None
+        self._task_token = None
+        self._spec_override = None
 
     def copy(self):
-        patcher = _patch(
-            self.getter, self.attribute, self.new, self.spec,
-            self.create, self.spec_set,
-            self.autospec, self.new_callable, self.kwargs,
-            scope=self.scope)
-        patcher.attribute_name = self.attribute_name
+        # Called for each instance of a decorated coroutine: the arguments
+        # have been checked by __init__() already, so the configuration of
+        # the patch (used as a template) is copied as is.
+        patcher = object.__new__(type(self))
+        state = patcher.__dict__
+        for name, value in self.__dict__.items():
+            if name not in _patch_runtime_attributes:
+                state[name] = value
+
+        patcher.mock_to_reuse = None
+        patcher._task_proxy = None
+        patcher._task_token = None
+        patcher._spec_override = None
         patcher.additional_patchers = [
             p.copy() for p in self.additional_patchers
         ]
         return patcher
 
     def __enter__(self):
+        if self.scope == TASK:
+            return self._perform_task_patch()
+
         # When patching a coroutine, we reuse the same mock object
         # for the whole instance of the coroutine
         if self.mock_to_reuse is not None:
             self.target = self.getter()
             self.temp_original, self.is_local = self.get_original()
             setattr(self.target, self.attribute, self.mock_to_reuse)
+            self._override_spec()
             if self.attribute_name is not None:
                 for patching in self.additional_patchers:
                     patching.__enter__()
             return self.mock_to_reuse
         else:
-            return self._perform_patch()
+            result = self._perform_patch()
+            self._override_spec()
+            return result
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            if self._spec_override is not None:
+                _restore_spec_attribute(*self._spec_override)
+                self._spec_override = None
+
+            if self._task_proxy is not None:
+                self._exit_task_patch()
+
+            if self.cassette is not None and self.cassette._changed:
+                self.cassette.save()
+
+    def _override_spec(self):
+        # the version of the metadata of a patched class depends on the value
+        # of the patched attribute (see _spec_version())
+        self._spec_override = (self.target, self.attribute)
+        _override_spec_attribute(self.target, self.attribute)
+
+    def _perform_task_patch(self):
+        # The target is patched once with a proxy resolving to the value set
+        # in the current context. The mock is created by unittest, as usual,
+        # but patches a stand-in of the target.
+        target = self.getter()
+        if not inspect.isclass(target):
+            # the proxy only forwards calls and attributes
+            original, _ = self.get_original()
+            for value in (original, self.new):
+                if value is not DEFAULT and not callable(value):
+                    raise TypeError(
+                        "scope=TASK can only patch a callable or a class "
+                        "on {!r}, {!r} is {!r}".format(
+                            target, self.attribute, value))
+
+        proxy = _acquire_task_proxy(self, target)
+        stand_in = _StandIn()
+        if proxy._original is not DEFAULT:
+            stand_in.__dict__[self.attribute] = proxy._original
+
+        getter = self.getter
+        self.getter = lambda: stand_in
+        try:
+            result = self._perform_patch()
+        except BaseException:
+            _release_task_proxy(proxy)
+            raise
+        finally:
+            self.getter = getter
+
+        self._task_proxy = proxy
+        self._task_token = proxy._var.set(stand_in.__dict__[self.attribute])
+        return result
+
+    def _exit_task_patch(self):
+        proxy, token = self._task_proxy, self._task_token
+        self._task_proxy = self._task_token = None
+        try:
+            proxy._var.reset(token)
+        except ValueError:
+            # the patch is stopped in another context (for instance when the
+            # coroutine is garbage collected), the value is discarded with the
+            # context of the task
+            pass
+
+        _release_task_proxy(proxy)
 
     def _perform_patch(self):
         # This will intercept the result of super().__enter__() if we need to
         # override the default behavior (ie: we need to use our own autospec).
-        original, local = self.get_original()
-        result = super().__enter__()
+        if self.cassette is not None:
+            return self._perform_cassette_patch()
 
-        if self.autospec is None or not self.autospec:
+        if not self.autospec:
             # no need to override the default behavior
-            return result
+            return super().__enter__()
+
+        self.target = self.getter()
+        original, _ = self.get_original()
+        if (self.new is not DEFAULT or original is DEFAULT or
+                self.spec not in (None, False) or
+                self.spec_set not in (None, False, True)):
+            # let unittest raise the appropriate error
+            return super().__enter__()
 
         if self.autospec is True:
             autospec = original
@@ -1120,18 +3623,52 @@ class _patch(unittest.mock._patch):
             autospec = self.autospec
 
         new = create_autospec(autospec, spec_set=bool(self.spec_set),
-                              _name=self.attribute, **self.kwargs)
+                              _name=self.attribute, lazy=self.lazy,
+                              **self.kwargs)
+
+        # unittest patches the target with new, rather than creating its own
+        # autospec which would be discarded
+        saved = self.new, self.autospec, self.kwargs
+        self.new, self.autospec, self.kwargs = new, None, {}
+        try:
+            result = super().__enter__()
+        finally:
+            self.new, self.autospec, self.kwargs = saved
 
-        self.temp_original = original
-        self.is_local = local
-        setattr(self.target, self.attribute, new)
+        if self.attribute_name is not None and self.new is DEFAULT:
+            result[self.attribute_name] = new
 
-        if self.attribute_name is not None:
-            if self.new is DEFAULT:
-                result[self.attribute_name] = new
-            return result
+        return result
 
-        return new
+    def _perform_cassette_patch(self):
+        self.target = self.getter()
+        original, _ = self.get_original()
+        # a function found on a class is called with the instance
+        method = inspect.isclass(self.target) and inspect.isfunction(original)
+        if isinstance(original, (classmethod, staticmethod)):
+            original = original.__get__(None, self.target)
+
+        if not asyncio.iscoroutinefunction(original):
+            raise TypeError("A cassette can only patch a coroutine function, "
+                            "got {!r}".format(original))
+
+        target_name = getattr(self.target, '__qualname__', None) or getattr(
+            self.target, '__name__', type(self.target).__qualname__)
+        new = self.cassette._mock(
+            "{}.{}".format(target_name, self.attribute), original, self.kwargs,
+            method)
+
+        saved = self.new, self.new_callable, self.kwargs
+        self.new, self.new_callable, self.kwargs = new, None, {}
+        try:
+            result = super().__enter__()
+        finally:
+            self.new, self.new_callable, self.kwargs = saved
+
+        if self.attribute_name is not None and self.new is DEFAULT:
+            result[self.attribute_name] = new
+
+        return result
 
     def decorate_callable(self, func):
         wrapped = _decorate_coroutine_callable(func, self)
@@ -1165,7 +3702,11 @@ def patch(target, new=DEFAULT, spec=None, create=False, spec_set=None,
       * :const:`asynctest.LIMITED`: the patch will be activated when the
         generator or coroutine is being executed, and deactivated when it
         yields a value and pauses its execution (with ``yield``, ``yield from``
-        or ``await``).
+        or ``await``),
+
+      * :const:`asynctest.TASK`: the patch is only visible from the task
+        running the coroutine (and the tasks it creates) until the coroutine
+        finishes. Other tasks still see the original value.
 
     Since asynctest 0.13, each instance of the generator or coroutine will have
     its own set of patches. When several instances of the same coroutine are
@@ -1175,7 +3716,17 @@ def patch(target, new=DEFAULT, spec=None, create=False, spec_set=None,
     argument.
 
     To avoid this problem, ``scope`` should be set to
-    :const:`~asynctest.LIMITED`, or ``new`` should be specified.
+    :const:`~asynctest.LIMITED` or :const:`~asynctest.TASK`, or ``new`` should
+    be specified.
+
+    With :const:`~asynctest.TASK`, the target is replaced once by a proxy
+    which resolves to the value of the patch set in the context of the current
+    task (see :mod:`contextvars`), so nothing is done when the coroutine pauses
+    or resumes. On a class, the proxy is a descriptor and accessing the
+    attribute returns the value directly. On other targets (like a module),
+    the proxy forwards calls and attribute accesses to the value. The proxy is
+    removed once the last patch using it is stopped. This scope also works
+    with the context manager, and requires Python 3.7.
 
     When used as a context manager, the patch is still active even if the
     generator or coroutine is paused, which may affect concurrent tasks::
@@ -1194,8 +3745,20 @@ def patch(target, new=DEFAULT, spec=None, create=False, spec_set=None,
         # this will raise an AssertionError(coro() is scheduled first)!
         loop.run_forever()
 
-    :param scope: :const:`asynctest.GLOBAL` or :const:`asynctest.LIMITED`,
-        controls when the patch is activated on generators and coroutines
+    :param scope: :const:`asynctest.GLOBAL`, :const:`asynctest.LIMITED` or
+        :const:`asynctest.TASK`, controls when the patch is activated on
+        generators and coroutines
+
+    When ``autospec`` is set, ``lazy=True`` can be passed as a keyword
+    argument: the mock is created by :func:`~asynctest.create_autospec()`
+    with ``lazy=True``.
+
+    A coroutine function can be patched with ``cassette=`` an
+    :class:`~asynctest.Cassette`: the target is replaced by
+    a :class:`~asynctest.CoroutineMock` which records the awaits of the
+    original implementation in the cassette, or replays them without running
+    the original implementation. ``cassette`` can not be used with ``new``,
+    ``autospec`` or ``new_callable``.
 
     When used as a decorator with a generator based coroutine, the order of
     the decorators matters. The order of the ``@patch()`` decorators is in
@@ -1217,8 +3780,10 @@ def patch(target, new=DEFAULT, spec=None, create=False, spec_set=None,
 
     .. versionadded:: 0.13 patchs are now associated with a generator or
                       coroutine instance instead of the function.
+
+    .. versionadded:: 0.14 :const:`~asynctest.TASK` scope.
     """
-    getter, attribute = unittest.mock._get_target(target)
+    getter, attribute = _get_target(target)
     patcher = _patch(getter, attribute, new, spec, create, spec_set, autospec,
                      new_callable, kwargs, scope=scope)
 
@@ -1237,8 +3802,7 @@ def _patch_object(target, attribute, new=DEFAULT, spec=None, create=False,
 def _patch_multiple(target, spec=None, create=False, spec_set=None,
                     autospec=None, new_callable=None, scope=GLOBAL, **kwargs):
     if type(target) is str:
-        def getter():
-            return unittest.mock._importer(target)
+        getter = _compile_getter(target)
     else:
         def getter():
             return target
@@ -1273,10 +3837,16 @@ class _patch_dict(unittest.mock._patch_dict):
     # documentation is in doc/asynctest.mock.rst
     def __init__(self, in_dict, values=(), clear=False, scope=GLOBAL,
                  **kwargs):
+        if scope == TASK:
+            raise ValueError("patch.dict() does not support scope=TASK")
+
         super().__init__(in_dict, values, clear, **kwargs)
         self.scope = scope
         self._is_started = False
         self._global_patchings = []
+        # With the LIMITED scope, previous values of the keys set by the patch
+        # while it is active
+        self._journal = None
 
     def copy(self):
         patcher = _patch_dict(self.in_dict, self.values, self.clear,
@@ -1315,28 +3885,57 @@ class _patch_dict(unittest.mock._patch_dict):
         if isinstance(self.in_dict, str):
             self.in_dict = unittest.mock._importer(self.in_dict)
 
-        try:
-            self._original = self.in_dict.copy()
-        except AttributeError:
-            # dict like object with no copy method
-            # must support iteration over keys
-            self._original = {}
-            for key in self.in_dict:
-                self._original[key] = self.in_dict[key]
+        if self.scope == LIMITED and not self.clear:
+            # activated each time the coroutine resumes: only the keys set by
+            # the patch are saved
+            self._patch_dict_journal()
+            return
+
+        self._original = _copy_dict(self.in_dict)
 
         if self.clear:
             _clear_dict(self.in_dict)
 
-        try:
-            self.in_dict.update(self.values)
-        except AttributeError:
-            # dict like object with no update method
-            for key in self.values:
-                self.in_dict[key] = self.values[key]
+        _update_dict(self.in_dict, self.values)
+
+    def _patch_dict_journal(self):
+        in_dict = self.in_dict
+        self._journal = {key: _get_item(in_dict, key) for key in self.values}
+        _update_dict(in_dict, self.values)
+
+    def _unpatch_dict_journal(self):
+        # Only the keys of the journal are read and restored, so the cost
+        # does not depend on the size of the dict: other keys changed while
+        # the patch was active keep their new value.
+        in_dict, journal = self.in_dict, self._journal
+        self._journal = None
+
+        for key, original in journal.items():
+            value = _get_item(in_dict, key)
+            if value is not _MISSING and value is not self.values[key]:
+                # updated while the patch was active: add it to self.values,
+                # as the patch may be reactivated
+                self.values[key] = value
+
+            if original is not _MISSING:
+                in_dict[key] = original
+            elif value is not _MISSING:
+                del in_dict[key]
+
+        # keep the values of global patches
+        for patching in self._global_patchings:
+            if patching._is_started:
+                for key in journal:
+                    if key in patching.values:
+                        in_dict[key] = patching.values[key]
 
     def _unpatch_dict(self):
         self._is_started = False
 
+        if self._journal is not None:
+            self._unpatch_dict_journal()
+            return
+
         if self.scope == LIMITED:
             # add to self.values the updated values which where not in
             # the original dict, as the patch may be reactivated
@@ -1354,15 +3953,43 @@ class _patch_dict(unittest.mock._patch_dict):
                 originals.append(patching.values)
 
         for original in originals:
-            try:
-                self.in_dict.update(original)
-            except AttributeError:
-                for key in original:
-                    self.in_dict[key] = original[key]
+            _update_dict(self.in_dict, original)
 
 
 _clear_dict = unittest.mock._clear_dict
 
+_MISSING = object()
+
+
+def _get_item(in_dict, key):
+    try:
+        return in_dict[key]
+    except KeyError:
+        return _MISSING
+
+
+def _copy_dict(in_dict):
+    try:
+        return in_dict.copy()
+    except AttributeError:
+        # dict like object with no copy method
+        # must support iteration over keys
+        copy = {}
+        for key in in_dict:
+            copy[key] = in_dict[key]
+
+        return copy
+
+
+def _update_dict(in_dict, values):
+    try:
+        in_dict.update(values)
+    except AttributeError:
+        # dict like object with no update method
+        for key in values:
+            in_dict[key] = values[key]
+
+
 patch.object = _patch_object
 patch.dict = _patch_dict
 patch.multiple = _patch_multiple
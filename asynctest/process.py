@@ -0,0 +1,623 @@
+# coding: utf-8
+"""
+Module ``process``
+------------------
+
+Virtual subprocesses which can replace
+:meth:`~asyncio.AbstractEventLoop.subprocess_exec()` and
+:meth:`~asyncio.AbstractEventLoop.subprocess_shell()` of a loop.
+
+Spawning a subprocess forks the interpreter and requires a child watcher, which
+is slow and makes the test depend on the programs installed on the host.
+
+A :class:`~asynctest.SubprocessRegistry` runs a coroutine registered by the
+test author in place of the child process. The child communicates with the
+parent through virtual pipes, and the transports and protocols used by
+:func:`asyncio.create_subprocess_exec()` and
+:func:`asyncio.create_subprocess_shell()` work as with a real process::
+
+    class TestClient(asynctest.TestCase):
+        def setUp(self):
+            self.processes = asynctest.SubprocessRegistry()
+            self.processes.add("git", stdout=b"abcdef\\n")
+            self.processes.add("make *", self.make)
+            self.processes.attach(self.loop)
+
+        async def make(self, process):
+            data = await process.stdin.read()
+            process.stderr.write(b"no rule to make target\\n")
+            return 2
+
+        async def test_client(self):
+            ...
+            self.processes.spawned  # processes started so far
+"""
+
+import asyncio
+import collections
+import errno
+import fnmatch
+import inspect
+import itertools
+import os.path
+import signal
+import subprocess
+import traceback
+
+from . import selector
+
+
+_pids = itertools.count(10000)
+
+
+class VirtualProcess:
+    """
+    The child side of a virtual subprocess, passed to the function registered
+    in a :class:`~asynctest.SubprocessRegistry`.
+
+    Data written by the child to :attr:`stdout` or :attr:`stderr` is received
+    by the parent when the pipe has been created with
+    :data:`subprocess.PIPE` (:data:`subprocess.STDOUT` redirects
+    :attr:`stderr` to :attr:`stdout`), and discarded otherwise.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, args, shell, kwargs, loop):
+        #: Arguments of the process, the first item being the program. With
+        #: :meth:`~asyncio.AbstractEventLoop.subprocess_shell()`, it is
+        #: ``["/bin/sh", "-c", cmd]``.
+        self.args = args
+        #: ``True`` if the process has been started with
+        #: :meth:`~asyncio.AbstractEventLoop.subprocess_shell()`.
+        self.shell = shell
+        #: Other keyword arguments given when starting the process (``cwd``,
+        #: ``env``, ...).
+        self.kwargs = kwargs
+        #: Virtual process identifier.
+        self.pid = next(_pids)
+        #: :class:`asyncio.StreamReader` receiving what the parent writes to
+        #: the standard input of the process.
+        self.stdin = asyncio.StreamReader(loop=loop)
+        #: Standard output of the process, an object with ``write()``,
+        #: ``writelines()`` and ``close()`` methods.
+        self.stdout = None
+        #: Standard error of the process, see :attr:`stdout`.
+        self.stderr = None
+        #: List of the signals sent to the process.
+        self.signals = []
+        #: Dict of functions called with the signal number when a signal is
+        #: received, instead of terminating the process. :data:`signal.SIGKILL`
+        #: can not be handled.
+        self.signal_handlers = {}
+        #: Exit status of the process, ``None`` while it is running.
+        self.returncode = None
+
+    def __repr__(self):
+        return "<VirtualProcess {} {!r}>".format(self.pid, self.args)
+
+
+class _ChildPipe:
+    def __init__(self, transport, fd):
+        self._transport = transport
+        self._fd = fd
+        self._closed = False
+
+    def write(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise TypeError("data argument must be a bytes-like object, "
+                            "not {!r}".format(type(data).__name__))
+
+        if self._closed:
+            raise ValueError("I/O operation on closed pipe")
+
+        self._transport._child_write(self._fd, bytes(data))
+
+    def writelines(self, list_of_data):
+        for data in list_of_data:
+            self.write(data)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._transport._child_close(self._fd)
+
+
+class _ReadPipeTransport(asyncio.ReadTransport):
+    # Transport of the parent side of the stdout and stderr pipes
+    def __init__(self, transport, fd):
+        super().__init__(extra={"pipe": selector.FileMock()})
+        self._transport = transport
+        self._fd = fd
+        self._closing = False
+        self._paused = False
+        # data written by the child while reading is paused, delivered to the
+        # protocol once resumed
+        self._buffer = collections.deque()
+        self._eof = False
+
+    def _data_received(self, data):
+        if self._paused or self._buffer:
+            self._buffer.append(data)
+        else:
+            self._transport._protocol.pipe_data_received(self._fd, data)
+
+    def _child_eof(self):
+        if self._paused or self._buffer:
+            # as with a real pipe, the end of file is seen by the parent
+            # after the data written before it
+            self._eof = True
+        else:
+            self.close()
+
+    def _flush(self):
+        while self._buffer and not (self._paused or self._closing):
+            self._transport._protocol.pipe_data_received(
+                self._fd, self._buffer.popleft())
+
+        if self._eof and not (self._buffer or self._paused):
+            self.close()
+
+    def pause_reading(self):
+        self._paused = True
+
+    def resume_reading(self):
+        if self._paused:
+            self._paused = False
+            self._transport._loop.call_soon(self._flush)
+
+    def is_reading(self):
+        return not (self._paused or self._closing)
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._buffer.clear()
+            self._transport._pipe_closed(self._fd)
+
+
+class _WritePipeTransport(asyncio.WriteTransport):
+    # Transport of the parent side of the stdin pipe
+    def __init__(self, transport, stdin):
+        super().__init__(extra={"pipe": selector.FileMock()})
+        self._transport = transport
+        self._stdin = stdin
+        self._closing = False
+
+    def write(self, data):
+        if self._closing:
+            return
+
+        if self._transport._returncode is None:
+            self._stdin.feed_data(bytes(data))
+
+    def can_write_eof(self):
+        return True
+
+    def write_eof(self):
+        self.close()
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._stdin.feed_eof()
+            self._transport._pipe_closed(0)
+
+    def abort(self):
+        self.close()
+
+
+class _SubprocessTransport(asyncio.SubprocessTransport):
+    def __init__(self, loop, protocol, process, child, stdin, stdout, stderr):
+        super().__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self._process = process
+        self._child = child
+        self._returncode = None
+        self._closed = False
+        self._finished = False
+        self._waiters = []
+        self._task = None
+        self._started = False
+        self._signal = None
+
+        self._pipes = {}
+        if stdin == subprocess.PIPE:
+            self._pipes[0] = _WritePipeTransport(self, process.stdin)
+        else:
+            process.stdin.feed_eof()
+
+        if stdout == subprocess.PIPE:
+            self._pipes[1] = _ReadPipeTransport(self, 1)
+
+        if stderr == subprocess.PIPE:
+            self._pipes[2] = _ReadPipeTransport(self, 2)
+
+        self._stderr_fd = 1 if stderr == subprocess.STDOUT else 2
+        # pipes (of the parent side) which are still open
+        self._open_pipes = set(self._pipes)
+
+        process.stdout = _ChildPipe(self, 1)
+        process.stderr = _ChildPipe(self, 2)
+
+    def __repr__(self):
+        info = [self.__class__.__name__, "pid={}".format(self._process.pid)]
+        if self._closed:
+            info.append("closed")
+        if self._returncode is not None:
+            info.append("returncode={}".format(self._returncode))
+        return "<{}>".format(" ".join(info))
+
+    def _start(self):
+        self._protocol.connection_made(self)
+        self._task = self._loop.create_task(self._run())
+
+    @asyncio.coroutine
+    def _run(self):
+        self._started = True
+        try:
+            result = self._child(self._process)
+            if inspect.isawaitable(result):
+                result = yield from result
+            returncode = 0 if result is None else int(result)
+        except asyncio.CancelledError:
+            if self._signal is None:
+                raise
+            returncode = -self._signal
+        except Exception:
+            stderr = traceback.format_exc().encode("utf-8", "replace")
+            self._child_write(self._stderr_fd, stderr)
+            returncode = 1
+
+        self._exited(returncode)
+
+    def _exited(self, returncode):
+        self._returncode = self._process.returncode = returncode
+        self._process.stdout.close()
+        self._process.stderr.close()
+        if 0 in self._open_pipes:
+            # the read end of stdin is closed by the exit of the child
+            self._pipes[0].close()
+
+        self._loop.call_soon(self._protocol.process_exited)
+        self._try_finish()
+        self._loop.call_soon(self._wake_up_waiters)
+
+    def _try_finish(self):
+        # the protocol loses the connection once the process exited and all
+        # the pipes are closed, as with asyncio's subprocess transports
+        if self._finished or self._returncode is None or self._open_pipes:
+            return
+
+        self._finished = True
+        self._loop.call_soon(self._protocol.connection_lost, None)
+
+    def _wake_up_waiters(self):
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(self._returncode)
+
+        self._waiters = []
+
+    def _child_write(self, fd, data):
+        if fd == 2:
+            fd = self._stderr_fd
+
+        if fd not in self._pipes:
+            # the pipe is not redirected to the parent: the data is discarded
+            return
+
+        if fd not in self._open_pipes:
+            raise BrokenPipeError(errno.EPIPE, "Broken pipe")
+
+        if data:
+            self._pipes[fd]._data_received(data)
+
+    def _child_close(self, fd):
+        if self._stderr_fd == 1:
+            # stdout and stderr of the process share the same pipe
+            if not (self._process.stdout._closed and
+                    self._process.stderr._closed):
+                return
+            fd = 1
+
+        if fd in self._open_pipes:
+            self._pipes[fd]._child_eof()
+
+    def _pipe_closed(self, fd):
+        self._open_pipes.discard(fd)
+        self._loop.call_soon(self._pipe_connection_lost, fd)
+
+    def _pipe_connection_lost(self, fd):
+        self._protocol.pipe_connection_lost(fd, None)
+        self._try_finish()
+
+    def get_pid(self):
+        return self._process.pid
+
+    def get_returncode(self):
+        return self._returncode
+
+    def get_pipe_transport(self, fd):
+        return self._pipes.get(fd)
+
+    def send_signal(self, signum):
+        if self._returncode is not None or self._task is None:
+            raise ProcessLookupError()
+
+        self._process.signals.append(signum)
+        handler = self._process.signal_handlers.get(signum)
+        if handler is not None and signum != signal.SIGKILL:
+            handler(signum)
+        elif self._signal is None:
+            self._signal = signum
+            self._task.cancel()
+            if not self._started:
+                # _run() will never be executed
+                self._exited(-signum)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    def is_closing(self):
+        return self._closed
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        for pipe in self._pipes.values():
+            pipe.close()
+
+        if self._returncode is None and self._task is not None:
+            self.kill()
+
+    @asyncio.coroutine
+    def _wait(self):
+        if self._returncode is not None:
+            return self._returncode
+
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        return (yield from waiter)
+
+
+def _scripted_child(stdout, stderr, returncode):
+    @asyncio.coroutine
+    def child(process):
+        process.stdout.write(stdout)
+        process.stderr.write(stderr)
+        return returncode
+
+    return child
+
+
+@asyncio.coroutine
+def _command_not_found(process):
+    process.stderr.write("/bin/sh: 1: {}: not found\n".format(
+        process.args[2].split(" ", 1)[0]).encode())
+    return 127
+
+
+def _check_arg(arg):
+    if not isinstance(arg, (str, bytes)):
+        raise TypeError("program arguments must be a bytes or text string, "
+                        "not {}".format(type(arg).__name__))
+
+    if isinstance(arg, bytes):
+        return os.fsdecode(arg)
+
+    return arg
+
+
+def _check_kwargs(universal_newlines, bufsize):
+    if universal_newlines:
+        raise ValueError("universal_newlines must be False")
+    if bufsize != 0:
+        raise ValueError("bufsize must be 0")
+
+
+class SubprocessRegistry:
+    """
+    A table of virtual programs, used to answer to
+    :meth:`~asyncio.AbstractEventLoop.subprocess_exec()` and
+    :meth:`~asyncio.AbstractEventLoop.subprocess_shell()` calls on a loop once
+    attached with :meth:`attach()`.
+
+    Programs are registered with a pattern matched with
+    :func:`fnmatch.fnmatchcase()`. For
+    :meth:`~asyncio.AbstractEventLoop.subprocess_exec()`, the pattern is
+    matched against the program (or its base name if the pattern doesn't
+    contain a ``/``). For :meth:`~asyncio.AbstractEventLoop.subprocess_shell()`,
+    it is matched against the whole command. Patterns are tried in the order
+    they have been added.
+
+    Starting a program which is not registered raises
+    :exc:`FileNotFoundError` with
+    :meth:`~asyncio.AbstractEventLoop.subprocess_exec()`, and starts a process
+    exiting with the status ``127`` with
+    :meth:`~asyncio.AbstractEventLoop.subprocess_shell()`, as a real shell
+    does.
+
+    :param fallback: if ``True``, programs which are not registered are started
+                     by the original methods of the loop.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, fallback=False):
+        self.fallback = fallback
+        #: List of the :class:`~asynctest.VirtualProcess` objects started.
+        self.spawned = []
+        self._programs = []
+        self._loop = None
+        self._originals = {}
+
+    def add(self, pattern, child=None, *, stdout=b"", stderr=b"",
+            returncode=0):
+        """
+        Register a program.
+
+        :param child: function or coroutine function called with
+                      a :class:`~asynctest.VirtualProcess` when the program is
+                      started. The process exits when ``child`` returns,
+                      with the status it returned (``0`` if it returned
+                      ``None``). If ``child`` raises an exception, the
+                      traceback is written to the standard error and the
+                      status is ``1``.
+        :param stdout: when ``child`` is ``None``, bytes written to the
+                       standard output by the process.
+        :param stderr: when ``child`` is ``None``, bytes written to the
+                       standard error by the process.
+        :param returncode: when ``child`` is ``None``, exit status of the
+                           process.
+        """
+        if child is None:
+            child = _scripted_child(stdout, stderr, returncode)
+
+        self._programs = [(p, c) for p, c in self._programs if p != pattern]
+        self._programs.append((pattern, child))
+
+    def remove(self, pattern):
+        """
+        Remove a program from the table.
+
+        :raise KeyError: if ``pattern`` is not in the table.
+        """
+        for i, (registered, _) in enumerate(self._programs):
+            if registered == pattern:
+                del self._programs[i]
+                return
+
+        raise KeyError(pattern)
+
+    def _lookup(self, name, shell):
+        basename = os.path.basename(name)
+        for pattern, child in self._programs:
+            if shell or "/" in pattern:
+                if fnmatch.fnmatchcase(name, pattern):
+                    return child
+            elif fnmatch.fnmatchcase(basename, pattern):
+                return child
+
+        return None
+
+    def attach(self, loop):
+        """
+        Replace :meth:`~asyncio.AbstractEventLoop.subprocess_exec()` and
+        :meth:`~asyncio.AbstractEventLoop.subprocess_shell()` of ``loop`` by
+        the methods of the registry.
+
+        If the registry was already attached to a loop, it is detached first.
+        """
+        if self._loop is not None:
+            self.detach()
+
+        self._loop = loop
+        for method in ("subprocess_exec", "subprocess_shell"):
+            self._originals[method] = (getattr(loop, method),
+                                       loop.__dict__.get(method))
+            setattr(loop, method, getattr(self, method))
+
+    def detach(self):
+        """
+        Restore the methods of the loop the registry is attached to.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+
+        for method, (_, instance_value) in self._originals.items():
+            if instance_value is None:
+                delattr(loop, method)
+            else:
+                setattr(loop, method, instance_value)
+
+        self._loop = None
+        self._originals = {}
+
+    @asyncio.coroutine
+    def _spawn(self, protocol_factory, args, shell, child, stdin, stdout,
+               stderr, kwargs):
+        process = VirtualProcess(args, shell, kwargs, self._loop)
+        self.spawned.append(process)
+
+        protocol = protocol_factory()
+        transport = _SubprocessTransport(self._loop, protocol, process, child,
+                                         stdin, stdout, stderr)
+        transport._start()
+        return transport, protocol
+
+    @asyncio.coroutine
+    def subprocess_exec(self, protocol_factory, program, *args,
+                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE, universal_newlines=False,
+                        shell=False, bufsize=0, **kwargs):
+        """
+        Start a virtual process, see
+        :meth:`~asyncio.AbstractEventLoop.subprocess_exec()`.
+        """
+        _check_kwargs(universal_newlines, bufsize)
+        if shell:
+            raise ValueError("shell must be False")
+
+        popen_args = [_check_arg(arg) for arg in (program, ) + args]
+
+        child = self._lookup(popen_args[0], False)
+        if child is None:
+            if self.fallback and "subprocess_exec" in self._originals:
+                original = self._originals["subprocess_exec"][0]
+                return (yield from original(
+                    protocol_factory, program, *args, stdin=stdin,
+                    stdout=stdout, stderr=stderr, **kwargs))
+
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory",
+                                    popen_args[0])
+
+        return (yield from self._spawn(protocol_factory, popen_args, False,
+                                       child, stdin, stdout, stderr, kwargs))
+
+    @asyncio.coroutine
+    def subprocess_shell(self, protocol_factory, cmd, *,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE, universal_newlines=False,
+                         shell=True, bufsize=0, **kwargs):
+        """
+        Start a virtual process, see
+        :meth:`~asyncio.AbstractEventLoop.subprocess_shell()`.
+        """
+        if not isinstance(cmd, (bytes, str)):
+            raise ValueError("cmd must be a string")
+        _check_kwargs(universal_newlines, bufsize)
+        if not shell:
+            raise ValueError("shell must be True")
+
+        command = _check_arg(cmd)
+        child = self._lookup(command, True)
+        if child is None:
+            if self.fallback and "subprocess_shell" in self._originals:
+                original = self._originals["subprocess_shell"][0]
+                return (yield from original(
+                    protocol_factory, cmd, stdin=stdin, stdout=stdout,
+                    stderr=stderr, **kwargs))
+
+            child = _command_not_found
+
+        return (yield from self._spawn(protocol_factory,
+                                       ["/bin/sh", "-c", command], True,
+                                       child, stdin, stdout, stderr, kwargs))
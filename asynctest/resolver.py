@@ -0,0 +1,328 @@
+# coding: utf-8
+"""
+Module ``resolver``
+-------------------
+
+An in-memory name resolver which can replace
+:meth:`~asyncio.AbstractEventLoop.getaddrinfo()` and
+:meth:`~asyncio.AbstractEventLoop.getnameinfo()` of a loop.
+
+By default, these methods run the blocking functions of the :mod:`socket`
+module in the executor of the loop, which relies on the resolver of the
+system. This is slow and the result depends on the network configuration of
+the host running the tests.
+
+A :class:`~asynctest.Resolver` answers directly on the loop from a table of
+names configured by the test author::
+
+    class TestClient(asynctest.ClockedTestCase):
+        def setUp(self):
+            self.resolver = asynctest.Resolver()
+            self.resolver.add("example.com", "93.184.216.34", latency=.1)
+            self.resolver.add("*.example.com", "10.0.0.1")
+            self.resolver.fail("down.example.com")
+            self.resolver.attach(self.loop)
+
+            self.resolver.queries  # names queried so far
+"""
+
+import asyncio
+import fnmatch
+import ipaddress
+import socket
+
+
+def _name_error():
+    return socket.gaierror(socket.EAI_NONAME,
+                           "Name or service not known")
+
+
+class _Entry:
+    def __init__(self, name, addresses, latency, canonname, exception):
+        self.name = name
+        self.addresses = addresses
+        self.latency = latency
+        self.canonname = canonname or name
+        self.exception = exception
+
+
+class Resolver:
+    """
+    An in-memory table of names, used to answer to
+    :meth:`~asyncio.AbstractEventLoop.getaddrinfo()` and
+    :meth:`~asyncio.AbstractEventLoop.getnameinfo()` calls on a loop once
+    attached with :meth:`attach()`.
+
+    Numeric addresses are always resolved to themselves, and ``None`` to the
+    wildcard or loopback addresses, as the system resolver does.
+
+    Names are not case sensitive. A name can be a pattern matched with
+    :func:`fnmatch.fnmatchcase()` (for instance ``*.example.com``). Patterns
+    are tried in the order they have been added, after the names which are
+    not patterns.
+
+    Latencies are simulated with :func:`asyncio.sleep()` on the loop: with
+    a :class:`~asynctest.ClockedTestCase`, no actual time is spent waiting.
+
+    :param fallback: if ``True``, names which are not in the table are
+                     resolved by the original methods of the loop. Else,
+                     :exc:`socket.gaierror` is raised.
+
+    .. versionadded:: 0.14
+    """
+    def __init__(self, fallback=False):
+        self.fallback = fallback
+        #: List of the names (or addresses) queried with
+        #: :meth:`getaddrinfo()` and :meth:`getnameinfo()`.
+        self.queries = []
+        self._names = {}
+        self._patterns = []
+        self._loop = None
+        self._originals = {}
+
+    def add(self, name, *addresses, latency=0, canonname=None):
+        """
+        Add a name resolved to one or more IPv4 or IPv6 ``addresses``.
+
+        :param latency: time in seconds spent resolving the name.
+        :param canonname: canonical name of the host, returned when
+                          :data:`socket.AI_CANONNAME` is set in flags.
+                          Defaults to ``name``.
+        """
+        for address in addresses:
+            # raises ValueError if the address is invalid
+            ipaddress.ip_address(address)
+
+        self._add(_Entry(name, list(addresses), latency, canonname, None))
+
+    def fail(self, name, exception=None, latency=0):
+        """
+        Add a name which can not be resolved.
+
+        :param exception: exception raised when resolving the name, by default
+                          a :exc:`socket.gaierror` for an unknown name.
+        :param latency: time in seconds spent before the failure.
+        """
+        if exception is None:
+            exception = _name_error()
+
+        self._add(_Entry(name, [], latency, None, exception))
+
+    def remove(self, name):
+        """
+        Remove a name or pattern from the table.
+
+        :raise KeyError: if ``name`` is not in the table.
+        """
+        key = name.lower()
+        if key in self._names:
+            del self._names[key]
+            return
+
+        for i, (pattern, _) in enumerate(self._patterns):
+            if pattern == key:
+                del self._patterns[i]
+                return
+
+        raise KeyError(name)
+
+    def _add(self, entry):
+        key = entry.name.lower()
+        if any(c in key for c in "*?["):
+            self._patterns = [(pattern, e) for pattern, e in self._patterns
+                              if pattern != key]
+            self._patterns.append((key, entry))
+        else:
+            self._names[key] = entry
+
+    def _lookup(self, name):
+        key = name.lower()
+        try:
+            return self._names[key]
+        except KeyError:
+            pass
+
+        for pattern, entry in self._patterns:
+            if fnmatch.fnmatchcase(key, pattern):
+                return entry
+
+        return None
+
+    def attach(self, loop):
+        """
+        Replace :meth:`~asyncio.AbstractEventLoop.getaddrinfo()` and
+        :meth:`~asyncio.AbstractEventLoop.getnameinfo()` of ``loop`` by the
+        methods of the resolver.
+
+        If the resolver was already attached to a loop, it is detached first.
+        """
+        if self._loop is not None:
+            self.detach()
+
+        self._loop = loop
+        for method in ("getaddrinfo", "getnameinfo"):
+            self._originals[method] = (getattr(loop, method),
+                                       loop.__dict__.get(method))
+            setattr(loop, method, getattr(self, method))
+
+    def detach(self):
+        """
+        Restore the methods of the loop the resolver is attached to.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+
+        for method, (_, instance_value) in self._originals.items():
+            if instance_value is None:
+                delattr(loop, method)
+            else:
+                setattr(loop, method, instance_value)
+
+        self._loop = None
+        self._originals = {}
+
+    @asyncio.coroutine
+    def _wait(self, entry):
+        if entry.latency:
+            yield from asyncio.sleep(entry.latency, loop=self._loop)
+
+        if entry.exception is not None:
+            raise entry.exception
+
+    @asyncio.coroutine
+    def getaddrinfo(self, host, port, *, family=0, type=0, proto=0, flags=0):
+        """
+        Resolve ``host`` and ``port``, see :func:`socket.getaddrinfo()`.
+        """
+        if isinstance(host, bytes):
+            host = host.decode("idna")
+
+        self.queries.append(host)
+
+        if host is None:
+            if flags & socket.AI_PASSIVE:
+                addresses = ["0.0.0.0", "::"]
+            else:
+                addresses = ["127.0.0.1", "::1"]
+            canonname = ""
+        elif _is_numeric(host):
+            addresses = [host]
+            canonname = host
+        else:
+            entry = self._lookup(host)
+            if entry is None:
+                if self.fallback and "getaddrinfo" in self._originals:
+                    original = self._originals["getaddrinfo"][0]
+                    return (yield from original(
+                        host, port, family=family, type=type, proto=proto,
+                        flags=flags))
+
+                raise _name_error()
+
+            yield from self._wait(entry)
+            addresses = entry.addresses
+            canonname = entry.canonname
+
+        port = _service_port(port, type)
+
+        infos = []
+        for address in addresses:
+            if ":" in address:
+                address_family = socket.AF_INET6
+                sockaddr = (address, port, 0, 0)
+            else:
+                address_family = socket.AF_INET
+                sockaddr = (address, port)
+
+            if family not in (socket.AF_UNSPEC, address_family):
+                continue
+
+            for sock_type, sock_proto in _socket_types(type, proto):
+                infos.append((address_family, sock_type, sock_proto, "",
+                              sockaddr))
+
+        if not infos:
+            raise socket.gaierror(
+                getattr(socket, "EAI_ADDRFAMILY", socket.EAI_FAMILY),
+                "Address family for hostname not supported")
+
+        if flags & socket.AI_CANONNAME:
+            infos[0] = infos[0][:3] + (canonname, ) + infos[0][4:]
+
+        return infos
+
+    @asyncio.coroutine
+    def getnameinfo(self, sockaddr, flags=0):
+        """
+        Find the name of the host of ``sockaddr``, see
+        :func:`socket.getnameinfo()`.
+
+        The name returned is the first name (in insertion order) which is not
+        a pattern and resolves to the address of ``sockaddr``.
+        """
+        address, port = sockaddr[:2]
+        self.queries.append(address)
+
+        name = None
+        if not flags & socket.NI_NUMERICHOST:
+            for entry in self._names.values():
+                if address in entry.addresses:
+                    yield from self._wait(entry)
+                    name = entry.name
+                    break
+
+        if name is None:
+            if flags & socket.NI_NAMEREQD:
+                raise _name_error()
+
+            name = address
+
+        if flags & socket.NI_NUMERICSERV:
+            service = str(port)
+        else:
+            try:
+                service = socket.getservbyport(
+                    port, "udp" if flags & socket.NI_DGRAM else "tcp")
+            except OSError:
+                service = str(port)
+
+        return name, service
+
+
+def _is_numeric(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+
+    return True
+
+
+def _service_port(port, sock_type):
+    if port is None:
+        return 0
+
+    if isinstance(port, bytes):
+        port = port.decode()
+
+    if isinstance(port, str):
+        if port.isdigit():
+            return int(port)
+
+        try:
+            return socket.getservbyname(
+                port, "udp" if sock_type == socket.SOCK_DGRAM else "tcp")
+        except OSError:
+            raise socket.gaierror(socket.EAI_SERVICE,
+                                  "Servname not supported for ai_socktype")
+
+    return port
+
+
+def _socket_types(sock_type, proto):
+    if sock_type:
+        return [(sock_type, proto)]
+
+    return [(socket.SOCK_STREAM, proto or socket.IPPROTO_TCP),
+            (socket.SOCK_DGRAM, proto or socket.IPPROTO_UDP)]
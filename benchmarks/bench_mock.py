@@ -0,0 +1,68 @@
+# coding: utf-8
+"""
+Benchmark of the construction of mocks: number of mocks created per second,
+and memory used by each mock (as traced by :mod:`tracemalloc`).
+
+Run it from the root of the repository::
+
+    python benchmarks/bench_mock.py
+"""
+import gc
+import os.path
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import asynctest  # noqa: E402
+
+
+class Spec:
+    async def a_coroutine(self):
+        pass
+
+    def a_function(self):
+        pass
+
+
+def measure(factory, count=20000, kept=2000):
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(count):
+        factory()
+    rate = count / (time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        mocks = [factory() for _ in range(kept)]
+        size = (tracemalloc.get_traced_memory()[0] - before) / kept
+    finally:
+        tracemalloc.stop()
+
+    del mocks
+    return rate, size
+
+
+BENCHMARKS = (
+    ("Mock()", asynctest.Mock),
+    ("MagicMock()", asynctest.MagicMock),
+    ("CoroutineMock()", asynctest.CoroutineMock),
+    ("MagicMock().__enter__", lambda: asynctest.MagicMock().__enter__),
+    ("MagicMock(spec=Spec)", lambda: asynctest.MagicMock(spec=Spec)),
+    ("create_autospec(Spec)", lambda: asynctest.create_autospec(Spec)),
+)
+
+
+def main():
+    print("{:<24} {:>12} {:>12}".format("", "mocks/s", "bytes/mock"))
+    for name, factory in BENCHMARKS:
+        rate, size = measure(factory)
+        print("{:<24} {:>12.0f} {:>12.0f}".format(name, rate, size))
+
+
+if __name__ == "__main__":
+    main()
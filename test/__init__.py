@@ -1,4 +1,7 @@
 from .test_case import *
+from .test_executor import *
 from .test_helpers import *
 from .test_mock import *
+from .test_process import *
+from .test_resolver import *
 from .test_selector import *
@@ -392,6 +392,63 @@ class Test_TestCase_and_ChildWatcher(_TestCase):
                 default_loop.run_until_complete(coro)
 
 
+    def test_child_watcher_choice(self):
+        class WatcherTestCase(Test.StartWaitProcessTestCase):
+            child_watcher = ("pidfd", "fast")
+
+            @asyncio.coroutine
+            def runTest(self):
+                yield from super().runTest()
+                watchers.append(asyncio.get_child_watcher())
+
+        expected = getattr(asyncio, "PidfdChildWatcher",
+                           asyncio.FastChildWatcher)
+        for method in self.run_methods:
+            with self.subTest(method=method):
+                watchers = []
+                outcome = getattr(WatcherTestCase(), method)()
+
+                if outcome:
+                    self.assertTrue(outcome.wasSuccessful())
+                self.assertIsInstance(watchers[0], expected)
+
+    def test_unknown_child_watcher(self):
+        with self.assertRaises(ValueError):
+            asynctest.case._get_child_watcher_class("unknown")
+
+        with self.assertRaises(NotImplementedError):
+            asynctest.case._get_child_watcher_class(())
+
+    def test_reuse_child_watcher(self):
+        self.addCleanup(asynctest.case._close_reused_watchers)
+
+        class WatcherTestCase(Test.StartWaitProcessTestCase):
+            reuse_child_watcher = True
+
+            @asyncio.coroutine
+            def runTest(self):
+                yield from super().runTest()
+                watchers.append(asyncio.get_child_watcher())
+
+        watchers = []
+        for _ in range(2):
+            outcome = WatcherTestCase().run()
+            self.assertTrue(outcome.wasSuccessful())
+
+        self.assertIs(watchers[0], watchers[1])
+        self.assertIsInstance(watchers[0], asyncio.SafeChildWatcher)
+        # the watcher is not closed, only detached from the loop
+        self.assertIsNone(watchers[0]._loop)
+
+    def test_close_reused_watchers(self):
+        watcher = unittest.mock.Mock()
+        asynctest.case._reused_watchers[type(watcher)] = watcher
+
+        asynctest.case._close_reused_watchers()
+        watcher.close.assert_called_once_with()
+        self.assertEqual({}, asynctest.case._reused_watchers)
+
+
 class Test_ClockedTestCase(asynctest.ClockedTestCase):
     took_n_seconds = re.compile(r'took \d+\.\d{3} seconds')
 
@@ -0,0 +1,247 @@
+# coding: utf-8
+
+import asyncio
+import concurrent.futures
+import threading
+import unittest
+
+import asynctest
+
+
+class Test_SharedExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = asynctest.SharedExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_stats(self):
+        stats = self.executor.reset_stats()
+        self.assertIs(stats, self.executor.stats)
+
+        futures = [self.executor.submit(lambda x: x, i) for i in range(4)]
+        self.assertEqual([0, 1, 2, 3], [f.result() for f in futures])
+
+        self.assertEqual(4, stats.submitted)
+        self.assertEqual(4, stats.completed)
+        self.assertEqual(0, stats.running)
+        self.assertGreaterEqual(stats.max_concurrency, 1)
+        self.assertLessEqual(stats.max_concurrency, 2)
+        self.assertGreaterEqual(stats.max_queue_wait, 0)
+        self.assertEqual((), stats.pending)
+
+    def test_max_concurrency(self):
+        stats = self.executor.reset_stats()
+        barrier = threading.Barrier(2, timeout=1)
+
+        futures = [self.executor.submit(barrier.wait) for _ in range(2)]
+        for future in futures:
+            future.result()
+
+        self.assertEqual(2, stats.max_concurrency)
+
+    def test_call_accounted_in_stats_of_submission(self):
+        event = threading.Event()
+        stats = self.executor.reset_stats()
+        future = self.executor.submit(event.wait, 1)
+        self.assertEqual((event.wait, ), stats.pending)
+
+        new_stats = self.executor.reset_stats()
+        event.set()
+        future.result()
+
+        self.assertEqual(1, stats.completed)
+        self.assertEqual((), stats.pending)
+        self.assertEqual(0, new_stats.submitted)
+
+    def test_exception_is_accounted(self):
+        stats = self.executor.reset_stats()
+
+        def raises():
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(raises).result()
+
+        self.assertEqual(1, stats.completed)
+        self.assertEqual(0, stats.running)
+
+
+class Test_InlineExecutor(unittest.TestCase):
+    def test_submit_runs_synchronously(self):
+        executor = asynctest.InlineExecutor()
+        thread_ids = []
+
+        future = executor.submit(
+            lambda: thread_ids.append(threading.get_ident()) or 42)
+
+        self.assertTrue(future.done())
+        self.assertEqual(42, future.result())
+        self.assertEqual([threading.get_ident()], thread_ids)
+
+    def test_submit_exception(self):
+        executor = asynctest.InlineExecutor()
+        future = executor.submit(int, "not an int")
+        self.assertIsInstance(future.exception(), ValueError)
+
+    def test_submit_after_shutdown(self):
+        executor = asynctest.InlineExecutor()
+        executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            executor.submit(lambda: None)
+
+
+class Test_TestCase_use_inline_executor(asynctest.TestCase):
+    use_inline_executor = True
+
+    def test_run_in_executor_returns_resolved_future(self):
+        calls = []
+        future = self.loop.run_in_executor(None, calls.append, 1)
+        self.assertTrue(future.done())
+        self.assertIsInstance(future, asyncio.Future)
+        self.assertEqual([1], calls)
+
+    @asyncio.coroutine
+    def test_run_in_executor_exception(self):
+        with self.assertRaises(ValueError):
+            yield from self.loop.run_in_executor(None, int, "not an int")
+
+    @asyncio.coroutine
+    def test_deferred(self):
+        self.loop.set_default_executor(asynctest.InlineExecutor(deferred=True))
+        calls = []
+        future = self.loop.run_in_executor(None, calls.append, 1)
+        self.assertFalse(future.done())
+        self.assertEqual([], calls)
+        yield from future
+        self.assertEqual([1], calls)
+
+    @asyncio.coroutine
+    def test_other_executors_are_used(self):
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+
+        thread_id = yield from self.loop.run_in_executor(executor,
+                                                         threading.get_ident)
+        self.assertNotEqual(threading.get_ident(), thread_id)
+
+
+class Test_TestCase_use_shared_executor(unittest.TestCase):
+    class SharedExecutorTestCase(asynctest.TestCase):
+        use_shared_executor = True
+
+        executors = []
+
+        @asyncio.coroutine
+        def runTest(self):
+            yield from self.loop.run_in_executor(None, lambda: None)
+            self.executors.append(self.loop._default_executor)
+
+    def test_executor_is_shared_and_not_shut_down(self):
+        self.SharedExecutorTestCase.executors = []
+        for _ in range(2):
+            case = self.SharedExecutorTestCase()
+            result = case.run()
+            self.assertTrue(result.wasSuccessful())
+            self.assertEqual(1, case.executor_stats.submitted)
+            self.assertEqual(1, case.executor_stats.completed)
+
+        executor = asynctest.get_shared_executor()
+        self.assertEqual([executor, executor],
+                         self.SharedExecutorTestCase.executors)
+        self.assertIsNone(case.loop)
+        # the executor still works after the loops have been closed
+        self.assertEqual(1, executor.submit(lambda: 1).result())
+
+    def test_fails_on_active_executor_work(self):
+        event = threading.Event()
+
+        @asynctest.fail_on(active_executor_work=True)
+        class TestCase(asynctest.TestCase):
+            use_shared_executor = True
+
+            def runTest(self):
+                future = self.loop.run_in_executor(None, event.wait, 1)
+
+                @asyncio.coroutine
+                def release():
+                    event.set()
+                    yield from future
+
+                # cleanups run after the checks
+                self.addCleanup(release)
+
+        result = TestCase().run()
+        self.assertEqual(1, len(result.failures))
+        self.assertIn("unfinished work", result.failures[0][1])
+
+    def test_active_executor_work_ignored_without_shared_executor(self):
+        event = threading.Event()
+
+        @asynctest.fail_on(active_executor_work=True)
+        class TestCase(asynctest.TestCase):
+            def runTest(self):
+                future = self.loop.run_in_executor(None, event.wait, 1)
+
+                @asyncio.coroutine
+                def release():
+                    event.set()
+                    yield from future
+
+                # cleanups run after the checks
+                self.addCleanup(release)
+
+        result = TestCase().run()
+        self.assertTrue(result.wasSuccessful())
+
+
+
+class Test_TestCase_executor_with_default_loop(unittest.TestCase):
+    def setUp(self):
+        self.default_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.default_loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.addCleanup(self.default_loop.close)
+
+    def test_shared_executor_is_detached(self):
+        class TestCase(asynctest.TestCase):
+            use_default_loop = True
+            use_shared_executor = True
+
+            @asyncio.coroutine
+            def runTest(self):
+                yield from self.loop.run_in_executor(None, lambda: None)
+
+        self.assertTrue(TestCase().run().wasSuccessful())
+        self.assertIsNone(self.default_loop._default_executor)
+        self.assertNotIn("run_in_executor", vars(self.default_loop))
+
+        # closing the loop doesn't shut down the shared executor
+        self.default_loop.close()
+        executor = asynctest.get_shared_executor()
+        self.assertEqual(1, executor.submit(lambda: 1).result())
+
+    def test_inline_executor_is_restored(self):
+        original = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(original.shutdown)
+        self.default_loop.set_default_executor(original)
+
+        class TestCase(asynctest.TestCase):
+            use_default_loop = True
+            use_inline_executor = True
+
+            @asyncio.coroutine
+            def runTest(self):
+                thread_id = yield from self.loop.run_in_executor(
+                    None, threading.get_ident)
+                self.assertEqual(threading.get_ident(), thread_id)
+
+        self.assertTrue(TestCase().run().wasSuccessful())
+        self.assertIs(original, self.default_loop._default_executor)
+        self.assertNotIn("run_in_executor", vars(self.default_loop))
+
+        thread_id = self.default_loop.run_until_complete(
+            self.default_loop.run_in_executor(None, threading.get_ident))
+        self.assertNotEqual(threading.get_ident(), thread_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
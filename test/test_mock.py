@@ -2,18 +2,31 @@
 # pylama: ignore=E501  noqa
 
 import asyncio
+import collections
 import functools
+import gc
 import inspect
+import io
+import itertools
+import mmap
+import os
 import platform
 import unittest
 import sys
+import tempfile
+import threading
+import types
 import warnings
+import weakref
 
 import asynctest
 
 from .utils import run_coroutine
 
 
+MODULE_CONSTANT = 2
+
+
 class Test:
     @asyncio.coroutine
     def a_coroutine(self):
@@ -503,20 +516,75 @@ class Test_CoroutineMock(unittest.TestCase, _Test_called_coroutine,
         mock = asynctest.mock.CoroutineMock()
         self.assertIsInstance(run_coroutine(mock()), asynctest.mock.MagicMock)
 
+    def test_call_returns_coroutine_without_wrapper_in_debug_mode(self):
+        mock = asynctest.mock.CoroutineMock(side_effect=ProbeException)
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.set_debug(True)
+
+        first, second = mock(), mock()
+        self.assertTrue(asyncio.iscoroutine(first))
+        self.assertIs(first.gi_code, second.gi_code)
+
+        with self.assertRaises(ProbeException):
+            loop.run_until_complete(first)
+        with self.assertRaises(ProbeException):
+            loop.run_until_complete(second)
+        self.assertEqual(2, mock.await_count)
+
 
 class Test_CoroutineMock_awaited(asynctest.TestCase):
     @asynctest.fail_on(unused_loop=False)
-    def test_awaited_delays_creation_of_condition(self):
+    def test_awaited_without_waiters(self):
         mock = asynctest.mock.CoroutineMock()
-        self.assertIsNone(mock.awaited._condition)
+        run_coroutine(mock())
 
-        coro = mock()
-        condition_before_run = mock.awaited._condition
-        run_coroutine(coro)
-        condition_after_run = mock.awaited._condition
+        self.assertEqual([], mock.awaited._count_waiters)
+        self.assertEqual([], mock.awaited._predicate_waiters)
+
+    @asyncio.coroutine
+    def test_awaited_wakes_up_satisfied_waiters_only(self):
+        mock = asynctest.mock.CoroutineMock()
+        first = asyncio.ensure_future(mock.awaited.wait())
+        third = asyncio.ensure_future(mock.awaited.wait(skip=2))
+        cancelled = asyncio.ensure_future(mock.awaited.wait())
+        even = asyncio.ensure_future(mock.awaited.wait_for(
+            lambda mock: mock.await_count % 2 == 0 and mock.await_count))
+        yield from asyncio.sleep(0)
+        cancelled.cancel()
 
-        self.assertIsNone(condition_before_run)
-        self.assertIsNotNone(condition_after_run)
+        yield from mock()
+        yield from asyncio.sleep(0)
+        self.assertTrue(first.result())
+        self.assertFalse(third.done())
+        self.assertFalse(even.done())
+        self.assertEqual(1, len(mock.awaited._count_waiters))
+
+        yield from mock()
+        self.assertEqual(2, (yield from even))
+        self.assertEqual([], mock.awaited._predicate_waiters)
+
+        yield from mock()
+        self.assertTrue((yield from third))
+        self.assertEqual([], mock.awaited._count_waiters)
+
+    @asyncio.coroutine
+    def test_cancelled_waiters_are_removed(self):
+        mock = asynctest.mock.CoroutineMock()
+        waiters = [asyncio.ensure_future(mock.awaited.wait(skip=1)),
+                   asyncio.ensure_future(mock.awaited.wait_for(bool))]
+        waiter = asyncio.ensure_future(mock.awaited.wait(skip=2))
+        yield from asyncio.sleep(0)
+
+        for cancelled in waiters:
+            cancelled.cancel()
+        yield from asyncio.sleep(0)
+        self.assertEqual(1, len(mock.awaited._count_waiters))
+        self.assertEqual([], mock.awaited._predicate_waiters)
+
+        for _ in range(3):
+            yield from mock()
+        self.assertTrue((yield from waiter))
 
     @asyncio.coroutine
     def test_awaited_CoroutineMock_sets_awaited(self):
@@ -782,6 +850,760 @@ class Test_CoroutineMock_awaited(asynctest.TestCase):
         mock.assert_has_awaits([asynctest.call("arg0", "arg1", "arg2")])
 
 
+class Test_CoroutineMock_latency(asynctest.ClockedTestCase):
+    @asyncio.coroutine
+    def test_fixed_latency(self):
+        mock = asynctest.CoroutineMock(return_value="result", latency=2)
+        task = self.loop.create_task(mock())
+
+        yield from self.advance(1)
+        self.assertFalse(task.done())
+        self.assertEqual(0, mock.await_count)
+
+        yield from self.advance(1)
+        self.assertEqual("result", task.result())
+        mock.assert_awaited_once_with()
+
+    @asyncio.coroutine
+    def test_latency_before_exception(self):
+        mock = asynctest.CoroutineMock(side_effect=ProbeException)
+        mock.latency = asynctest.Latency.fixed(1)
+        task = self.loop.create_task(mock())
+
+        yield from self.advance(0.5)
+        self.assertFalse(task.done())
+        yield from self.advance(0.5)
+        self.assertIsInstance(task.exception(), ProbeException)
+
+    @asyncio.coroutine
+    def test_sampled_latencies(self):
+        mock = asynctest.CoroutineMock(
+            latency=asynctest.Latency.empirical([1, 3], seed=4))
+        tasks = [self.loop.create_task(mock()) for _ in range(20)]
+
+        yield from self.advance(1)
+        fast = sum(task.done() for task in tasks)
+        self.assertGreater(fast, 0)
+        self.assertLess(fast, 20)
+
+        yield from self.advance(2)
+        self.assertTrue(all(task.done() for task in tasks))
+
+
+class Test_CoroutineMock_concurrency(asynctest.ClockedTestCase):
+    @asyncio.coroutine
+    def test_concurrency_stats(self):
+        mock = asynctest.CoroutineMock(latency=1)
+        self.loop.create_task(mock())
+        self.loop.create_task(mock())
+        yield from self.advance(0)
+        self.assertEqual(2, mock.concurrency.in_flight)
+
+        yield from self.advance(1)
+        self.loop.create_task(mock())
+        yield from self.advance(1)
+
+        stats = mock.concurrency
+        self.assertEqual(0, stats.in_flight)
+        self.assertEqual(2, stats.peak)
+        self.assertEqual({2: 1, 1: 1}, stats.histogram)
+        self.assertEqual(1.5, stats.mean)
+
+        mock.assert_awaited_concurrently(2)
+        mock.assert_max_concurrency(2)
+        with self.assertRaises(AssertionError):
+            mock.assert_awaited_concurrently(3)
+        with self.assertRaises(AssertionError):
+            mock.assert_max_concurrency(1)
+
+        mock.reset_mock()
+        self.assertEqual(0, mock.concurrency.peak)
+
+    @asyncio.coroutine
+    def test_semaphore_caps_concurrency(self):
+        mock = asynctest.CoroutineMock(latency=1)
+        semaphore = asyncio.Semaphore(3, loop=self.loop)
+
+        @asyncio.coroutine
+        def limited():
+            with (yield from semaphore):
+                yield from mock()
+
+        tasks = [self.loop.create_task(limited()) for _ in range(10)]
+        yield from self.advance(4)
+        self.assertTrue(all(task.done() for task in tasks))
+        mock.assert_max_concurrency(3)
+        mock.assert_awaited_concurrently(3)
+
+    @asyncio.coroutine
+    def test_concurrency_of_autospec(self):
+        mock = asynctest.create_autospec(Test.a_coroutine)
+        yield from mock(None)
+        mock.assert_max_concurrency(1)
+        self.assertEqual(1, mock.concurrency.peak)
+
+
+class Test_CoroutineMock_serial_awaits(asynctest.ClockedTestCase):
+    @asyncio.coroutine
+    def test_await_timings(self):
+        mock = asynctest.CoroutineMock(return_value=1, latency=2)
+        task = self.loop.create_task(mock("a"))
+        yield from self.advance(2)
+
+        timing, = mock.await_timings
+        self.assertEqual((mock, asynctest.call("a"), task, 0, 2),
+                         (timing.mock, timing.call, timing.task,
+                          timing.start, timing.end))
+
+        mock.reset_mock()
+        self.assertEqual([], mock.await_timings)
+
+    @asyncio.coroutine
+    def test_await_timings_keep_no_object_alive(self):
+        class Result:
+            pass
+
+        mock = asynctest.CoroutineMock(side_effect=lambda: Result())
+        task = self.loop.create_task(mock())
+        result = weakref.ref((yield from task))
+        timing, = mock.await_timings
+        self.assertIs(task, timing.task)
+
+        # the loop references the task until its next iteration
+        del task
+        yield from asyncio.sleep(0)
+        gc.collect()
+        self.assertIsNone(result())
+        self.assertIsNone(timing.task)
+
+        mock = asynctest.CoroutineMock()
+        yield from mock()
+        timing, = mock.await_timings
+        del mock
+        yield from asyncio.sleep(0)
+        gc.collect()
+        self.assertIsNone(timing.mock)
+
+    @asyncio.coroutine
+    def test_serial_awaits_in_a_task(self):
+        mock = asynctest.CoroutineMock(latency=1)
+
+        @asyncio.coroutine
+        def serial():
+            for i in range(3):
+                yield from mock(i)
+
+        self.loop.create_task(serial())
+        yield from self.advance(3)
+
+        run, = asynctest.find_serial_awaits(mock)
+        self.assertEqual([asynctest.call(i) for i in range(3)],
+                         [timing.call for timing in run])
+        self.assertEqual([], asynctest.find_serial_awaits(mock, count=4))
+        mock.assert_not_awaited_serially(count=4)
+        with self.assertRaisesRegex(AssertionError, "3 independent awaits"):
+            mock.assert_not_awaited_serially()
+
+    @asyncio.coroutine
+    def test_concurrent_awaits_are_not_serial(self):
+        mock = asynctest.CoroutineMock(latency=1)
+        future = asyncio.gather(*(mock(i) for i in range(3)), loop=self.loop)
+        yield from self.advance(1)
+        self.assertTrue(future.done())
+
+        self.assertEqual(3, mock.await_count)
+        mock.assert_not_awaited_serially()
+
+    @asyncio.coroutine
+    def test_dependent_awaits_are_not_serial(self):
+        mock = asynctest.CoroutineMock(side_effect=lambda page: object())
+
+        @asyncio.coroutine
+        def paginate():
+            page = None
+            for _ in range(3):
+                page = yield from mock(page=page)
+
+        yield from paginate()
+        mock.assert_not_awaited_serially()
+
+    @asyncio.coroutine
+    def test_shared_values_are_not_dependencies(self):
+        for value in (True, 1, "id", b"", ()):
+            with self.subTest(value=value):
+                mock = asynctest.CoroutineMock(return_value=value)
+
+                @asyncio.coroutine
+                def serial():
+                    for _ in range(3):
+                        yield from mock(value)
+
+                yield from serial()
+                with self.assertRaises(AssertionError):
+                    mock.assert_not_awaited_serially()
+
+    @asyncio.coroutine
+    def test_serial_awaits_of_collected_tasks(self):
+        mock = asynctest.CoroutineMock()
+
+        @asyncio.coroutine
+        def serial():
+            yield from mock()
+            yield from mock()
+
+        yield from self.loop.create_task(serial())
+        yield from self.loop.create_task(serial())
+        gc.collect()
+        self.assertEqual([2, 2], [len(run) for run in
+                                  asynctest.find_serial_awaits(mock)])
+
+    @asyncio.coroutine
+    def test_serial_awaits_of_mock_family(self):
+        client = asynctest.create_autospec(Test, instance=True)
+
+        @asyncio.coroutine
+        def load():
+            yield from client.a_coroutine()
+            yield from client.an_async_coroutine()
+
+        yield from load()
+        client.a_coroutine.assert_not_awaited_serially()
+        run, = asynctest.find_serial_awaits(client)
+        self.assertEqual([client.a_coroutine, client.an_async_coroutine],
+                         [timing.mock for timing in run])
+
+
+class Test_async_stream(asynctest.ClockedTestCase):
+    class Counter:
+        # asynchronous iterable, like an async generator
+        def __init__(self, stop):
+            self.stop = stop
+
+        def __aiter__(self):
+            self.count = 0
+            return self
+
+        async def __anext__(self):
+            if self.count == self.stop:
+                raise StopAsyncIteration
+
+            self.count += 1
+            return self.count
+
+    async def iterate(self, iterable):
+        items = []
+        async for item in iterable:
+            items.append(item)
+
+        return items
+
+    async def test_aiter_return_value(self):
+        def produce():
+            yield from range(3)
+
+        mock = asynctest.MagicMock()
+        for return_value in (produce, self.Counter(3)):
+            with self.subTest(return_value=return_value):
+                mock.__aiter__.return_value = return_value
+                self.assertEqual([0, 1, 2] if return_value is produce
+                                 else [1, 2, 3], await self.iterate(mock))
+                # a new stream is produced for each iteration
+                self.assertEqual(3, len(await self.iterate(mock)))
+
+    async def test_stream_is_lazy(self):
+        produced = []
+
+        def produce():
+            for i in itertools.count():
+                produced.append(i)
+                yield i
+
+        mock = asynctest.MagicMock()
+        mock.__aiter__.return_value = asynctest.async_stream(produce)
+        async for item in mock:
+            if item == 2:
+                break
+
+        self.assertEqual([0, 1, 2], produced)
+
+    async def test_delay(self):
+        stream = asynctest.async_stream(self.Counter(3), delay=1)
+        task = self.loop.create_task(self.iterate(stream))
+        await self.advance(2)
+        self.assertFalse(task.done())
+        await self.advance(1)
+        self.assertEqual([1, 2, 3], task.result())
+
+        stream = asynctest.async_stream(
+            range(2), delay=asynctest.Latency.fixed(2))
+        task = self.loop.create_task(self.iterate(stream))
+        await self.advance(4)
+        self.assertEqual([0, 1], task.result())
+
+        with self.assertRaises(ValueError):
+            asynctest.async_stream([], delay=-1)
+
+
+class Test_Latency(unittest.TestCase):
+    def test_distributions(self):
+        for latency in (asynctest.Latency.fixed(.5),
+                        asynctest.Latency.uniform(0, 1, seed=1),
+                        asynctest.Latency.exponential(.5, seed=1),
+                        asynctest.Latency.empirical([.1, .2, .9], seed=1)):
+            with self.subTest(latency=latency):
+                samples = [latency.sample() for _ in range(1000)]
+                self.assertTrue(all(sample >= 0 for sample in samples))
+                self.assertLess(abs(sum(samples) / 1000 - .45), .1)
+
+    def test_seed(self):
+        first = asynctest.Latency.exponential(1, seed=3)
+        second = asynctest.Latency.exponential(1, seed=3)
+        self.assertEqual([first.sample() for _ in range(10)],
+                         [second.sample() for _ in range(10)])
+
+    def test_invalid_latencies(self):
+        with self.assertRaises(ValueError):
+            asynctest.Latency.fixed(-1)
+
+        with self.assertRaises(ValueError):
+            asynctest.Latency.uniform(-1, 1)
+
+        with self.assertRaises(ValueError):
+            asynctest.Latency.empirical([])
+
+        with self.assertRaises(ValueError):
+            asynctest.Latency.fixed(float("nan"))
+
+    def test_negative_fixed_latency_of_a_mock(self):
+        with self.assertRaises(ValueError):
+            asynctest.CoroutineMock(latency=-1)
+
+        mock = asynctest.CoroutineMock(latency=1)
+        with self.assertRaises(ValueError):
+            mock.latency = -.5
+
+        self.assertEqual(1, mock.latency)
+        mock.latency = asynctest.Latency.fixed(0)
+        mock.latency = None
+
+    def test_sampled_latency_is_clamped(self):
+        samples = iter([-.5, .5])
+        latency = asynctest.Latency(lambda: next(samples), "custom")
+        self.assertEqual(0, latency.sample())
+        self.assertEqual(.5, latency.sample())
+
+
+class Test_mock_set_recording(unittest.TestCase):
+    def test_bounded(self):
+        mock = asynctest.MagicMock()
+        mock.mock_set_recording(asynctest.Recording.BOUNDED, maxlen=2)
+
+        for i in range(5):
+            mock(i)
+            mock.method(i)
+
+        self.assertEqual(5, mock.call_count)
+        self.assertEqual([asynctest.call(3), asynctest.call(4)],
+                         mock.call_args_list)
+        self.assertEqual([asynctest.call.method(4)], mock.mock_calls[-1:])
+        self.assertEqual(2, len(mock.mock_calls))
+        self.assertEqual(2, len(mock.method_calls))
+        self.assertEqual(2, len(mock.method.call_args_list))
+        mock.assert_called_with(4)
+        mock.assert_any_call(3)
+
+    def test_bounded_evicts_from_a_deque(self):
+        mock = asynctest.Mock()
+        mock(0)
+        mock.mock_set_recording(asynctest.Recording.BOUNDED, maxlen=3)
+
+        for i in range(1, 1000):
+            mock(i)
+
+        self.assertIsInstance(mock.call_args_list, collections.deque)
+        self.assertEqual(3, mock.call_args_list.maxlen)
+        self.assertEqual([asynctest.call(i) for i in range(997, 1000)],
+                         mock.call_args_list)
+        self.assertNotEqual([], mock.call_args_list)
+        self.assertIn([asynctest.call(998), asynctest.call(999)],
+                      mock.call_args_list)
+        mock.assert_has_calls([asynctest.call(997), asynctest.call(998)])
+        self.assertIn("call(999)", repr(mock.call_args_list))
+
+        mock.reset_mock()
+        self.assertEqual([], mock.call_args_list)
+
+    def test_counters_and_histogram(self):
+        mock = asynctest.CoroutineMock()
+        mock.mock_set_recording(asynctest.Recording.COUNTERS, histogram=True)
+
+        for i in range(6):
+            run_coroutine(mock(i % 2, key=[]))
+
+        self.assertEqual(6, mock.call_count)
+        self.assertEqual(6, mock.await_count)
+        self.assertEqual([], mock.call_args_list)
+        self.assertEqual([], mock.await_args_list)
+        self.assertEqual([], mock.mock_calls)
+        mock.assert_awaited_with(1, key=[])
+
+        histogram = mock.await_args_list.histogram
+        self.assertEqual(3, histogram[asynctest.call(1, key=[])])
+        self.assertEqual(0, histogram[asynctest.call(2)])
+        self.assertEqual(2, len(histogram))
+        self.assertEqual(3, mock.call_args_list.histogram.most_common(1)[0][1])
+
+    def test_histogram_with_hashable_arguments(self):
+        mock = asynctest.Mock()
+        mock.mock_set_recording(asynctest.Recording.FULL, histogram=True)
+        mock(1, a=2)
+        mock(1, a=2)
+        mock(2)
+
+        self.assertEqual(3, len(mock.call_args_list))
+        histogram = mock.call_args_list.histogram
+        self.assertEqual(2, histogram[asynctest.call(1, a=2)])
+        self.assertEqual([(asynctest.call(1, a=2), 2), (asynctest.call(2), 1)],
+                         histogram.most_common())
+
+    def test_mode_inherited_and_kept_by_reset_mock(self):
+        mock = asynctest.MagicMock()
+        existing = mock.existing
+        mock.mock_set_recording(asynctest.Recording.BOUNDED, maxlen=1)
+        mock.reset_mock()
+
+        for child in (existing, mock.new, mock.return_value.new, mock.new()):
+            child(1)
+            child(2)
+            self.assertEqual([asynctest.call(2)], child.call_args_list)
+
+        autospec = asynctest.create_autospec(Test)
+        autospec.mock_set_recording(asynctest.Recording.COUNTERS)
+        run_coroutine(autospec().a_coroutine())
+        autospec.a_function()
+        self.assertEqual(1, autospec.return_value.a_coroutine.await_count)
+        self.assertEqual([], autospec.a_function.call_args_list)
+        self.assertEqual([], autospec.mock_calls)
+
+    def test_back_to_full_keeps_recorded_calls(self):
+        mock = asynctest.Mock()
+        mock(1)
+        mock(2)
+        mock.mock_set_recording(asynctest.Recording.BOUNDED, maxlen=1)
+        self.assertEqual([asynctest.call(2)], mock.call_args_list)
+
+        mock.mock_set_recording(asynctest.Recording.FULL)
+        mock(3)
+        self.assertEqual([asynctest.call(2), asynctest.call(3)],
+                         mock.call_args_list)
+        self.assertNotIn("_mock_recording", mock.__dict__)
+
+    def test_indexed_assertions(self):
+        mock = asynctest.MagicMock()
+        mock.mock_set_recording(asynctest.Recording.INDEXED)
+        for i in range(100):
+            mock(i)
+            mock.method(i, key=[i])
+
+        mock.assert_any_call(50)
+        mock.method.assert_any_call(50, key=[50])
+        mock.assert_any_call(asynctest.ANY)
+        with self.assertRaises(AssertionError):
+            mock.assert_any_call(100)
+
+        mock.assert_has_calls([asynctest.call(10), asynctest.call.method(10, key=[10]),
+                               asynctest.call(11)])
+        mock.assert_has_calls([asynctest.call(10), asynctest.call.method(10, key=[10]),
+                               asynctest.call(asynctest.ANY)])
+        with self.assertRaises(AssertionError):
+            mock.assert_has_calls([asynctest.call(10), asynctest.call(11)])
+        with self.assertRaises(AssertionError):
+            mock.assert_has_calls([asynctest.call(99), asynctest.call(99)],
+                                  any_order=True)
+
+        mock.assert_has_calls([asynctest.call(99), asynctest.call(2)],
+                              any_order=True)
+        with self.assertRaises(AssertionError):
+            mock.assert_has_calls([asynctest.call.other(99, key=[99])],
+                                  any_order=True)
+
+        # calls recorded after a search are indexed
+        mock(100)
+        mock.assert_any_call(100)
+
+    def test_indexed_awaits(self):
+        mock = asynctest.CoroutineMock()
+        mock.mock_set_recording(asynctest.Recording.INDEXED)
+        for i in range(10):
+            run_coroutine(mock(i))
+
+        mock.assert_any_await(5)
+        mock.assert_has_awaits([asynctest.call(5), asynctest.call(6)])
+        mock.assert_has_awaits([asynctest.call(6), asynctest.call(5)],
+                               any_order=True)
+        with self.assertRaises(AssertionError):
+            mock.assert_any_await(10)
+        with self.assertRaises(AssertionError):
+            mock.assert_has_awaits([asynctest.call(6), asynctest.call(5)])
+
+    def test_invalid_arguments(self):
+        mock = asynctest.Mock()
+        with self.assertRaises(ValueError):
+            mock.mock_set_recording("FULL")
+
+        with self.assertRaises(ValueError):
+            mock.mock_set_recording(asynctest.Recording.BOUNDED)
+
+        with self.assertRaises(ValueError):
+            mock.mock_set_recording(asynctest.Recording.COUNTERS, maxlen=2)
+
+
+class Test_mock_snapshot(unittest.TestCase):
+    def test_restore_configuration(self):
+        mock = asynctest.MagicMock()
+        mock.method.return_value = 1
+        mock.attribute = "value"
+        snapshot = mock.mock_snapshot()
+
+        mock.method()
+        mock.method.return_value = 2
+        mock.method.side_effect = Exception
+        mock.attribute = "other"
+        mock.new_child.return_value = 3
+        mock.__aenter__.return_value = 4
+
+        snapshot.restore()
+        self.assertEqual([], mock.mock_calls)
+        mock.method.assert_not_called()
+        self.assertEqual(1, mock.method())
+        self.assertEqual("value", mock.attribute)
+        self.assertNotIn("new_child", mock._mock_children)
+        self.assertIsInstance(run_coroutine(mock.__aenter__()),
+                              asynctest.MagicMock)
+        self.assertEqual([asynctest.call.method(),
+                          asynctest.call.__aenter__()], mock.mock_calls)
+
+        # a snapshot can be restored several times
+        snapshot.restore()
+        self.assertEqual([], mock.mock_calls)
+        self.assertEqual(1, mock.method())
+
+    def test_restore_counters_and_histogram(self):
+        mock = asynctest.CoroutineMock()
+        mock.mock_set_recording(asynctest.Recording.COUNTERS, histogram=True)
+        snapshot = mock.mock_snapshot()
+        run_coroutine(mock(1))
+        run_coroutine(mock(1))
+
+        snapshot.restore()
+        self.assertEqual(0, mock.call_count)
+        self.assertEqual(0, mock.await_count)
+        self.assertEqual(0, mock.call_args_list.histogram[asynctest.call(1)])
+        self.assertEqual(0, len(mock.await_args_list.histogram))
+
+    def test_restore_iterable_side_effect(self):
+        mock = asynctest.Mock(side_effect=[1, 2, 3])
+        function = asynctest.create_autospec(lambda: None)
+        function.side_effect = [1, 2, 3]
+        for tested, snapshotted in ((mock, mock), (function, function.mock)):
+            with self.subTest(mock=tested):
+                self.assertEqual(1, tested())
+                snapshot = snapshotted.mock_snapshot()
+                self.assertEqual([2, 3], [tested(), tested()])
+
+                # a snapshot can be restored several times
+                for _ in range(2):
+                    snapshot.restore()
+                    self.assertEqual([2, 3], [tested(), tested()])
+
+    def test_snapshot_of_infinite_side_effect(self):
+        mock = asynctest.Mock(side_effect=itertools.count())
+        mock()
+        snapshot = mock.mock_snapshot()
+        self.assertEqual(1, mock())
+
+        snapshot.restore()
+        self.assertEqual(1, mock())
+
+    def test_restore_magic_methods(self):
+        mock = asynctest.Mock()
+        other = asynctest.Mock()
+        snapshot = mock.mock_snapshot()
+        mock.__len__ = lambda self: 3
+        self.assertEqual(3, len(mock))
+
+        snapshot.restore()
+        self.assertIs(type(other).__bases__[0], type(mock).__bases__[0])
+        with self.assertRaises(TypeError):
+            len(mock)
+
+        mock = asynctest.MagicMock()
+        mock.__len__ = lambda self: 3
+        snapshot = mock.mock_snapshot()
+        mock.__len__ = lambda self: 4
+        snapshot.restore()
+        self.assertEqual(3, len(mock))
+
+    def test_restore_coroutine_mock(self):
+        mock = asynctest.CoroutineMock(return_value="a", latency=None)
+        snapshot = mock.mock_snapshot()
+        mock.return_value = "b"
+        mock.mock_set_recording(asynctest.Recording.INDEXED)
+        self.assertEqual("b", run_coroutine(mock(1)))
+
+        snapshot.restore()
+        mock.assert_not_awaited()
+        self.assertEqual([], mock.await_args_list)
+        self.assertEqual([], mock.await_timings)
+        self.assertEqual(0, mock.concurrency.peak)
+        self.assertEqual("a", run_coroutine(mock(2)))
+        mock.assert_awaited_once_with(2)
+
+    def test_restore_autospec(self):
+        mock = asynctest.create_autospec(Test)
+        mock.a_function.return_value = 1
+        mock.a_coroutine.return_value = 2
+        snapshot = mock.mock_snapshot()
+
+        mock.a_function.return_value = 3
+        mock.a_function()
+        mock.a_coroutine.side_effect = Exception
+        snapshot.restore()
+
+        mock.a_function.assert_not_called()
+        self.assertEqual(1, mock.a_function())
+        mock.a_function.assert_called_once_with()
+        self.assertEqual(2, run_coroutine(mock.a_coroutine()))
+        mock.a_coroutine.assert_awaited_once_with()
+
+    def test_indexed_calls_are_cleared(self):
+        mock = asynctest.Mock()
+        mock.mock_set_recording(asynctest.Recording.INDEXED, histogram=True)
+        snapshot = mock.mock_snapshot()
+        mock(1)
+        mock.assert_any_call(1)
+
+        snapshot.restore()
+        self.assertEqual(0, mock.call_args_list.histogram[asynctest.call(1)])
+        mock(2)
+        mock(3)
+        mock.assert_any_call(3)
+        with self.assertRaises(AssertionError):
+            mock.assert_any_call(1)
+
+
+class Test_mock_set_thread_safe(asynctest.TestCase):
+    def run_in_threads(self, function, threads=8, calls=500):
+        def run():
+            for i in range(calls):
+                function(i)
+
+        workers = [threading.Thread(target=run) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+    def test_calls_are_not_lost(self):
+        mock = asynctest.MagicMock()
+        mock.mock_set_thread_safe()
+        self.run_in_threads(lambda i: mock.child.method(i))
+
+        self.assertEqual(4000, mock.child.method.call_count)
+        self.assertEqual(4000, len(mock.child.method.call_args_list))
+        self.assertEqual(4000, len(mock.mock_calls))
+        self.assertIn("_mock_lock", mock.child.method.__dict__)
+
+    def test_children_share_the_lock(self):
+        mock = asynctest.MagicMock()
+        mock.existing_child
+        mock.mock_set_thread_safe()
+
+        self.assertIs(mock._mock_lock, mock.existing_child._mock_lock)
+        self.assertIs(mock._mock_lock, mock.new_child._mock_lock)
+        self.assertIs(mock._mock_lock, mock.return_value._mock_lock)
+
+    def test_autospec_children_share_the_lock(self):
+        # the second mock is copied from a template
+        asynctest.create_autospec(Test)
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                mock = asynctest.create_autospec(Test, lazy=lazy)
+                mock.mock_set_thread_safe()
+
+                self.assertIs(mock._mock_lock, mock.a_function._mock_lock)
+                self.assertIs(mock._mock_lock, mock.a_coroutine._mock_lock)
+                self.assertIs(mock._mock_lock,
+                              mock.return_value.a_function._mock_lock)
+
+    def test_side_effects_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        mock = asynctest.Mock(side_effect=lambda i: barrier.wait())
+        mock.mock_set_thread_safe()
+        # would raise BrokenBarrierError if a side effect held the lock
+        self.run_in_threads(mock, threads=2, calls=1)
+        self.assertEqual(2, mock.call_count)
+
+    def test_side_effect_returns_default(self):
+        mock = asynctest.Mock(return_value=1, side_effect=lambda: asynctest.DEFAULT)
+        mock.mock_set_thread_safe()
+        self.assertEqual(1, mock())
+
+        mock = asynctest.Mock(wraps=lambda: 2, side_effect=lambda: asynctest.DEFAULT)
+        mock.mock_set_thread_safe()
+        self.assertEqual(2, mock())
+
+    def test_disable(self):
+        mock = asynctest.Mock()
+        other = asynctest.Mock()
+        mock.mock_set_thread_safe()
+        self.assertIsNot(type(other), type(mock))
+
+        mock.mock_set_thread_safe(False)
+        self.assertNotIn("_mock_lock", mock.__dict__)
+        self.assertNotIn("_mock_call", vars(type(mock)))
+        mock(1)
+        mock.assert_called_once_with(1)
+
+    def test_restore_snapshot(self):
+        mock = asynctest.Mock()
+        snapshot = mock.mock_snapshot()
+        mock.mock_set_thread_safe()
+        snapshot.restore()
+        self.assertNotIn("_mock_lock", mock.__dict__)
+        self.assertNotIn("_mock_call", vars(type(mock)))
+
+    def test_coroutine_mock_awaited_in_threads(self):
+        mock = asynctest.CoroutineMock(return_value=1)
+        mock.mock_set_thread_safe()
+        self.run_in_threads(lambda i: run_coroutine(mock(i)), calls=50)
+
+        self.assertEqual(400, mock.call_count)
+        self.assertEqual(400, mock.await_count)
+        self.assertEqual(400, len(mock.await_args_list))
+
+    @asyncio.coroutine
+    def test_awaited_wakes_up_waiters_on_their_loop(self):
+        mock = asynctest.CoroutineMock()
+        mock.mock_set_thread_safe()
+
+        def await_in_thread():
+            loop = asyncio.new_event_loop()
+            try:
+                return loop.run_until_complete(mock(1))
+            finally:
+                loop.close()
+
+        waiter = asyncio.ensure_future(mock.awaited.wait(), loop=self.loop)
+        yield from asyncio.sleep(0, loop=self.loop)
+        yield from self.loop.run_in_executor(None, await_in_thread)
+
+        self.assertTrue((yield from asyncio.wait_for(waiter, 5,
+                                                     loop=self.loop)))
+        mock.assert_awaited_once_with(1)
+
+
 class TestMockInheritanceModel(unittest.TestCase):
     to_test = {
         'NonCallableMagicMock': 'NonCallableMock',
@@ -796,6 +1618,15 @@ class TestMockInheritanceModel(unittest.TestCase):
     def test_MagicMock_is_not_CoroutineMock(self):
         self.assertNotIsInstance(asynctest.mock.MagicMock(), asynctest.mock.CoroutineMock)
 
+    def test_results_are_cached_by_mock_class(self):
+        mocks = [asynctest.MagicMock() for _ in range(10)]
+        for mock in mocks:
+            self.assertIsInstance(mock, asynctest.Mock)
+
+        cache = asynctest.mock._fake_inheritance_cache
+        self.assertNotIn(type(mocks[0]), cache)
+        self.assertTrue(cache[asynctest.MagicMock][asynctest.Mock])
+
     @staticmethod
     def make_inheritance_test(child, parent):
         def test(self):
@@ -815,6 +1646,220 @@ for child, parent in TestMockInheritanceModel.to_test.items():
             'test_{}_inherits_from_{}'.format(child, parent),
             TestMockInheritanceModel.make_inheritance_test(child, parent))
 
+
+
+class Test_shared_mock_class(unittest.TestCase):
+    def test_mocks_share_the_base_of_their_class(self):
+        for klass in (asynctest.Mock, asynctest.MagicMock,
+                      asynctest.CoroutineMock, asynctest.NonCallableMock,
+                      asynctest.NonCallableMagicMock):
+            with self.subTest(klass=klass):
+                mock, other = klass(), klass()
+                self.assertIsNot(type(mock), type(other))
+                self.assertIs(type(mock).__bases__[0],
+                              type(other).__bases__[0])
+                self.assertIs(klass, type(mock).__bases__[0].__bases__[0])
+                self.assertEqual(klass.__name__, type(mock).__name__)
+                self.assertIsInstance(type(mock)(), klass)
+
+    def test_magic_methods_are_configured_per_instance(self):
+        mock, other = asynctest.MagicMock(), asynctest.MagicMock()
+        mock.__enter__.return_value = "mock"
+        other.__len__ = lambda self: 42
+        other.__aexit__ = asynctest.CoroutineMock(return_value=True)
+
+        self.assertIs(type(mock).__bases__[0], type(other).__bases__[0])
+        self.assertNotIn("__len__", vars(type(other)))
+        with mock as value:
+            self.assertEqual("mock", value)
+        with other as value:
+            self.assertIsNot("mock", value)
+        self.assertEqual(42, len(other))
+        self.assertEqual(0, len(mock))
+        self.assertIs(other, other.__aexit__._mock_new_parent)
+        self.assertIn(asynctest.call.__enter__(), mock.mock_calls)
+
+    def test_spec_selects_magic_methods(self):
+        mock = asynctest.MagicMock(spec=Test)
+        shared = type(mock).__bases__[0]
+        self.assertIsNot(shared, type(asynctest.MagicMock()).__bases__[0])
+        self.assertIs(shared, type(asynctest.MagicMock(spec=Test)).__bases__[0])
+        with self.assertRaises(AttributeError):
+            mock.__aenter__
+
+        with self.assertRaises(AttributeError):
+            mock.__aenter__ = asynctest.CoroutineMock()
+
+        mock.mock_add_spec(None)
+        self.assertEqual(type(asynctest.MagicMock()).__bases__,
+                         type(mock).__bases__)
+
+    def test_delete_magic_method(self):
+        mock = asynctest.MagicMock()
+        mock.__len__.return_value = 1
+        del mock.__len__
+
+        with self.assertRaises(TypeError):
+            len(mock)
+        # other mocks still support the magic method
+        self.assertEqual(0, len(asynctest.MagicMock()))
+
+        mock.__len__ = asynctest.Mock(return_value=2)
+        self.assertEqual(2, len(mock))
+
+    def test_class_modified_for_a_single_instance(self):
+        mock, other = asynctest.Mock(), asynctest.Mock()
+        mock.__repr__ = lambda self: "repr"
+
+        self.assertIsInstance(mock, asynctest.Mock)
+        self.assertEqual("repr", repr(mock))
+        self.assertNotEqual("repr", repr(other))
+
+    def test_property_mock_on_the_class(self):
+        mock, other = asynctest.MagicMock(), asynctest.MagicMock()
+        type(mock).foo = asynctest.PropertyMock(return_value=3)
+
+        self.assertEqual(3, mock.foo)
+        self.assertIsInstance(other.foo, asynctest.MagicMock)
+        self.assertIsInstance(asynctest.MagicMock().foo, asynctest.MagicMock)
+
+    def test_magic_methods_on_non_magic_mock(self):
+        mock, other = asynctest.Mock(), asynctest.Mock()
+        mock.__len__ = asynctest.Mock(return_value=3)
+
+        self.assertEqual(3, len(mock))
+        with self.assertRaises(TypeError):
+            len(other)
+
+    def test_autospec_signature_is_set_per_instance(self):
+        mock = asynctest.create_autospec(Test)
+        other = asynctest.create_autospec(Test)
+
+        mock.a_function()
+        with self.assertRaises(TypeError):
+            mock.a_function(1, 2, 3)
+
+        self.assertIs(type(mock.a_function).__bases__[0],
+                      type(other.a_function).__bases__[0])
+
+
+class Test_spec_metadata(unittest.TestCase):
+    def test_metadata_shared_by_mocks_of_a_class(self):
+        mock = asynctest.Mock(spec=Test)
+        other = asynctest.NonCallableMagicMock(spec_set=Test)
+
+        self.assertIs(mock._mock_methods, other._mock_methods)
+        self.assertEqual(dir(Test), mock._mock_methods)
+        self.assertIn("a_coroutine", mock._mock_methods)
+        self.assertIn("a_coroutine", mock._spec_coroutines)
+        self.assertNotIn("a_function", mock._spec_coroutines)
+        self.assertIsInstance(mock.a_coroutine, asynctest.CoroutineMock)
+
+    def test_metadata_of_instances_is_not_cached(self):
+        instance = Test()
+        mock = asynctest.Mock(spec=instance)
+        instance.an_attribute = None
+
+        self.assertIsNot(mock._mock_methods,
+                         asynctest.Mock(spec=Test())._mock_methods)
+        self.assertIn("an_attribute",
+                      asynctest.Mock(spec=instance)._mock_methods)
+
+    def test_metadata_invalidated_by_patch(self):
+        class Patched:
+            def method(self):
+                pass
+
+        self.assertNotIn("method", asynctest.Mock(Patched)._spec_coroutines)
+
+        with asynctest.patch.object(Patched, "method",
+                                    new=asynctest.CoroutineMock()):
+            self.assertIn("method", asynctest.Mock(Patched)._spec_coroutines)
+
+        with asynctest.patch.object(Patched, "other", create=True):
+            self.assertIn("other", asynctest.Mock(Patched)._mock_methods)
+
+        self.assertNotIn("method", asynctest.Mock(Patched)._spec_coroutines)
+        self.assertNotIn("other", asynctest.Mock(Patched)._mock_methods)
+
+    def test_metadata_follows_changes_of_the_class(self):
+        class Base:
+            pass
+
+        class Spec(Base):
+            def method(self):
+                pass
+
+        Spec.g = lambda self: 1
+        self.assertIsInstance(asynctest.Mock(spec=Spec).g, asynctest.Mock)
+        Base.h = None
+        self.assertIn("h", asynctest.Mock(spec=Spec)._mock_methods)
+        self.assertIsInstance(asynctest.create_autospec(Spec).g,
+                              asynctest.MagicMock)
+
+        del Spec.g
+        with self.assertRaises(AttributeError):
+            asynctest.Mock(spec=Spec).g
+
+        for _ in range(3):
+            # the new function may be allocated at the address of the
+            # previous one
+            async def method(self):
+                pass
+            Spec.method = method
+            self.assertIsInstance(asynctest.Mock(spec=Spec).method,
+                                  asynctest.CoroutineMock)
+
+            def method(self):
+                pass
+            Spec.method = method
+            self.assertNotIsInstance(asynctest.Mock(spec=Spec).method,
+                                     asynctest.CoroutineMock)
+
+        self.assertIs(asynctest.Mock(spec=Spec)._mock_methods,
+                      asynctest.Mock(spec=Spec)._mock_methods)
+
+    def test_patch_keeps_metadata_of_other_classes(self):
+        class Patched:
+            attribute = None
+
+        mock = asynctest.Mock(spec=Test)
+        with asynctest.patch.object(Patched, "attribute"):
+            self.assertIs(mock._mock_methods,
+                          asynctest.Mock(spec=Test)._mock_methods)
+
+        patched = asynctest.Mock(spec=Patched)
+        with asynctest.patch.object(Patched, "attribute"):
+            pass
+        self.assertIs(patched._mock_methods,
+                      asynctest.Mock(spec=Patched)._mock_methods)
+
+    def test_metadata_read_once_per_mock(self):
+        get_spec_metadata = asynctest.mock._get_spec_metadata
+        with unittest.mock.patch("asynctest.mock._get_spec_metadata",
+                                 wraps=get_spec_metadata) as lookup:
+            for klass in (asynctest.Mock, asynctest.MagicMock,
+                          asynctest.NonCallableMagicMock):
+                with self.subTest(klass=klass):
+                    lookup.reset_mock()
+                    mock = klass(spec=Test)
+                    self.assertEqual(1, lookup.call_count)
+                    self.assertNotIn("_mock_new_spec_metadata",
+                                     mock.__dict__)
+
+    def test_signature_is_cached(self):
+        def function(a, b):
+            pass
+
+        mock = asynctest.create_autospec(function)
+        other = asynctest.Mock(spec=function)
+
+        mock(1, 2)
+        with self.assertRaises(TypeError):
+            mock(1)
+        self.assertIs(mock.mock._spec_signature, other._spec_signature)
+
+
 #
 # mock_open
 #
@@ -824,12 +1869,110 @@ class Test_mock_open(unittest.TestCase):
     def test_MagicMock_returned_by_default(self):
         self.assertIsInstance(asynctest.mock_open(), asynctest.MagicMock)
 
+
+class Test_async_mock_open(asynctest.TestCase):
+    async def test_read(self):
+        open_mock = asynctest.async_mock_open(read_data=b"abc\ndef\nghi")
+
+        async with open_mock("file", "rb") as handle:
+            self.assertEqual(b"ab", await handle.read(2))
+            self.assertEqual(b"c\n", await handle.readline())
+            self.assertEqual(b"d", await handle.readline(1))
+            self.assertEqual([b"ef\n", b"ghi"], await handle.readlines())
+            self.assertEqual(b"", await handle.read())
+
+        open_mock.assert_called_once_with("file", "rb")
+        handle.read.assert_has_awaits([asynctest.call(2), asynctest.call()])
+
+        handle = open_mock("file")
+        self.assertEqual(b"abc\ndef\nghi", await handle.read())
+        self.assertEqual(4, await handle.seek(-7, 2))
+        self.assertEqual(b"def\n", await handle.readline())
+        self.assertEqual(8, await handle.tell())
+
+    async def test_async_for(self):
+        for read_data in ("a\nb\n", b"a\nb\n", memoryview(b"a\nb\n"),
+                          bytearray(b"a\nb\n")):
+            with self.subTest(read_data=read_data):
+                open_mock = asynctest.async_mock_open(read_data=read_data)
+                lines = []
+                async with open_mock("file") as handle:
+                    async for line in handle:
+                        lines.append(line)
+
+                if isinstance(read_data, str):
+                    self.assertEqual(["a\n", "b\n"], lines)
+                else:
+                    self.assertEqual([b"a\n", b"b\n"], lines)
+
+    async def test_readinto_from_mmap(self):
+        with tempfile.TemporaryFile() as file:
+            file.write(b"x" * 10000 + b"\nend")
+            file.flush()
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            handle = asynctest.async_mock_open(read_data=data)("file")
+            buffer = bytearray(8000)
+            self.assertEqual(8000, await handle.readinto(buffer))
+            self.assertEqual(b"x" * 8000, buffer)
+            self.assertEqual(2001, len(await handle.readline()))
+            self.assertEqual(3, await handle.readinto(buffer))
+            self.assertEqual(b"end", buffer[:3])
+            # the handle doesn't keep exports of the mmap
+            data.close()
+
+    async def test_readinto_from_str(self):
+        handle = asynctest.async_mock_open(read_data="abc")("file")
+        with self.assertRaisesRegex(io.UnsupportedOperation, "str"):
+            await handle.readinto(bytearray(3))
+
+        self.assertEqual("abc", await handle.read())
+
 #
 # Test patches
 #
 
 
 class Test_patch(unittest.TestCase):
+    def test_target_is_resolved_when_the_patch_is_entered(self):
+        import test.test_mock
+
+        class Other:
+            def a_function(self):
+                pass
+
+        original = Test.a_function
+        patcher = asynctest.mock.patch('test.test_mock.Test.a_function')
+        with asynctest.mock.patch.object(test.test_mock, 'Test', Other):
+            with patcher as mock:
+                self.assertIs(mock, Other.a_function)
+
+        self.assertIsNot(mock, Other.a_function)
+        self.assertIs(original, Test.a_function)
+
+    def test_target_in_module_not_imported(self):
+        getter = asynctest.mock._compile_getter('test.test_mock.Test')
+        self.assertIs(Test, getter())
+
+        module = sys.modules.pop('test.test_mock')
+        try:
+            # falls back to the import of the module
+            self.assertIs(Test, getter())
+        finally:
+            sys.modules['test.test_mock'] = module
+
+    def test_copy_of_started_patch(self):
+        patcher = asynctest.mock.patch('test.test_mock.Test.a_function')
+        with patcher as mock:
+            copy = patcher.copy()
+            self.assertFalse(asynctest.mock._is_started(copy))
+            with copy as other_mock:
+                self.assertIsNot(mock, other_mock)
+
+            self.assertIs(mock, Test.a_function)
+
+        self.assertNotIsInstance(Test.a_function, asynctest.Mock)
+
     def test_patch_as_context_manager_uses_MagicMock(self):
         with asynctest.mock.patch('test.test_mock.Test') as mock:
             self.assertIsInstance(mock, asynctest.mock.MagicMock)
@@ -1381,6 +2524,150 @@ class Test_patch_autospec(unittest.TestCase):
         patched_function()
         self.assertTrue(called)
 
+
+class Test_patch_cassette(asynctest.TestCase):
+    class Server:
+        requests = []
+
+        @staticmethod
+        async def fetch(key, default=None):
+            Test_patch_cassette.Server.requests.append(key)
+            if key == "missing":
+                raise KeyError(key)
+
+            return key.upper()
+
+    def setUp(self):
+        self.Server.requests = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cassette.pickle")
+
+    async def fetch_all(self):
+        results = [await self.Server.fetch("a"),
+                   await self.Server.fetch("b", default=[])]
+        with self.assertRaises(KeyError):
+            await self.Server.fetch("missing")
+
+        return results
+
+    async def test_record_and_replay(self):
+        cassette = asynctest.Cassette(self.path)
+        self.assertTrue(cassette.record)
+        with asynctest.patch.object(self.Server, "fetch",
+                                    cassette=cassette) as mock:
+            self.assertEqual(["A", "B"], await self.fetch_all())
+
+        mock.assert_awaited_with("missing")
+        self.assertEqual(["a", "b", "missing"], self.Server.requests)
+        self.Server.requests = []
+
+        cassette = asynctest.Cassette(self.path)
+        self.assertFalse(cassette.record)
+        with asynctest.patch.object(self.Server, "fetch", cassette=cassette):
+            self.assertEqual(["A", "B"], await self.fetch_all())
+            self.assertEqual([], self.Server.requests)
+
+            # each recorded await is replayed once
+            with self.assertRaises(LookupError):
+                await self.Server.fetch("a")
+
+    def test_unpicklable_result_keeps_the_file(self):
+        cassette = asynctest.Cassette(self.path)
+        cassette.interactions = {"fetch": [(("a", ), {}, "A", None)]}
+        cassette.save()
+
+        cassette.interactions["fetch"].append((("b", ), {}, threading.Lock(),
+                                               None))
+        with self.assertRaises(TypeError):
+            cassette.save()
+
+        self.assertEqual({"fetch": [(("a", ), {}, "A", None)]},
+                         asynctest.Cassette(self.path).interactions)
+        self.assertEqual(["cassette.pickle"],
+                         os.listdir(os.path.dirname(self.path)))
+
+    async def test_replay_in_decorated_coroutine(self):
+        asynctest.Cassette(self.path, record=True).save()
+
+        @asynctest.patch.object(self.Server, "fetch",
+                                cassette=asynctest.Cassette(self.path))
+        async def replay(mock):
+            await self.Server.fetch("a")
+
+        with self.assertRaisesRegex(LookupError, "No await of"):
+            await replay()
+
+        self.assertEqual([], self.Server.requests)
+
+    async def test_record_and_replay_a_method(self):
+        class Client:
+            def __init__(self):
+                self.requests = []
+
+            async def fetch(self, key):
+                self.requests.append(key)
+                return key.upper()
+
+        cassette = asynctest.Cassette(self.path)
+        client = Client()
+        with asynctest.patch.object(Client, "fetch",
+                                    cassette=cassette) as mock:
+            self.assertEqual("A", await client.fetch("a"))
+
+        mock.assert_awaited_with(client, "a")
+        self.assertEqual(["a"], client.requests)
+
+        client = Client()
+        with asynctest.patch.object(Client, "fetch",
+                                    cassette=asynctest.Cassette(self.path)):
+            self.assertEqual("A", await client.fetch("a"))
+
+        self.assertEqual([], client.requests)
+
+    async def test_record_in_several_patches(self):
+        cassette = asynctest.Cassette(self.path)
+        for key in ("a", "b"):
+            with asynctest.patch.object(self.Server, "fetch",
+                                        cassette=cassette):
+                await self.Server.fetch(key)
+
+        cassette = asynctest.Cassette(self.path)
+        with asynctest.patch.object(self.Server, "fetch", cassette=cassette):
+            self.assertEqual("A", await self.Server.fetch("a"))
+            self.assertEqual("B", await self.Server.fetch("b"))
+
+    async def test_cancelled_awaits_are_not_recorded(self):
+        started = asyncio.Event()
+
+        async def wait(key):
+            started.set()
+            await asyncio.sleep(10)
+
+        cassette = asynctest.Cassette(self.path)
+        with asynctest.patch.object(self.Server, "fetch",
+                                    new=staticmethod(wait)):
+            with asynctest.patch.object(self.Server, "fetch",
+                                        cassette=cassette):
+                task = self.loop.create_task(self.Server.fetch("a"))
+                await started.wait()
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        self.assertEqual([[]], list(cassette.interactions.values()))
+
+    def test_invalid_arguments(self):
+        cassette = asynctest.Cassette(self.path)
+        with self.assertRaises(ValueError):
+            asynctest.patch.object(self.Server, "fetch", new=None,
+                                   cassette=cassette)
+
+        with self.assertRaises(TypeError):
+            with asynctest.patch("test.test_mock.Test.a_function",
+                                 cassette=cassette):
+                pass
+
 #
 # patch scopes
 #
@@ -1486,6 +2773,81 @@ class Test_patch_dict_decorator_coroutine_or_generator_scope(
         self.assertFalse(self.is_patched())
         self.assertTrue(next(gen))
 
+    def test_scope_limited_keys_changed_while_running(self):
+        a_dict = {'patched': False, 'removed': True}
+
+        @asynctest.patch.dict(a_dict, {'patched': True},
+                              scope=asynctest.LIMITED)
+        def a_generator():
+            yield dict(a_dict)
+            a_dict['patched'] = 'changed'
+            yield dict(a_dict)
+            del a_dict['patched']
+            yield dict(a_dict)
+            yield dict(a_dict)
+
+        gen = a_generator()
+        self.addCleanup(gen.close)
+        self.assertEqual({'patched': True, 'removed': True}, next(gen))
+        self.assertEqual({'patched': False, 'removed': True}, a_dict)
+
+        self.assertEqual({'patched': 'changed', 'removed': True}, next(gen))
+        self.assertEqual({'patched': False, 'removed': True}, a_dict)
+
+        self.assertEqual({'removed': True}, next(gen))
+        self.assertEqual({'patched': False, 'removed': True}, a_dict)
+
+        # the value set while the patch is active is set again
+        self.assertEqual({'patched': 'changed', 'removed': True}, next(gen))
+
+    def test_scope_limited_other_keys_keep_their_changes(self):
+        a_dict = {'patched': False, 'other': 1, 'removed': True}
+
+        @asynctest.patch.dict(a_dict, {'patched': True},
+                              scope=asynctest.LIMITED)
+        def a_generator():
+            a_dict['added'] = True
+            del a_dict['removed']
+            a_dict['other'] = 2
+            yield dict(a_dict)
+            yield dict(a_dict)
+
+        gen = a_generator()
+        self.addCleanup(gen.close)
+        self.assertEqual({'patched': True, 'other': 2, 'added': True},
+                         next(gen))
+        self.assertEqual({'patched': False, 'other': 2, 'added': True},
+                         a_dict)
+
+        self.assertEqual({'patched': True, 'other': 2, 'added': True},
+                         next(gen))
+        with self.assertRaises(StopIteration):
+            next(gen)
+
+        self.assertEqual({'patched': False, 'other': 2, 'added': True},
+                         a_dict)
+
+    def test_scope_limited_changes_while_paused_are_kept(self):
+        a_dict = {'patched': False, 'replaced': True}
+
+        @asynctest.patch.dict(a_dict, {'patched': True},
+                              scope=asynctest.LIMITED)
+        def a_generator():
+            yield dict(a_dict)
+            yield dict(a_dict)
+
+        gen = a_generator()
+        self.addCleanup(gen.close)
+        self.assertEqual({'patched': True, 'replaced': True}, next(gen))
+        a_dict['patched'] = 'changed_while_paused'
+        del a_dict['replaced']
+        a_dict['added_while_paused'] = True
+
+        self.assertEqual({'patched': True, 'added_while_paused': True},
+                         next(gen))
+        self.assertEqual({'patched': 'changed_while_paused',
+                          'added_while_paused': True}, a_dict)
+
     def test_patch_generator_with_multiple_scopes(self):
         with self.subTest("Outer: GLOBAL, inner: LIMITED"):
             @patch_dict_is_patched(scope=asynctest.GLOBAL)
@@ -1524,6 +2886,10 @@ class Test_patch_dict_decorator_coroutine_or_generator_scope(
     def test_patch_generator_with_multiple_scopes_on_same_dict(self):
         import test.test_mock
 
+        # a key added by the coroutine is not restored by a LIMITED patch
+        self.addCleanup(test.test_mock.Test.a_dict.pop, 'overriden_value',
+                        None)
+
         def tester():
             test.test_mock.Test.a_dict['overriden_value'] = True
             for _ in range(2):
@@ -1542,7 +2908,7 @@ class Test_patch_dict_decorator_coroutine_or_generator_scope(
                 self.assertEqual((True, True, True), next(gen))
                 self.assertEqual((True, False),
                                  (self.is_patched(), self.second_is_patched()))
-                self.assertNotIn('overriden_value', test.test_mock.Test.a_dict)
+                self.assertIn('overriden_value', test.test_mock.Test.a_dict)
                 self.assertEqual((True, True, True), next(gen))
             finally:
                 gen.close()
@@ -1558,7 +2924,7 @@ class Test_patch_dict_decorator_coroutine_or_generator_scope(
                 self.assertEqual((True, True, True), next(gen))
                 self.assertEqual((False, True),
                                  (self.is_patched(), self.second_is_patched()))
-                self.assertNotIn('overriden_value', test.test_mock.Test.a_dict)
+                self.assertIn('overriden_value', test.test_mock.Test.a_dict)
                 self.assertEqual((True, True, True), next(gen))
             finally:
                 gen.close()
@@ -2087,6 +3453,178 @@ class Test_patch_decorator_coroutine_or_generator_scope_LIMITED(patch_scope_Test
 
             run_coroutine(tester(a_native_coroutine))
 
+    def test_original_changed_while_suspended(self):
+        target = types.SimpleNamespace(attribute="original")
+
+        @asynctest.patch.object(target, "attribute", "patched",
+                                scope=asynctest.LIMITED)
+        def a_generator():
+            yield target.attribute
+            yield target.attribute
+
+        gen = a_generator()
+        self.assertEqual("patched", next(gen))
+        target.attribute = "changed"
+        self.assertEqual("patched", next(gen))
+        self.assertEqual("changed", target.attribute)
+
+    def test_patch_created_attribute(self):
+        target = types.SimpleNamespace()
+
+        @asynctest.patch.object(target, "attribute", "patched", create=True,
+                                scope=asynctest.LIMITED)
+        def a_generator():
+            yield target.attribute
+
+        gen = a_generator()
+        self.assertEqual("patched", next(gen))
+        self.assertFalse(hasattr(target, "attribute"))
+
+    def test_same_patch_on_delegated_generator(self):
+        target = types.SimpleNamespace(attribute="original")
+        patched = asynctest.patch.object(target, "attribute", "patched",
+                                         scope=asynctest.LIMITED)
+
+        @patched
+        def inner():
+            yield target.attribute
+
+        @patched
+        def outer():
+            yield from inner()
+            yield target.attribute
+
+        self.assertEqual(["patched", "patched"], list(outer()))
+        self.assertEqual("original", target.attribute)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "contextvars require python 3.7")
+class Test_patch_decorator_coroutine_or_generator_scope_TASK(patch_scope_TestCase):
+    # Tests of patch() using scope=TASK
+    def test_deactivate_patch_when_generator_init_fails(self):
+        self._test_deactivate_patch_when_generator_init_fails(asynctest.TASK)
+
+    def test_deactivate_patch_when_generator_exec_fails(self):
+        self._test_deactivate_patch_when_generator_exec_fails(asynctest.TASK)
+
+    def test_patch_only_in_task(self):
+        @patch_is_patched(scope=asynctest.TASK)
+        async def a_coroutine(fut):
+            before = self.is_patched()
+            await fut
+            return before, self.is_patched()
+
+        async def tester():
+            fut = asyncio.Future()
+            task = asyncio.ensure_future(a_coroutine(fut))
+            await asyncio.sleep(0)
+            # the coroutine is paused, but still patched in its task
+            self.assertFalse(self.is_patched())
+            fut.set_result(None)
+            self.assertEqual((True, True), await task)
+
+        run_coroutine(tester())
+        self.assertFalse(self.is_patched())
+        self.assertNotIsInstance(vars(Test)["is_patched"],
+                                 asynctest.mock._TaskLocalProxy)
+
+    def test_concurrent_tasks_see_their_own_mock(self):
+        target = types.SimpleNamespace(function=lambda: "original")
+
+        @asynctest.patch.object(target, "function", scope=asynctest.TASK)
+        async def a_coroutine(value, mock):
+            mock.return_value = value
+            await asyncio.sleep(0)
+            # attributes are forwarded to the mock of the task
+            self.assertEqual(value, target.function.return_value)
+            self.assertEqual(value, target.function())
+            mock.assert_called_once_with()
+            return value
+
+        async def tester():
+            results = await asyncio.gather(*[a_coroutine(i) for i in range(10)])
+            self.assertEqual(list(range(10)), results)
+            self.assertEqual("original", target.function())
+
+        run_coroutine(tester())
+        self.assertNotIsInstance(target.function,
+                                 asynctest.mock._TaskLocalProxy)
+        self.assertEqual("original", target.function())
+
+    def test_patch_created_attribute(self):
+        target = types.SimpleNamespace()
+
+        @asynctest.patch.object(target, "attribute", str.upper, create=True,
+                                scope=asynctest.TASK)
+        async def a_coroutine():
+            return repr(target.attribute), target.attribute("patched")
+
+        self.assertEqual((repr(str.upper), "PATCHED"),
+                         run_coroutine(a_coroutine()))
+        self.assertFalse(hasattr(target, "attribute"))
+
+    def test_constants_are_rejected(self):
+        import test.test_mock
+
+        for new in ({"new": "patched"}, {}):
+            with self.subTest(**new):
+                patcher = asynctest.patch("test.test_mock.MODULE_CONSTANT",
+                                          scope=asynctest.TASK, **new)
+                with self.assertRaisesRegex(TypeError, "MODULE_CONSTANT"):
+                    patcher.start()
+
+                self.assertEqual(2, test.test_mock.MODULE_CONSTANT)
+
+        target = types.SimpleNamespace(function=len)
+        with self.assertRaisesRegex(TypeError, "scope=TASK"):
+            asynctest.patch.object(target, "function", 1,
+                                   scope=asynctest.TASK).start()
+
+        self.assertIs(len, target.function)
+
+    def test_constants_of_a_class(self):
+        class Target:
+            attribute = 1
+
+        @asynctest.patch.object(Target, "attribute", 2, scope=asynctest.TASK)
+        async def a_coroutine():
+            return Target.attribute + 1
+
+        self.assertEqual(3, run_coroutine(a_coroutine()))
+        self.assertEqual(1, Target.attribute)
+
+    def test_context_manager(self):
+        async def patched(started, release):
+            with asynctest.patch.object(Test, "is_patched",
+                                        lambda self: True,
+                                        scope=asynctest.TASK):
+                started.set_result(None)
+                await release
+                return self.is_patched()
+
+        async def tester():
+            started, release = asyncio.Future(), asyncio.Future()
+            task = asyncio.ensure_future(patched(started, release))
+            await started
+            self.assertFalse(self.is_patched())
+            release.set_result(None)
+            self.assertTrue(await task)
+
+        run_coroutine(tester())
+        self.assertFalse(self.is_patched())
+
+    def test_patch_dict_is_not_supported(self):
+        with self.assertRaises(ValueError):
+            asynctest.patch.dict({}, scope=asynctest.TASK)
+
+
+@unittest.skipIf(sys.version_info >= (3, 7), "contextvars require python 3.7")
+class Test_patch_scope_TASK_not_supported(unittest.TestCase):
+    def test_patch_raises(self):
+        with self.assertRaises(NotImplementedError):
+            asynctest.patch("test.test_mock.Test.is_patched",
+                            scope=asynctest.TASK)
+
 
 class Test_return_once(unittest.TestCase):
     def test_default_value(self):
@@ -2281,5 +3819,123 @@ class Test_create_autospec(unittest.TestCase):
         self.assertIsInstance(mock.added_attribute, asynctest.Mock)
 
 
+class Test_create_autospec_template(unittest.TestCase):
+    def test_copies_have_their_own_records(self):
+        first = asynctest.mock.create_autospec(Test)
+        second = asynctest.mock.create_autospec(Test, _name="second")
+
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.a_function, second.a_function)
+        self.assertIsNot(first.return_value, second.return_value)
+        self.assertIsInstance(second.a_coroutine, asynctest.CoroutineMock)
+        self.assertIn("second.a_function", repr(second.a_function))
+
+        first().a_function()
+        run_coroutine(first.a_coroutine())
+        self.assertEqual([asynctest.call(), asynctest.call().a_function(),
+                          asynctest.call.a_coroutine()], first.mock_calls)
+        first.a_coroutine.assert_awaited_once_with()
+        self.assertEqual([], second.mock_calls)
+        second.a_coroutine.assert_not_awaited()
+
+        with self.assertRaises(TypeError):
+            second().a_function("too", "many")
+
+    def test_template_not_used_with_kwargs(self):
+        mock = asynctest.mock.create_autospec(Test, return_value="value")
+        self.assertEqual("value", mock())
+        self.assertIsInstance(asynctest.mock.create_autospec(Test)(),
+                              asynctest.NonCallableMagicMock)
+
+    def test_patched_spec_is_not_copied(self):
+        asynctest.mock.create_autospec(Test)
+
+        with asynctest.mock.patch.object(Test, "a_function",
+                                         asyncio.coroutine(lambda self: 1)):
+            mock = asynctest.mock.create_autospec(Test)
+            self.assertIsInstance(mock.a_function, asynctest.CoroutineMock)
+
+        mock = asynctest.mock.create_autospec(Test)
+        self.assertNotIsInstance(mock.a_function, asynctest.CoroutineMock)
+
+    def test_patch_creates_autospec_once(self):
+        with unittest.mock.patch.object(
+                unittest.mock, "create_autospec",
+                wraps=unittest.mock.create_autospec) as unittest_autospec:
+            with asynctest.mock.patch("{}.Test".format(__name__),
+                                      autospec=True) as mock:
+                self.assertIs(mock, Test)
+                self.assertIsInstance(mock.a_coroutine,
+                                      asynctest.CoroutineMock)
+
+        unittest_autospec.assert_not_called()
+
+
+class Test_create_autospec_lazy(unittest.TestCase):
+    def test_children_created_on_first_access(self):
+        mock = asynctest.mock.create_autospec(Test, lazy=True)
+        self.assertNotIsInstance(mock._mock_children["a_function"],
+                                 asynctest.Mock)
+
+        child = mock.a_function
+        self.assertIsInstance(child, asynctest.MagicMock)
+        self.assertIs(child, mock._mock_children["a_function"])
+        self.assertIs(child, mock.a_function)
+        self.assertNotIsInstance(mock._mock_children["a_coroutine"],
+                                 asynctest.Mock)
+
+    def test_lazy_mock_behaves_like_eager_mock(self):
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                mock = asynctest.mock.create_autospec(Test, spec_set=True,
+                                                      lazy=lazy)
+                self.assertIsInstance(mock.a_coroutine,
+                                      asynctest.CoroutineMock)
+                self.assertTrue(asyncio.iscoroutinefunction(
+                    mock.an_async_staticmethod_coroutine))
+                self.assertIsInstance(mock().an_async_coroutine,
+                                      asynctest.CoroutineMock)
+
+                with self.assertRaises(TypeError):
+                    mock.a_coroutine_with_args(None, "too", "many")
+
+                instance = mock()
+                run_coroutine(instance.a_coroutine_with_args("a", "b"))
+                instance.a_coroutine_with_args.assert_awaited_once_with(
+                    "a", "b")
+                mock.assert_has_calls([
+                    asynctest.call(),
+                    asynctest.call().a_coroutine_with_args("a", "b")])
+
+                with self.assertRaises(AttributeError):
+                    mock.not_an_attribute = None
+
+    def test_instance_created_on_first_access(self):
+        mock = asynctest.mock.create_autospec(Test, lazy=True)
+        self.assertIs(asynctest.DEFAULT, mock._mock_return_value)
+        self.assertIn("_mock_lazy_instance", mock.__dict__)
+
+        instance = mock()
+        self.assertIs(instance, mock.return_value)
+        self.assertIsInstance(instance, asynctest.NonCallableMagicMock)
+        with self.assertRaises(TypeError):
+            instance()
+
+        mock.return_value = "value"
+        self.assertEqual("value", mock())
+
+    def test_patch_lazy(self):
+        with asynctest.mock.patch("{}.Test".format(__name__), autospec=True,
+                                  lazy=True) as mock:
+            self.assertIn("_mock_lazy_instance", mock.__dict__)
+            self.assertFalse(hasattr(mock, "lazy"))
+            self.assertIsInstance(Test().a_coroutine, asynctest.CoroutineMock)
+
+        # lazy is not passed to the mock, which would be refused by spec_set
+        with asynctest.mock.patch("{}.Test".format(__name__), autospec=True,
+                                  spec_set=True, lazy=True) as mock:
+            self.assertIsInstance(mock.a_function, asynctest.MagicMock)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,262 @@
+# coding: utf-8
+
+import asyncio
+import signal
+import subprocess
+import unittest
+
+import asynctest
+
+
+class Test_SubprocessRegistry(asynctest.TestCase):
+    def setUp(self):
+        self.registry = asynctest.SubprocessRegistry()
+        self.registry.add("echo", stdout=b"hello\n")
+        self.registry.attach(self.loop)
+
+    def create_exec(self, *args, **kwargs):
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+        return asyncio.create_subprocess_exec(*args, loop=self.loop, **kwargs)
+
+    @asyncio.coroutine
+    def test_scripted_process(self):
+        self.registry.add("false", stderr=b"error\n", returncode=1)
+
+        process = yield from self.create_exec("/bin/echo", "hello")
+        stdout, stderr = yield from process.communicate()
+        self.assertEqual((b"hello\n", b""), (stdout, stderr))
+        self.assertEqual(0, process.returncode)
+
+        process = yield from self.create_exec("false")
+        stdout, stderr = yield from process.communicate()
+        self.assertEqual((b"", b"error\n"), (stdout, stderr))
+        self.assertEqual(1, (yield from process.wait()))
+
+        self.assertEqual([["/bin/echo", "hello"], ["false"]],
+                         [p.args for p in self.registry.spawned])
+
+    @asyncio.coroutine
+    def test_coroutine_child(self):
+        @asyncio.coroutine
+        def upper(process):
+            data = yield from process.stdin.read()
+            process.stdout.write(data.upper())
+            return 3
+
+        self.registry.add("upper", upper)
+        process = yield from self.create_exec("upper", stdin=subprocess.PIPE,
+                                              cwd="/tmp")
+        stdout, _ = yield from process.communicate(b"abc")
+
+        self.assertEqual(b"ABC", stdout)
+        self.assertEqual(3, process.returncode)
+        self.assertEqual(process.pid, self.registry.spawned[0].pid)
+        self.assertEqual({"cwd": "/tmp"}, self.registry.spawned[0].kwargs)
+
+    @asyncio.coroutine
+    def test_readline_while_running(self):
+        release = asyncio.Event(loop=self.loop)
+
+        @asyncio.coroutine
+        def child(process):
+            process.stdout.write(b"ready\n")
+            yield from release.wait()
+
+        self.registry.add("server", child)
+        process = yield from self.create_exec("server")
+
+        self.assertEqual(b"ready\n", (yield from process.stdout.readline()))
+        self.assertIsNone(process.returncode)
+
+        release.set()
+        self.assertEqual(0, (yield from process.wait()))
+
+    @asyncio.coroutine
+    def test_stderr_to_stdout_and_devnull(self):
+        self.registry.add("both", stdout=b"out ", stderr=b"err")
+
+        process = yield from self.create_exec("both",
+                                              stderr=subprocess.STDOUT)
+        self.assertEqual((b"out err", None), (yield from process.communicate()))
+
+        process = yield from self.create_exec("both",
+                                              stdout=subprocess.DEVNULL)
+        self.assertEqual((None, b"err"), (yield from process.communicate()))
+
+    @asyncio.coroutine
+    def test_child_exception(self):
+        def child(process):
+            raise RuntimeError("crashed")
+
+        self.registry.add("crash", child)
+        process = yield from self.create_exec("crash")
+        _, stderr = yield from process.communicate()
+
+        self.assertIn(b"RuntimeError: crashed", stderr)
+        self.assertEqual(1, process.returncode)
+
+    @asyncio.coroutine
+    def test_signals(self):
+        @asyncio.coroutine
+        def child(process):
+            process.signal_handlers[signal.SIGTERM] = lambda signum: None
+            yield from asyncio.sleep(10, loop=self.loop)
+
+        self.registry.add("daemon", child)
+        process = yield from self.create_exec("daemon")
+        yield from asyncio.sleep(0, loop=self.loop)
+
+        process.terminate()
+        yield from asyncio.sleep(0, loop=self.loop)
+        self.assertIsNone(process.returncode)
+
+        process.kill()
+        self.assertEqual(-signal.SIGKILL, (yield from process.wait()))
+        self.assertEqual([signal.SIGTERM, signal.SIGKILL],
+                         self.registry.spawned[0].signals)
+
+        with self.assertRaises(ProcessLookupError):
+            process.kill()
+
+    @asyncio.coroutine
+    def test_kill_before_first_step(self):
+        child = asynctest.CoroutineMock()
+        self.registry.add("daemon", child)
+        process = yield from self.create_exec("daemon")
+
+        process.kill()
+        self.assertEqual(-signal.SIGKILL, (yield from process.wait()))
+        self.assertEqual((b"", b""), (yield from process.communicate()))
+        child.assert_not_called()
+
+    @asyncio.coroutine
+    def test_connection_lost(self):
+        events = []
+        lost = asyncio.Future(loop=self.loop)
+
+        class Protocol(asyncio.SubprocessProtocol):
+            def pipe_data_received(self, fd, data):
+                events.append(("pipe_data_received", fd, data))
+
+            def pipe_connection_lost(self, fd, exc):
+                events.append(("pipe_connection_lost", fd))
+
+            def process_exited(self):
+                events.append(("process_exited", ))
+
+            def connection_lost(self, exc):
+                events.append(("connection_lost", exc))
+                lost.set_result(None)
+
+        transport, _ = yield from self.loop.subprocess_exec(
+            Protocol, "echo", stdin=subprocess.PIPE)
+        yield from asyncio.wait_for(lost, 1, loop=self.loop)
+        transport.close()
+
+        self.assertEqual(("pipe_data_received", 1, b"hello\n"), events[0])
+        self.assertEqual({("pipe_connection_lost", 0),
+                          ("pipe_connection_lost", 1),
+                          ("pipe_connection_lost", 2),
+                          ("process_exited", )}, set(events[1:-1]))
+        self.assertEqual(("connection_lost", None), events[-1])
+
+    @asyncio.coroutine
+    def test_stream_protocol_connection_lost(self):
+        lost = asyncio.Future(loop=self.loop)
+
+        class Protocol(asyncio.subprocess.SubprocessStreamProtocol):
+            def connection_lost(self, exc):
+                super().connection_lost(exc)
+                lost.set_result(None)
+
+        _, protocol = yield from self.loop.subprocess_exec(
+            lambda: Protocol(limit=2 ** 16, loop=self.loop), "echo",
+            stdin=subprocess.DEVNULL)
+        yield from asyncio.wait_for(lost, 1, loop=self.loop)
+        self.assertEqual(b"hello\n", (yield from protocol.stdout.read()))
+
+    @asyncio.coroutine
+    def test_pause_reading(self):
+        release = asyncio.Event(loop=self.loop)
+
+        @asyncio.coroutine
+        def child(process):
+            yield from release.wait()
+            process.stdout.write(b"data")
+
+        self.registry.add("server", child)
+        process = yield from self.create_exec("server")
+        pipe = process._transport.get_pipe_transport(1)
+        pipe.pause_reading()
+        self.assertFalse(pipe.is_reading())
+
+        release.set()
+        self.assertEqual(0, (yield from process.wait()))
+        yield from asyncio.sleep(0, loop=self.loop)
+        self.assertFalse(process.stdout.at_eof())
+        self.assertIsNone(pipe.get_extra_info("unknown"))
+        self.assertFalse(pipe.is_closing())
+
+        pipe.resume_reading()
+        self.assertEqual(b"data", (yield from process.stdout.read()))
+        self.assertTrue(pipe.is_closing())
+
+    @asyncio.coroutine
+    def test_unregistered_program(self):
+        with self.assertRaises(FileNotFoundError):
+            yield from self.create_exec("unknown")
+
+    @asyncio.coroutine
+    def test_shell(self):
+        self.registry.add("ls *", stdout=b"file\n")
+
+        process = yield from asyncio.create_subprocess_shell(
+            "ls -l", stdout=subprocess.PIPE, loop=self.loop)
+        self.assertEqual(b"file\n", (yield from process.stdout.read()))
+        yield from process.wait()
+        self.assertEqual(["/bin/sh", "-c", "ls -l"],
+                         self.registry.spawned[0].args)
+        self.assertTrue(self.registry.spawned[0].shell)
+
+        process = yield from asyncio.create_subprocess_shell(
+            "unknown --help", stderr=subprocess.PIPE, loop=self.loop)
+        _, stderr = yield from process.communicate()
+        self.assertEqual(127, process.returncode)
+        self.assertIn(b"unknown: not found", stderr)
+
+    @asyncio.coroutine
+    def test_pipe_is_a_file_mock(self):
+        process = yield from self.create_exec("echo")
+        transport = process._transport.get_pipe_transport(1)
+        self.assertTrue(asynctest.isfilemock(transport.get_extra_info("pipe")))
+        yield from process.communicate()
+
+    @asyncio.coroutine
+    def test_fallback(self):
+        original = asynctest.CoroutineMock(return_value=(None, None))
+        self.registry.detach()
+        self.loop.subprocess_exec = original
+        self.registry.fallback = True
+        self.registry.attach(self.loop)
+
+        yield from self.loop.subprocess_exec(None, "unknown", "arg")
+        original.assert_awaited_once_with(
+            None, "unknown", "arg", stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        self.registry.detach()
+        self.assertIs(original, self.loop.subprocess_exec)
+
+    def test_detach_and_remove(self):
+        self.registry.remove("echo")
+        with self.assertRaises(KeyError):
+            self.registry.remove("echo")
+
+        self.registry.detach()
+        self.assertNotIn("subprocess_exec", self.loop.__dict__)
+        self.assertNotIn("subprocess_shell", self.loop.__dict__)
+
+
+if __name__ == "__main__":
+    unittest.main()
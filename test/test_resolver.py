@@ -0,0 +1,157 @@
+# coding: utf-8
+
+import asyncio
+import socket
+import unittest
+
+import asynctest
+
+
+class Test_Resolver(asynctest.TestCase):
+    def setUp(self):
+        self.resolver = asynctest.Resolver()
+        self.resolver.add("example.com", "93.184.216.34", "2606:2800::1")
+        self.resolver.add("*.example.com", "10.0.0.1")
+        self.resolver.add("www.example.com", "10.0.0.2")
+        self.resolver.attach(self.loop)
+
+    @asyncio.coroutine
+    def test_getaddrinfo(self):
+        infos = yield from self.loop.getaddrinfo(
+            "example.com", 80, type=socket.SOCK_STREAM)
+
+        self.assertEqual([
+            (socket.AF_INET, socket.SOCK_STREAM, 0, "",
+             ("93.184.216.34", 80)),
+            (socket.AF_INET6, socket.SOCK_STREAM, 0, "",
+             ("2606:2800::1", 80, 0, 0)),
+        ], infos)
+        self.assertEqual(["example.com"], self.resolver.queries)
+
+    @asyncio.coroutine
+    def test_getaddrinfo_family_and_types(self):
+        infos = yield from self.loop.getaddrinfo(
+            "EXAMPLE.com", "80", family=socket.AF_INET)
+
+        self.assertEqual([socket.SOCK_STREAM, socket.SOCK_DGRAM],
+                         [info[1] for info in infos])
+        self.assertEqual({("93.184.216.34", 80)},
+                         set(info[4] for info in infos))
+
+    @asyncio.coroutine
+    def test_getaddrinfo_canonname(self):
+        infos = yield from self.loop.getaddrinfo(
+            "example.com", 80, type=socket.SOCK_STREAM,
+            flags=socket.AI_CANONNAME)
+
+        self.assertEqual("example.com", infos[0][3])
+        self.assertEqual("", infos[1][3])
+
+    @asyncio.coroutine
+    def test_getaddrinfo_patterns(self):
+        infos = yield from self.loop.getaddrinfo(
+            "api.example.com", 443, type=socket.SOCK_STREAM)
+        self.assertEqual(("10.0.0.1", 443), infos[0][4])
+
+        # names which are not patterns have the priority
+        infos = yield from self.loop.getaddrinfo(
+            "www.example.com", 443, type=socket.SOCK_STREAM)
+        self.assertEqual(("10.0.0.2", 443), infos[0][4])
+
+    @asyncio.coroutine
+    def test_getaddrinfo_numeric_and_none(self):
+        infos = yield from self.loop.getaddrinfo(
+            "127.0.0.2", 80, type=socket.SOCK_STREAM)
+        self.assertEqual([("127.0.0.2", 80)], [info[4] for info in infos])
+
+        infos = yield from self.loop.getaddrinfo(
+            None, 80, family=socket.AF_INET, type=socket.SOCK_STREAM,
+            flags=socket.AI_PASSIVE)
+        self.assertEqual([("0.0.0.0", 80)], [info[4] for info in infos])
+
+    @asyncio.coroutine
+    def test_getaddrinfo_unknown_name(self):
+        with self.assertRaises(socket.gaierror):
+            yield from self.loop.getaddrinfo("unknown.test", 80)
+
+    @asyncio.coroutine
+    def test_getaddrinfo_fallback(self):
+        self.resolver.fallback = True
+        original = asynctest.CoroutineMock(return_value=[])
+        self.resolver.detach()
+        self.loop.getaddrinfo = original
+        self.resolver.attach(self.loop)
+
+        yield from self.loop.getaddrinfo("unknown.test", 80)
+        original.assert_awaited_once_with("unknown.test", 80, family=0,
+                                          type=0, proto=0, flags=0)
+
+        self.resolver.detach()
+        self.assertIs(original, self.loop.getaddrinfo)
+
+    @asyncio.coroutine
+    def test_fail(self):
+        self.resolver.fail("down.example.com")
+        with self.assertRaises(socket.gaierror):
+            yield from self.loop.getaddrinfo("down.example.com", 80)
+
+        self.resolver.fail("timeout.example.com", exception=TimeoutError())
+        with self.assertRaises(TimeoutError):
+            yield from self.loop.getaddrinfo("timeout.example.com", 80)
+
+    @asyncio.coroutine
+    def test_remove(self):
+        self.resolver.remove("*.example.com")
+        with self.assertRaises(socket.gaierror):
+            yield from self.loop.getaddrinfo("api.example.com", 80)
+
+        with self.assertRaises(KeyError):
+            self.resolver.remove("api.example.com")
+
+    @asyncio.coroutine
+    def test_getnameinfo(self):
+        name = yield from self.loop.getnameinfo(("93.184.216.34", 80),
+                                                socket.NI_NUMERICSERV)
+        self.assertEqual(("example.com", "80"), name)
+
+        name = yield from self.loop.getnameinfo(
+            ("93.184.216.34", 80), socket.NI_NUMERICHOST |
+            socket.NI_NUMERICSERV)
+        self.assertEqual(("93.184.216.34", "80"), name)
+
+        with self.assertRaises(socket.gaierror):
+            yield from self.loop.getnameinfo(("10.0.0.3", 80),
+                                             socket.NI_NAMEREQD)
+
+    def test_detach(self):
+        self.resolver.detach()
+        self.assertNotIn("getaddrinfo", self.loop.__dict__)
+        self.assertNotIn("getnameinfo", self.loop.__dict__)
+
+    def test_add_invalid_address(self):
+        with self.assertRaises(ValueError):
+            self.resolver.add("example.org", "not an address")
+
+
+class Test_Resolver_latency(asynctest.ClockedTestCase):
+    @asyncio.coroutine
+    def test_latency_in_loop_time(self):
+        resolver = asynctest.Resolver()
+        resolver.add("example.com", "10.0.0.1", latency=2)
+        resolver.fail("down.example.com", latency=1)
+        resolver.attach(self.loop)
+
+        task = self.loop.create_task(self.loop.getaddrinfo("example.com", 80))
+        failed = self.loop.create_task(
+            self.loop.getaddrinfo("down.example.com", 80))
+
+        yield from self.advance(1)
+        self.assertFalse(task.done())
+        self.assertIsInstance(failed.exception(), socket.gaierror)
+
+        yield from self.advance(1)
+        self.assertEqual(("10.0.0.1", 80), task.result()[0][4])
+
+
+if __name__ == "__main__":
+    unittest.main()